@@ -0,0 +1,41 @@
+from typing import Annotated
+from fastapi import APIRouter, Depends, HTTPException, status
+
+from app.services.admission import AdmissionController
+from app.services.registry import get_admission, get_profiler
+from app.utils.profiling import Profiler
+
+router = APIRouter(prefix="/admin", tags=["admin"])
+
+
+@router.get("/llm")
+def get_llm_admission(
+    admission: Annotated[AdmissionController, Depends(get_admission)],
+) -> dict:
+    return admission.stats()
+
+
+def get_enabled_profiler(
+    profiler: Annotated[Profiler, Depends(get_profiler)],
+) -> Profiler:
+    if not profiler.enabled:
+        raise HTTPException(status.HTTP_404_NOT_FOUND, detail="Profiling is disabled")
+    return profiler
+
+
+@router.get("/profiles")
+def get_profiles(
+    profiler: Annotated[Profiler, Depends(get_enabled_profiler)],
+) -> list[dict]:
+    return profiler.recent()
+
+
+@router.get("/profiles/{profile_id}")
+def get_profile(
+    profile_id: str,
+    profiler: Annotated[Profiler, Depends(get_enabled_profiler)],
+) -> dict:
+    profile = profiler.get(profile_id)
+    if profile is None:
+        raise HTTPException(status.HTTP_404_NOT_FOUND, detail="Profile not found")
+    return profile
@@ -1,55 +1,178 @@
-from fastapi import APIRouter, File, Form, UploadFile
+from typing import Annotated, Any, Callable, Coroutine
+from fastapi import APIRouter, Depends, File, Form, Request, Response, UploadFile
 from fastapi.exceptions import HTTPException
 from fastapi import status
+from fastapi.routing import APIRoute
 from langchain_text_splitters import TokenTextSplitter
 from neo4j_graphrag.experimental.components.text_splitters.langchain import (
     LangChainTextSplitterAdapter,
 )
 
-from neo4j_graphrag.experimental.pipeline.pipeline import PipelineResult
-
-from os import getenv
+from functools import lru_cache
 from pathlib import Path
+import os
+from os import getenv
 import tempfile
 
 from app.database.database import Neo4jDatabase
-from app.services.llm import LLM, EmbbeddingHuggingFace
+from app.model.models import IngestionJob, IngestionMode
+from app.services.jobs import IngestionJobQueue, JobQueueFullError
+from app.services.jobs import job_progress_callback
+from app.services.llm import LLM
+from app.services.registry import get_db, get_ingestion_llm, get_job_queue
+
+MAX_UPLOAD_SIZE = int(getenv("MAX_UPLOAD_SIZE_MB") or 50) * 1024 * 1024
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+MULTIPART_OVERHEAD = 64 * 1024
+
+
+def upload_too_large(max_size: int) -> HTTPException:
+    return HTTPException(
+        status.HTTP_413_CONTENT_TOO_LARGE,
+        detail=f"File is larger than {max_size // (1024 * 1024)} MB",
+    )
+
+
+# Runs before FastAPI parses the multipart body; uploads without a
+# Content-Length are only rejected afterwards by save_upload.
+class UploadSizeLimitRoute(APIRoute):
+    def get_route_handler(
+        self,
+    ) -> Callable[[Request], Coroutine[Any, Any, Response]]:
+        handler = super().get_route_handler()
+
+        async def limited_handler(request: Request) -> Response:
+            content_length = request.headers.get("content-length", "")
+            if (
+                content_length.isdigit()
+                and int(content_length) > MAX_UPLOAD_SIZE + MULTIPART_OVERHEAD
+            ):
+                raise upload_too_large(MAX_UPLOAD_SIZE)
+            return await handler(request)
 
+        return limited_handler
 
-router = APIRouter(prefix="/files", tags=["files"])
 
+router = APIRouter(prefix="/files", tags=["files"], route_class=UploadSizeLimitRoute)
 
-@router.post("/")
+
+@lru_cache
+def get_text_splitter() -> LangChainTextSplitterAdapter:
+    return LangChainTextSplitterAdapter(
+        TokenTextSplitter(chunk_size=250, chunk_overlap=10)
+    )
+
+
+@router.post("/", status_code=status.HTTP_202_ACCEPTED)
 def post_file(
+    db: Annotated[Neo4jDatabase, Depends(get_db)],
+    llm: Annotated[LLM, Depends(get_ingestion_llm)],
+    jobs: Annotated[IngestionJobQueue, Depends(get_job_queue)],
+    text_splitter: Annotated[LangChainTextSplitterAdapter, Depends(get_text_splitter)],
     file: UploadFile = File(...),
     document_subject: str = Form(...),
     file_name: str = Form(...),
-) -> PipelineResult:
+    mode: IngestionMode = Form(IngestionMode.GRAPH),
+) -> IngestionJob:
     if file.content_type != "application/pdf" or Path(file.filename).suffix != ".pdf":
         raise HTTPException(
             status.HTTP_400_BAD_REQUEST,
             detail="Invalid document type, only PDF is supported",
         )
-    embedder = EmbbeddingHuggingFace()
-    db = Neo4jDatabase(embedder)
-    llm = LLM(model_name=f"groq:{getenv('GROQ_MODEL')}")
-    splitter = TokenTextSplitter(chunk_size=250, chunk_overlap=10)
-    adapter_splitter = LangChainTextSplitterAdapter(splitter)
-    with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as tmp:
-        pdf_bytes = file.file.read()
-        tmp.write(pdf_bytes)
-        result = db.create_graph_from_pdf(
+    file_path = save_upload(file)
+
+    async def ingest(job: IngestionJob) -> None:
+        job.result = await db.acreate_graph_from_pdf(
             llm=llm,
-            file_path=tmp.name,
+            file_path=file_path,
             document_metada={"subject": document_subject, "file_name": file_name},
-            text_splitter=adapter_splitter,
+            text_splitter=text_splitter,
+            on_progress=job_progress_callback(job),
+            mode=mode,
         )
-    return result
+
+    job = IngestionJob(document_subject=document_subject, file_name=file_name)
+    try:
+        return jobs.submit(job, ingest, cleanup=lambda: remove_file(file_path))
+    except JobQueueFullError as error:
+        remove_file(file_path)
+        raise HTTPException(status.HTTP_429_TOO_MANY_REQUESTS, detail=str(error))
+
+
+@router.post("/entities/", status_code=status.HTTP_202_ACCEPTED)
+def post_entity_extraction(
+    db: Annotated[Neo4jDatabase, Depends(get_db)],
+    llm: Annotated[LLM, Depends(get_ingestion_llm)],
+    jobs: Annotated[IngestionJobQueue, Depends(get_job_queue)],
+    document_subject: str = Form(...),
+    file_name: str = Form(...),
+) -> IngestionJob:
+    async def extract(job: IngestionJob) -> None:
+        await db.aextract_entities(
+            llm=llm,
+            document_metada={"subject": document_subject, "file_name": file_name},
+            on_progress=job_progress_callback(job),
+        )
+
+    job = IngestionJob(document_subject=document_subject, file_name=file_name)
+    try:
+        return jobs.submit(job, extract)
+    except JobQueueFullError as error:
+        raise HTTPException(status.HTTP_429_TOO_MANY_REQUESTS, detail=str(error))
+
+
+@router.get("/jobs/{job_id}")
+def get_job(
+    job_id: str,
+    jobs: Annotated[IngestionJobQueue, Depends(get_job_queue)],
+) -> IngestionJob:
+    job = jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status.HTTP_404_NOT_FOUND, detail="Job not found")
+    return job
+
+
+@router.delete("/jobs/{job_id}")
+def cancel_job(
+    job_id: str,
+    jobs: Annotated[IngestionJobQueue, Depends(get_job_queue)],
+) -> IngestionJob:
+    job = jobs.cancel(job_id)
+    if job is None:
+        raise HTTPException(status.HTTP_404_NOT_FOUND, detail="Job not found")
+    return job
 
 
 @router.delete("/{document_subject}")
-def delete_file_with_subject(document_subject: str) -> list[dict]:
-    embedder = EmbbeddingHuggingFace()
-    db = Neo4jDatabase(embedder)
+def delete_file_with_subject(
+    document_subject: str,
+    db: Annotated[Neo4jDatabase, Depends(get_db)],
+) -> list[dict]:
     result = db.delete_document_with_metadata(metadata={"subject": document_subject})
     return result
+
+
+def save_upload(file: UploadFile, max_size: int = MAX_UPLOAD_SIZE) -> str:
+    too_large = upload_too_large(max_size)
+    if file.size is not None and file.size > max_size:
+        raise too_large
+    with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as tmp:
+        try:
+            size = 0
+            while chunk := file.file.read(UPLOAD_CHUNK_SIZE):
+                size += len(chunk)
+                if size > max_size:
+                    raise too_large
+                tmp.write(chunk)
+        except BaseException:
+            tmp.close()
+            remove_file(tmp.name)
+            raise
+    return tmp.name
+
+
+def remove_file(file_path: str) -> None:
+    try:
+        os.remove(file_path)
+    except FileNotFoundError:
+        pass
@@ -1,44 +1,73 @@
-from typing import Annotated, List
+from typing import Annotated, AsyncIterator, List, Tuple
 from fastapi import APIRouter, Depends, HTTPException
 from fastapi import status
-from uuid import uuid4
-from os import getenv
+from fastapi.responses import StreamingResponse
 
 from app.controller.user import get_current_active_user
 from app.database.database import Neo4jDatabase
+from app.database.message_history import AsyncNeo4jMessageHistory
 from app.model.models import LLMResponseEndpoint, Sessions, User
 from app.model.models import Message
-from app.services.llm import LLM, EmbbeddingHuggingFace
+from app.services.llm import LLM
+from app.services.admission import AdmissionRejectedError
+from app.services.history_writer import MessageHistoryWriter
+from app.services.registry import (
+    get_chat_llm,
+    get_db,
+    get_history_writer,
+    get_summarizer,
+)
+from app.services.summarizer import ConversationSummarizer
 from neo4j_graphrag.types import LLMMessage
 from neo4j_graphrag.generation.prompts import RagTemplate
 
 from app.utils.prompts import DEFAULT_SYSTEM_INSTRUCTIONS
+from app.utils.tools import format_sse
 
 router = APIRouter(prefix="/llm", tags=["llm"])
 
 
 @router.post("/")
-def post(
+async def post(
     message: Message,
     user: Annotated[User, Depends(get_current_active_user)],
+    db: Annotated[Neo4jDatabase, Depends(get_db)],
+    llm: Annotated[LLM, Depends(get_chat_llm)],
+    writer: Annotated[MessageHistoryWriter | None, Depends(get_history_writer)],
+    summarizer: Annotated[ConversationSummarizer | None, Depends(get_summarizer)],
 ) -> LLMResponseEndpoint:
-    _, history, llm = initialize_llm(message, user)
-    llm = LLM(model_name=f"groq:{getenv('GROQ_MODEL')}")
-    llm_response = llm.invoke(message.text, message_history=history)
+    history, messages = await initialize_llm(message, user, db, llm, writer, summarizer)
+    llm_response = await llm.ainvoke(message.text, message_history=messages)
     message_llm = LLMMessage(role="user", content=message.text)
     response_llm = LLMMessage(role="assistant", content=llm_response.content)
-    history.add_messages([message_llm, response_llm])
+    await save_messages(history, [message_llm, response_llm], writer)
     return LLMResponseEndpoint(
         answer=llm_response.content, session_id=message.session_id
     )
 
 
+@router.post("/stream/")
+async def post_stream(
+    message: Message,
+    user: Annotated[User, Depends(get_current_active_user)],
+    db: Annotated[Neo4jDatabase, Depends(get_db)],
+    llm: Annotated[LLM, Depends(get_chat_llm)],
+    writer: Annotated[MessageHistoryWriter | None, Depends(get_history_writer)],
+    summarizer: Annotated[ConversationSummarizer | None, Depends(get_summarizer)],
+) -> StreamingResponse:
+    history, messages = await initialize_llm(message, user, db, llm, writer, summarizer)
+    tokens = llm.astream(message.text, message_history=messages)
+    return StreamingResponse(
+        stream_answer(message, history, tokens, writer),
+        media_type="text/event-stream",
+    )
+
+
 @router.get("/sessions", tags=["session"])
 def get_sessions(
     user: Annotated[User, Depends(get_current_active_user)],
+    db: Annotated[Neo4jDatabase, Depends(get_db)],
 ) -> Sessions:
-    embedder = EmbbeddingHuggingFace()
-    db = Neo4jDatabase(embedder)
     sessions = db.get_sessions_from_user(user)
     if sessions:
         sessions = sessions[0]
@@ -47,11 +76,14 @@ def get_sessions(
 
 @router.get("/sessions/{session_id}", tags=["session"])
 def get_message_from_session(
-    user: Annotated[User, Depends(get_current_active_user)], session_id: str
+    user: Annotated[User, Depends(get_current_active_user)],
+    db: Annotated[Neo4jDatabase, Depends(get_db)],
+    writer: Annotated[MessageHistoryWriter | None, Depends(get_history_writer)],
+    session_id: str,
 ) -> List[LLMMessage]:
-    embedder = EmbbeddingHuggingFace()
-    db = Neo4jDatabase(embedder)
     if check_session_user(session_id, user, db=db):
+        if writer is not None:
+            writer.flush(session_id)
         history = db.get_message_history(session_id)
         return history.messages
     raise HTTPException(
@@ -64,10 +96,13 @@ def get_message_from_session(
 def delete_session(
     session_id: str,
     user: Annotated[User, Depends(get_current_active_user)],
+    db: Annotated[Neo4jDatabase, Depends(get_db)],
+    writer: Annotated[MessageHistoryWriter | None, Depends(get_history_writer)],
 ) -> Sessions:
-    embedder = EmbbeddingHuggingFace()
-    db = Neo4jDatabase(embedder)
     if check_session_user(session_id, user, db=db):
+        if writer is not None:
+            writer.flush(session_id)
+        db.delete_session_summary(session_id)
         history = db.get_message_history(session_id=session_id)
         history.clear(True)
         return Sessions(sessions=[session_id])
@@ -85,29 +120,100 @@ def check_session_user(session_id: str, user: User, db: Neo4jDatabase) -> bool:
 
 
 @router.post("/rag/", tags=["rag"])
-def post(
+async def post(
     message: Message,
     user: Annotated[User, Depends(get_current_active_user)],
+    db: Annotated[Neo4jDatabase, Depends(get_db)],
+    llm: Annotated[LLM, Depends(get_chat_llm)],
+    writer: Annotated[MessageHistoryWriter | None, Depends(get_history_writer)],
+    summarizer: Annotated[ConversationSummarizer | None, Depends(get_summarizer)],
 ) -> LLMResponseEndpoint:
-    db, history, llm = initialize_llm(message, user)
+    history, messages = await initialize_llm(message, user, db, llm, writer, summarizer)
     rag_template = RagTemplate(system_instructions=DEFAULT_SYSTEM_INSTRUCTIONS)
-    response_llm = db.rag_response(llm, message.text, history, rag_template)
+    response_llm = await db.arag_response(
+        llm, message.text, messages, rag_template, message.filters()
+    )
     message_llm = LLMMessage(role="user", content=message.text)
     response_llm = LLMMessage(role="assistant", content=response_llm.answer)
-    history.add_messages([message_llm, response_llm])
+    await save_messages(history, [message_llm, response_llm], writer)
     return LLMResponseEndpoint(
         answer=response_llm["content"], session_id=message.session_id
     )
 
 
-def initialize_llm(message: Message, user: User):
-    embedder = EmbbeddingHuggingFace()
-    db = Neo4jDatabase(embedder)
+@router.post("/rag/stream/", tags=["rag"])
+async def post_rag_stream(
+    message: Message,
+    user: Annotated[User, Depends(get_current_active_user)],
+    db: Annotated[Neo4jDatabase, Depends(get_db)],
+    llm: Annotated[LLM, Depends(get_chat_llm)],
+    writer: Annotated[MessageHistoryWriter | None, Depends(get_history_writer)],
+    summarizer: Annotated[ConversationSummarizer | None, Depends(get_summarizer)],
+) -> StreamingResponse:
+    history, messages = await initialize_llm(message, user, db, llm, writer, summarizer)
+    rag_template = RagTemplate(system_instructions=DEFAULT_SYSTEM_INSTRUCTIONS)
+    tokens = db.arag_stream(
+        llm, message.text, messages, rag_template, message.filters()
+    )
+    return StreamingResponse(
+        stream_answer(message, history, tokens, writer),
+        media_type="text/event-stream",
+    )
 
-    if not check_session_user(message.session_id, user, db=db):
-        message.session_id = str(uuid4())
 
-    history = db.get_message_history(session_id=message.session_id)
-    db.link_basemodel_to_session(user, message.session_id)
-    llm = LLM(model_name=f"groq:{getenv('GROQ_MODEL')}")
-    return db, history, llm
+async def stream_answer(
+    message: Message,
+    history: AsyncNeo4jMessageHistory,
+    tokens: AsyncIterator[str],
+    writer: MessageHistoryWriter | None = None,
+) -> AsyncIterator[str]:
+    yield format_sse({"session_id": message.session_id}, event="session")
+    answer = []
+    try:
+        async for token in tokens:
+            answer.append(token)
+            yield format_sse({"token": token})
+    except AdmissionRejectedError as error:
+        yield format_sse(
+            {"detail": str(error), "retry_after": error.retry_after}, event="error"
+        )
+        return
+    message_llm = LLMMessage(role="user", content=message.text)
+    response_llm = LLMMessage(role="assistant", content="".join(answer))
+    await save_messages(history, [message_llm, response_llm], writer)
+    yield format_sse(
+        LLMResponseEndpoint(
+            answer=response_llm["content"], session_id=message.session_id
+        ).model_dump(),
+        event="end",
+    )
+
+
+async def initialize_llm(
+    message: Message,
+    user: User,
+    db: Neo4jDatabase,
+    llm: LLM,
+    writer: MessageHistoryWriter | None = None,
+    summarizer: ConversationSummarizer | None = None,
+) -> Tuple[AsyncNeo4jMessageHistory, List[LLMMessage]]:
+    if writer is not None and message.session_id:
+        await writer.aflush(message.session_id)
+    window = summarizer.window if summarizer is not None else 3
+    history, messages = await db.aopen_session(user, message.session_id, window)
+    message.session_id = history.session_id
+    if summarizer is not None:
+        summarizer.schedule(llm, history.session_id, messages)
+        messages = summarizer.recent(messages)
+    return history, messages
+
+
+async def save_messages(
+    history: AsyncNeo4jMessageHistory,
+    messages: List[LLMMessage],
+    writer: MessageHistoryWriter | None = None,
+) -> None:
+    if writer is None:
+        await history.aadd_messages(messages)
+    else:
+        writer.add_messages(history.session_id, messages)
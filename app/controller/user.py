@@ -1,3 +1,4 @@
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
 from os import getenv
 from typing import Annotated
@@ -6,19 +7,27 @@ from jwt.exceptions import InvalidTokenError
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 import jwt
 from passlib.context import CryptContext
+import asyncio
 
 
 from app.database.database import Neo4jDatabase
 from app.model.models import Token, TokenData, User
-from app.services.llm import EmbbeddingHuggingFace
+from app.services.registry import get_db, get_user_cache
+from app.utils.cache import TTLCache
+from app.utils.metrics import STAGE_LATENCY
+from app.utils.profiling import span
 
 router = APIRouter(prefix="/user", tags=["user"])
 
 SECRET_KEY = getenv("SECRET_KEY")
 ALGORITHM = getenv("ALGORITHM")
-ACCESS_TOKEN_EXPIRE_MINUTES = int(getenv("ACCESS_TOKEN_EXPIRE_MINUTES", 15))
+ACCESS_TOKEN_EXPIRE_MINUTES = int(getenv("ACCESS_TOKEN_EXPIRE_MINUTES") or 15)
 
 pwd_context = CryptContext(schemes=["bcrypt_sha256"], deprecated="auto")
+password_executor = ThreadPoolExecutor(
+    max_workers=int(getenv("PASSWORD_HASH_WORKERS") or 2),
+    thread_name_prefix="password",
+)
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
 
@@ -30,21 +39,31 @@ def get_password_hash(password):
     return pwd_context.hash(password)
 
 
-def get_user(email: str):
-    embedder = EmbbeddingHuggingFace()
-    db = Neo4jDatabase(embedder)
+async def averify_password(plain_password, hashed_password):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        password_executor, verify_password, plain_password, hashed_password
+    )
+
+
+async def aget_password_hash(password):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(password_executor, get_password_hash, password)
+
+
+async def get_user(email: str, db: Neo4jDatabase):
     try:
-        user: User = db.get_basemodel(User(email=email))
+        user: User = await db.aget_basemodel(User(email=email))
     except Exception:
         return None
     return user
 
 
-def authenticate_user(email: str, password: str):
-    user = get_user(email)
+async def authenticate_user(email: str, password: str, db: Neo4jDatabase):
+    user = await get_user(email, db)
     if not user:
         return False
-    if not verify_password(password, user.password):
+    if not await averify_password(password, user.password):
         return False
     return user
 
@@ -64,23 +83,29 @@ def create_access_token(data: dict, expires_delta: timedelta | None = None):
 
 async def get_current_user(
     token: Annotated[str, Depends(oauth2_scheme)],
+    db: Annotated[Neo4jDatabase, Depends(get_db)],
+    users: Annotated[TTLCache, Depends(get_user_cache)],
 ):
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        username = payload.get("sub")
-        if username is None:
+    with span("auth"), STAGE_LATENCY.time(stage="auth"):
+        try:
+            payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+            username = payload.get("sub")
+            if username is None:
+                raise credentials_exception
+            token_data = TokenData(username=username)
+        except InvalidTokenError:
             raise credentials_exception
-        token_data = TokenData(username=username)
-    except InvalidTokenError:
-        raise credentials_exception
-    user = get_user(email=token_data.username)
-    if user is None:
-        raise credentials_exception
+        user = users.get(token_data.username)
+        if user is None:
+            user = await get_user(email=token_data.username, db=db)
+            if user is None:
+                raise credentials_exception
+            users.set(token_data.username, user)
     return user
 
 
@@ -96,9 +121,11 @@ async def get_current_active_user(
 
 @router.post("/token")
 async def login_for_access_token(
-    form_data: Annotated[OAuth2PasswordRequestForm, Depends()]
+    form_data: Annotated[OAuth2PasswordRequestForm, Depends()],
+    db: Annotated[Neo4jDatabase, Depends(get_db)],
 ) -> Token:
-    user = authenticate_user(form_data.username, form_data.password)
+    with span("login"), STAGE_LATENCY.time(stage="login"):
+        user = await authenticate_user(form_data.username, form_data.password, db)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -120,15 +147,18 @@ async def read_users_me(
 
 
 @router.post("/")
-def create_user(user: User) -> User:
-    user.password = get_password_hash(user.password)
-    embedder = EmbbeddingHuggingFace()
-    db = Neo4jDatabase(embedder)
+async def create_user(
+    user: User,
+    db: Annotated[Neo4jDatabase, Depends(get_db)],
+    users: Annotated[TTLCache, Depends(get_user_cache)],
+) -> User:
+    user.password = await aget_password_hash(user.password)
     try:
-        db.get_basemodel(user)
+        await db.aget_basemodel(user)
         raise HTTPException(status.HTTP_400_BAD_REQUEST, "User already exists")
     except (IndexError, TypeError):
-        db.save_basemodel(user)
+        await db.asave_basemodel(user)
+    users.delete(user.email)
     return user
 
 
@@ -137,11 +167,12 @@ def create_user(user: User) -> User:
     dependencies=[Depends(get_current_active_user)],
     tags=["user"],
 )
-def delete_current_user(
-    current_user: Annotated[User, Depends(get_current_active_user)]
+async def delete_current_user(
+    current_user: Annotated[User, Depends(get_current_active_user)],
+    db: Annotated[Neo4jDatabase, Depends(get_db)],
+    users: Annotated[TTLCache, Depends(get_user_cache)],
 ) -> User:
-    embedder = EmbbeddingHuggingFace()
-    db = Neo4jDatabase(embedder)
-    db.delete_basemodel(current_user)
+    await db.adelete_basemodel(current_user)
+    users.delete(current_user.email)
 
     return current_user
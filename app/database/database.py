@@ -1,44 +1,179 @@
-from typing import Any
+from typing import Any, AsyncIterator, Callable, List, Tuple
 from langchain_neo4j import Neo4jGraph
 from os import getenv
 
-from neo4j import EagerResult
+from neo4j import AsyncDriver, AsyncGraphDatabase, Driver, EagerResult
 from neo4j.exceptions import ConstraintError
 from neo4j_graphrag.llm import LLMInterface
 from neo4j_graphrag.embeddings import Embedder
-from neo4j_graphrag.experimental.pipeline.kg_builder import SimpleKGPipeline
-from app.utils.tools import singleton
+from app.utils.singleflight import SingleFlight
+from app.utils.tools import (
+    hash_file,
+    hash_text,
+    normalize_text,
+    scope_key,
+    singleton,
+)
 from pydantic import BaseModel
 import asyncio
-from neo4j_graphrag.retrievers.vector import VectorCypherRetriever
+from uuid import uuid4
+from weakref import WeakKeyDictionary
 from neo4j_graphrag.generation import GraphRAG
 from neo4j_graphrag.generation.types import RagResultModel
 from neo4j_graphrag.experimental.components.text_splitters.base import TextSplitter
+from neo4j_graphrag.experimental.components.text_splitters.fixed_size_splitter import (
+    FixedSizeSplitter,
+)
+from neo4j_graphrag.experimental.components.entity_relation_extractor import (
+    LLMEntityRelationExtractor,
+    OnError,
+)
+from neo4j_graphrag.experimental.components.kg_writer import Neo4jWriter
+from neo4j_graphrag.experimental.components.pdf_loader import PdfLoader
+from neo4j_graphrag.experimental.components.resolver import (
+    SinglePropertyExactMatchResolver,
+)
+from neo4j_graphrag.experimental.components.types import (
+    LexicalGraphConfig,
+    Neo4jGraph as KnowledgeGraph,
+    TextChunk,
+    TextChunks,
+)
 
 from neo4j_graphrag.generation.prompts import RagTemplate
 
-from neo4j_graphrag.experimental.pipeline.pipeline import PipelineResult
 from neo4j_graphrag.message_history import Neo4jMessageHistory
+from neo4j_graphrag.types import LLMMessage
+
+from app.database.graphrag import (
+    AsyncGraphRAG,
+    AsyncHybridCypherRetriever,
+    AsyncVectorCypherRetriever,
+    format_chunk_record,
+)
+from app.database.message_history import AsyncNeo4jMessageHistory
+from app.model.models import IngestionMode, IngestionResult
+from app.utils.cache import SemanticAnswerCache
+from app.utils.context import ContextAssembler
+from app.utils.metrics import INGESTED_CHUNKS, STAGE_LATENCY
+from app.utils.profiling import ProfiledDriver, query_span
+from app.utils.rerank import LexicalReranker
+from app.utils.prompts import SUMMARY_SYSTEM_INSTRUCTIONS
+
+ProgressCallback = Callable[[str, int, int], None]
+
+
+class GraphWriteError(Exception):
+    pass
+
+
+SCHEMA_VERSION = 2
+SCHEMA_QUERIES = [
+    """
+    CREATE VECTOR INDEX chunkEmbeddings IF NOT EXISTS
+    FOR (c:Chunk)
+    ON c.embedding
+    OPTIONS {
+    indexConfig: {
+        `vector.dimensions`: $dimensions,
+        `vector.similarity_function`: 'cosine'
+    }
+    }""",
+    "CREATE CONSTRAINT user_email IF NOT EXISTS "
+    "FOR (u:User) REQUIRE u.email IS UNIQUE",
+    "CREATE CONSTRAINT session_id IF NOT EXISTS "
+    "FOR (s:Session) REQUIRE s.id IS UNIQUE",
+    "CREATE INDEX document_subject IF NOT EXISTS FOR (d:Document) ON (d.subject)",
+    "CREATE INDEX document_file_name IF NOT EXISTS FOR (d:Document) ON (d.file_name)",
+    "CREATE INDEX chunk_hash IF NOT EXISTS FOR (c:Chunk) ON (c.hash)",
+    "CREATE FULLTEXT INDEX chunkText IF NOT EXISTS FOR (c:Chunk) ON EACH [c.text] "
+    "OPTIONS {indexConfig: {`fulltext.analyzer`: 'english'}}",
+]
+
+RETRIEVAL_QUERY = """
+    WITH node AS chunk, score
+    MATCH (chunk)-[:FROM_DOCUMENT]->(doc:Document)
+    RETURN chunk.text AS text,
+        doc.subject AS subject,
+        doc.file_name AS tittle,
+        score
+"""
 
 
 @singleton
 class Neo4jDatabase:
-    def __init__(self, embedder: Embedder) -> None:
+    def __init__(
+        self,
+        embedder: Embedder,
+        context: ContextAssembler | None = None,
+        driver: Driver | None = None,
+        async_driver_factory: Callable[[], AsyncDriver] | None = None,
+    ) -> None:
         url: str = getenv("NEO4J_URI")
         username: str = getenv("NEO4J_USERNAME")
         password: str = getenv("NEO4J_PASSWORD")
         self.database: str = getenv("NEO4J_DATABASE")
-        self.__graph: Neo4jGraph = Neo4jGraph(
-            url=url, username=username, password=password, database=self.database
+        self.__graph: Neo4jGraph | None = None
+        if driver is None:
+            self.__graph = Neo4jGraph(
+                url=url, username=username, password=password, database=self.database
+            )
+            driver = self.__graph._driver
+        self.__driver = driver
+        self.__async_driver_factory = async_driver_factory or (
+            lambda: AsyncGraphDatabase.driver(url, auth=(username, password))
         )
-        self.__driver = self.__graph._driver
+        self.__async_drivers: WeakKeyDictionary = WeakKeyDictionary()
         self.embedder = embedder
+        self.context = context
         self.retriever = None
-        self.vector_dimensions = int(getenv("VECTOR_DIMENSIONS"))
+        self.vector_dimensions = int(getenv("VECTOR_DIMENSIONS") or 384)
+        self.write_batch_size = int(getenv("INGESTION_WRITE_BATCH_SIZE") or 1000)
+        self.retrieval_mode = getenv("RETRIEVAL_MODE", "hybrid")
+        self.retrieval_top_k = int(getenv("RETRIEVAL_TOP_K") or 3)
+        self.retrieval_candidates = int(getenv("RETRIEVAL_CANDIDATES") or 20)
+        self.rerank_weight = float(getenv("RERANK_WEIGHT") or 0.3)
+        self.schema_version: int | None = None
+        self.rag_flights = SingleFlight()
+        self.answer_cache = SemanticAnswerCache(
+            threshold=float(getenv("ANSWER_CACHE_THRESHOLD") or 0.95),
+            max_size=int(getenv("ANSWER_CACHE_SIZE") or 512),
+            ttl=float(getenv("ANSWER_CACHE_TTL_SECONDS") or 86400),
+        )
 
-    def get_graph(self) -> Neo4jGraph:
+    def get_graph(self) -> Neo4jGraph | None:
         return self.__graph
 
+    def get_async_driver(self) -> AsyncDriver:
+        loop = asyncio.get_running_loop()
+        driver = self.__async_drivers.get(loop)
+        if driver is None:
+            driver = self.__async_driver_factory()
+            self.__async_drivers[loop] = driver
+        return driver
+
+    async def aclose(self) -> None:
+        driver = self.__async_drivers.pop(asyncio.get_running_loop(), None)
+        if driver is not None:
+            await driver.close()
+
+    def close(self) -> None:
+        self.__driver.close()
+
+    def __execute_query(
+        self, query: str, parameters: dict | None = None, **kwargs: Any
+    ) -> EagerResult:
+        with query_span(query, parameters):
+            return self.__driver.execute_query(query, parameters, **kwargs)
+
+    async def __aexecute_query(
+        self, query: str, parameters: dict | None = None, **kwargs: Any
+    ) -> EagerResult:
+        with query_span(query, parameters):
+            return await self.get_async_driver().execute_query(
+                query, parameters, **kwargs
+            )
+
     def __extract_keys_basemodel(self, model: BaseModel) -> tuple:
         model_cls = model.__class__
         label = model_cls.__name__
@@ -65,7 +200,7 @@ class Neo4jDatabase:
         SET {set_props}
         RETURN n
         """
-        records, _, _ = self.__driver.execute_query(query, data)
+        records, _, _ = self.__execute_query(query, data)
         return records
 
     def get_basemodel(self, model: BaseModel) -> BaseModel:
@@ -74,7 +209,33 @@ class Neo4jDatabase:
         query = f"""
         MATCH (n:{label} {{{merge_keys}}})
         RETURN n"""
-        records, _, _ = self.__driver.execute_query(query, merge_data)
+        records, _, _ = self.__execute_query(query, merge_data)
+        model_cls = model.__class__
+        model_found = model_cls(**records[0][0])
+        return model_found
+
+    async def asave_basemodel(self, model: BaseModel) -> list:
+        label, data, merge_keys, set_props, _ = self.__extract_keys_basemodel(model)
+
+        query = f"""
+        MERGE (n:{label} {{{merge_keys}}})
+        SET {set_props}
+        RETURN n
+        """
+        records, _, _ = await self.__aexecute_query(
+            query, data, database_=self.database
+        )
+        return records
+
+    async def aget_basemodel(self, model: BaseModel) -> BaseModel:
+        label, _, merge_keys, _, merge_data = self.__extract_keys_basemodel(model)
+
+        query = f"""
+        MATCH (n:{label} {{{merge_keys}}})
+        RETURN n"""
+        records, _, _ = await self.__aexecute_query(
+            query, merge_data, database_=self.database
+        )
         model_cls = model.__class__
         model_found = model_cls(**records[0][0])
         return model_found
@@ -85,7 +246,18 @@ class Neo4jDatabase:
             MATCH (n:{label} {{{merge_keys}}})
             DETACH DELETE n
         """
-        records, _, _ = self.__driver.execute_query(query, merge_data)
+        records, _, _ = self.__execute_query(query, merge_data)
+        return records
+
+    async def adelete_basemodel(self, model: BaseModel) -> list:
+        label, _, merge_keys, _, merge_data = self.__extract_keys_basemodel(model)
+        query = f"""
+            MATCH (n:{label} {{{merge_keys}}})
+            DETACH DELETE n
+        """
+        records, _, _ = await self.__aexecute_query(
+            query, merge_data, database_=self.database
+        )
         return records
 
     def create_graph_from_pdf(
@@ -94,43 +266,373 @@ class Neo4jDatabase:
         file_path: str,
         document_metada: dict = None,
         text_splitter: TextSplitter = None,
-    ) -> PipelineResult:
+        mode: IngestionMode = IngestionMode.GRAPH,
+    ) -> IngestionResult:
+        return asyncio.run(
+            self.acreate_graph_from_pdf(
+                llm=llm,
+                file_path=file_path,
+                document_metada=document_metada,
+                text_splitter=text_splitter,
+                mode=mode,
+            )
+        )
 
-        kg_builder = SimpleKGPipeline(
-            llm=llm,
-            driver=self.__driver,
-            neo4j_database=self.database,
-            embedder=self.embedder,
-            from_pdf=True,
-            text_splitter=text_splitter,
+    async def acreate_graph_from_pdf(
+        self,
+        llm: LLMInterface,
+        file_path: str,
+        document_metada: dict = None,
+        text_splitter: TextSplitter = None,
+        on_progress: ProgressCallback | None = None,
+        mode: IngestionMode = IngestionMode.GRAPH,
+    ) -> IngestionResult:
+        if self.schema_version is None:
+            self.bootstrap_schema()
+        metadata = document_metada or {}
+        progress = on_progress or (lambda stage, processed, total: None)
+        document_hash = hash_file(file_path)
+        stored_hash, stored_chunks = self.__get_document_chunks(metadata)
+        if stored_hash == document_hash:
+            progress("unchanged", len(stored_chunks), len(stored_chunks))
+            return IngestionResult(
+                document_hash=document_hash,
+                chunks_total=len(stored_chunks),
+                unchanged=True,
+            )
+
+        progress("loader", 0, 0)
+        document = await PdfLoader().run(filepath=file_path, metadata=metadata)
+        progress("splitter", 0, 0)
+        splitter = text_splitter or FixedSizeSplitter()
+        split = await splitter.run(text=document.text)
+        chunk_hashes: dict[str, str] = {}
+        for chunk in split.chunks:
+            chunk_hashes.setdefault(hash_text(chunk.text), chunk.text)
+
+        kept: set[str] = set()
+        removed: list[str] = []
+        for element_id, chunk_hash in stored_chunks:
+            if chunk_hash in chunk_hashes and chunk_hash not in kept:
+                kept.add(chunk_hash)
+            else:
+                removed.append(element_id)
+        ingestion_id = str(uuid4())
+        new_chunks = [
+            TextChunk(
+                text=text,
+                index=index,
+                metadata={
+                    "hash": chunk_hash,
+                    "ingestion_id": ingestion_id,
+                    "extracted": mode == IngestionMode.GRAPH,
+                },
+            )
+            for index, (chunk_hash, text) in enumerate(chunk_hashes.items())
+            if chunk_hash not in kept
+        ]
+        total = len(chunk_hashes)
+        node_ids: list[str] = []
+        try:
+            if new_chunks:
+                progress("embedder", total - len(new_chunks), total)
+                with STAGE_LATENCY.time(stage="ingestion_embedding"):
+                    embeddings = await self.embedder.aembed_documents(
+                        [chunk.text for chunk in new_chunks]
+                    )
+                for chunk, embedding in zip(new_chunks, embeddings):
+                    chunk.metadata["embedding"] = embedding
+                chunks = TextChunks(chunks=new_chunks)
+                if mode == IngestionMode.GRAPH:
+                    progress("extractor", total - len(new_chunks), total)
+                    extractor = LLMEntityRelationExtractor(
+                        llm=llm, on_error=OnError.IGNORE
+                    )
+                    with STAGE_LATENCY.time(stage="ingestion_extraction"):
+                        graph = await extractor.run(chunks=chunks)
+                    node_ids = [node.id for node in graph.nodes]
+                    progress("writer", total - len(new_chunks), total)
+                    with STAGE_LATENCY.time(stage="ingestion_write"):
+                        await self.__write_graph(graph)
+                else:
+                    progress("writer", total - len(new_chunks), total)
+                    with STAGE_LATENCY.time(stage="ingestion_write"):
+                        self.__write_chunks(chunks.chunks)
+                INGESTED_CHUNKS.inc(len(new_chunks), mode=mode.value)
+
+            progress("cleaner", total - len(new_chunks), total)
+            if removed:
+                self.__reset_document_hash(metadata)
+                self.__delete_chunks(removed)
+            progress("linker", total, total)
+            self.__link_document_chunks(
+                metadata,
+                document_hash,
+                file_path,
+                ingestion_id,
+                list(chunk_hashes),
+            )
+        except (Exception, asyncio.CancelledError):
+            self.__discard_ingestion(ingestion_id, node_ids)
+            raise
+        if new_chunks and mode == IngestionMode.GRAPH:
+            progress("resolver", total, total)
+            await self.__resolver().run()
+        progress("completed", total, total)
+        self.answer_cache.invalidate()
+        return IngestionResult(
+            document_hash=document_hash,
+            chunks_total=total,
+            chunks_added=len(new_chunks),
+            chunks_removed=len(removed),
+        )
+
+    async def aextract_entities(
+        self,
+        llm: LLMInterface,
+        document_metada: dict,
+        on_progress: ProgressCallback | None = None,
+    ) -> int:
+        progress = on_progress or (lambda stage, processed, total: None)
+        keys = ", ".join([f"{k}: $metadata.{k}" for k in document_metada.keys()])
+        query = f"""
+            MATCH (d:Document {{{keys}}})<-[:FROM_DOCUMENT]-(c:Chunk)
+            WHERE c.extracted = false
+            SET c:__KGBuilder__, c.__tmp_internal_id = elementId(c)
+            RETURN elementId(c) AS element_id, c.text AS text, c.index AS index
+        """
+        records, _, _ = self.__execute_query(
+            query, {"metadata": document_metada}, database_=self.database
+        )
+        progress("extractor", 0, len(records))
+        if not records:
+            return 0
+        chunks = TextChunks(
+            chunks=[
+                TextChunk(
+                    text=record["text"],
+                    index=record["index"] or 0,
+                    uid=record["element_id"],
+                )
+                for record in records
+            ]
+        )
+        extractor = LLMEntityRelationExtractor(
+            llm=llm, create_lexical_graph=False, on_error=OnError.IGNORE
+        )
+        graph = await extractor.run(
+            chunks=chunks, lexical_graph_config=LexicalGraphConfig()
+        )
+        progress("writer", 0, len(records))
+        try:
+            await self.__write_graph(graph)
+        except Exception:
+            self.__delete_written_nodes([node.id for node in graph.nodes])
+            raise
+        self.__execute_query(
+            """
+            MATCH (c:Chunk) WHERE elementId(c) IN $element_ids
+            SET c.extracted = true
+            """,
+            {"element_ids": [record["element_id"] for record in records]},
+            database_=self.database,
+        )
+        progress("resolver", len(records), len(records))
+        await self.__resolver().run()
+        progress("completed", len(records), len(records))
+        return len(records)
+
+    def __writer(self) -> Neo4jWriter:
+        writer = Neo4jWriter(self.__driver, neo4j_database=self.database)
+        writer.driver = ProfiledDriver(writer.driver)
+        return writer
+
+    async def __write_graph(self, graph: KnowledgeGraph) -> None:
+        result = await self.__writer().run(graph)
+        if result.status != "SUCCESS":
+            raise GraphWriteError((result.metadata or {}).get("error", result.status))
+
+    def __resolver(self) -> SinglePropertyExactMatchResolver:
+        resolver = SinglePropertyExactMatchResolver(
+            self.__driver, neo4j_database=self.database
+        )
+        resolver.driver = ProfiledDriver(resolver.driver)
+        return resolver
+
+    def __write_chunks(self, chunks: list[TextChunk]) -> None:
+        query = """
+            UNWIND $rows AS row
+            CREATE (c:Chunk:__KGBuilder__ {id: row.id})
+            SET c += row.properties
+            WITH c, row
+            CALL db.create.setNodeVectorProperty(c, 'embedding', row.embedding)
+        """
+        rows = [
+            {
+                "id": chunk.uid,
+                "embedding": chunk.metadata.pop("embedding"),
+                "properties": {"text": chunk.text, "index": chunk.index}
+                | chunk.metadata,
+            }
+            for chunk in chunks
+        ]
+        for start in range(0, len(rows), self.write_batch_size):
+            self.__execute_query(
+                query,
+                {"rows": rows[start : start + self.write_batch_size]},
+                database_=self.database,
+            )
+
+    def __get_document_chunks(self, metadata: dict) -> tuple[str | None, list]:
+        keys = ", ".join([f"{k}: $metadata.{k}" for k in metadata.keys()])
+        query = f"""
+            MATCH (d:Document {{{keys}}})
+            RETURN d.hash AS hash,
+                [(c:Chunk)-[:FROM_DOCUMENT]->(d) | [elementId(c), c.hash]] AS chunks
+        """
+        records, _, _ = self.__execute_query(
+            query, {"metadata": metadata}, database_=self.database
         )
-        result = asyncio.run(
-            kg_builder.run_async(file_path=file_path, document_metadata=document_metada)
+        if not records:
+            return None, []
+        document_hash = records[0]["hash"] if len(records) == 1 else None
+        chunks = [tuple(chunk) for record in records for chunk in record["chunks"]]
+        return document_hash, chunks
+
+    def __reset_document_hash(self, metadata: dict) -> None:
+        keys = ", ".join([f"{k}: $metadata.{k}" for k in metadata.keys()])
+        self.__execute_query(
+            f"MATCH (d:Document {{{keys}}}) REMOVE d.hash",
+            {"metadata": metadata},
+            database_=self.database,
         )
-        self.__create_vector_index()
-        return result
 
-    def __create_vector_index(self) -> None:
+    def __delete_chunks(self, element_ids: list[str]) -> None:
+        if not element_ids:
+            return
         query = """
-        CREATE VECTOR INDEX chunkEmbeddings IF NOT EXISTS 
-        FOR (c:Chunk)
-        ON c.embedding
-        OPTIONS {
-        indexConfig: {
-            `vector.dimensions`: $dimensions,
-            `vector.similarity_function`: 'cosine'
+            MATCH (c:Chunk) WHERE elementId(c) IN $element_ids
+            OPTIONAL MATCH (e)-[:FROM_CHUNK]->(c)
+            WITH c, collect(e) AS entities
+            DETACH DELETE c
+            WITH entities
+            UNWIND entities AS e
+            WITH DISTINCT e
+            WHERE NOT (e)-[:FROM_CHUNK]->()
+            DETACH DELETE e
+        """
+        self.__execute_query(
+            query, {"element_ids": element_ids}, database_=self.database
+        )
+
+    def __discard_ingestion(self, ingestion_id: str, node_ids: list[str]) -> None:
+        records, _, _ = self.__execute_query(
+            "MATCH (c:Chunk {ingestion_id: $ingestion_id}) "
+            "RETURN elementId(c) AS element_id",
+            {"ingestion_id": ingestion_id},
+            database_=self.database,
+        )
+        self.__delete_chunks([record["element_id"] for record in records])
+        self.__delete_written_nodes(node_ids)
+
+    def __delete_written_nodes(self, node_ids: list[str]) -> None:
+        if node_ids:
+            self.__execute_query(
+                "MATCH (n:__KGBuilder__) WHERE n.__tmp_internal_id IN $node_ids "
+                "DETACH DELETE n",
+                {"node_ids": node_ids},
+                database_=self.database,
+            )
+
+    def __link_document_chunks(
+        self,
+        metadata: dict,
+        document_hash: str,
+        file_path: str,
+        ingestion_id: str,
+        chunk_hashes: list[str],
+    ) -> None:
+        keys = ", ".join([f"{k}: $metadata.{k}" for k in metadata.keys()])
+        link_query = f"""
+            MERGE (d:Document {{{keys}}})
+            SET d.hash = $document_hash, d.path = $path
+            WITH d
+            UNWIND $chunks AS row
+            MATCH (c:Chunk {{hash: row.hash}})
+            WHERE c.ingestion_id = $ingestion_id OR (c)-[:FROM_DOCUMENT]->(d)
+            MERGE (c)-[:FROM_DOCUMENT]->(d)
+            SET c.index = row.index
+            REMOVE c.ingestion_id
+        """
+        next_chunk_query = f"""
+            MATCH (d:Document {{{keys}}})<-[:FROM_DOCUMENT]-(c:Chunk)
+            OPTIONAL MATCH (c)-[r:NEXT_CHUNK]->()
+            DELETE r
+            WITH DISTINCT c ORDER BY c.index
+            WITH collect(c) AS chunks
+            UNWIND range(0, size(chunks) - 2) AS index
+            WITH chunks[index] AS previous, chunks[index + 1] AS next
+            MERGE (previous)-[:NEXT_CHUNK]->(next)
+        """
+        parameters = {
+            "metadata": metadata,
+            "document_hash": document_hash,
+            "path": file_path,
+            "ingestion_id": ingestion_id,
+            "chunks": [
+                {"hash": chunk_hash, "index": index}
+                for index, chunk_hash in enumerate(chunk_hashes)
+            ],
         }
-        }"""
-        self.__driver.execute_query(query, {"dimensions": self.vector_dimensions})
+        self.__execute_query(link_query, parameters, database_=self.database)
+        self.__execute_query(
+            next_chunk_query, {"metadata": metadata}, database_=self.database
+        )
+
+    def bootstrap_schema(self) -> int:
+        records, _, _ = self.__execute_query(
+            "MATCH (v:SchemaVersion) RETURN max(v.version) AS version",
+            database_=self.database,
+        )
+        version = records[0]["version"] if records else None
+        if version is None or version < SCHEMA_VERSION:
+            for query in SCHEMA_QUERIES:
+                self.__execute_query(
+                    query,
+                    {"dimensions": self.vector_dimensions},
+                    database_=self.database,
+                )
+            self.__execute_query(
+                """
+                MERGE (v:SchemaVersion {id: 'schema'})
+                SET v.version = $version, v.appliedAt = datetime()
+                """,
+                {"version": SCHEMA_VERSION},
+                database_=self.database,
+            )
+            version = SCHEMA_VERSION
+        self.schema_version = version
+        return version
 
     def delete_document_with_metadata(self, metadata: dict) -> EagerResult:
-        keys = " AND ".join([f"d.{k}= ${k}" for k in metadata.keys()])
+        keys = ", ".join([f"{k}: $metadata.{k}" for k in metadata.keys()])
         query = f"""
-            MATCH (d:Document)-[r]-(c)-[re]-(e)
-            WHERE {keys}
-            DETACH DELETE d,c,e,r,re
+            MATCH (d:Document {{{keys}}})
+            OPTIONAL MATCH (d)<-[:FROM_DOCUMENT]-(c:Chunk)
+            OPTIONAL MATCH (c)<-[:FROM_CHUNK]-(e)
+            WITH collect(DISTINCT d) AS documents,
+                collect(DISTINCT c) AS chunks,
+                collect(DISTINCT e) AS entities
+            FOREACH (node IN documents + chunks | DETACH DELETE node)
+            WITH entities
+            UNWIND entities AS e
+            WITH e WHERE NOT (e)-[:FROM_CHUNK]->()
+            DETACH DELETE e
         """
-        records, _, _ = self.__driver.execute_query(query, metadata)
+        records, _, _ = self.__execute_query(
+            query, {"metadata": metadata}, database_=self.database
+        )
+        self.answer_cache.invalidate()
         return records
 
     def rag_response(
@@ -143,24 +645,132 @@ class Neo4jDatabase:
         if not self.retriever:
             self.set_retriever(self.embedder)
         rag = GraphRAG(retriever=self.retriever, llm=llm, prompt_template=rag_template)
+        if self.context is not None:
+            message_history, _ = self.context.fit_history(message_history)
         response = rag.search(
             query_text=query_text, return_context=True, message_history=message_history
         )
         return response
 
+    async def arag_response(
+        self,
+        llm: LLMInterface,
+        query_text: str,
+        message_history: list[LLMMessage] = [],
+        rag_template: RagTemplate = None,
+        filters: dict[str, str] | None = None,
+    ) -> RagResultModel:
+        if not self.retriever:
+            self.set_retriever(self.embedder)
+        if message_history:
+            rag = AsyncGraphRAG(
+                retriever=self.retriever,
+                llm=llm,
+                prompt_template=rag_template,
+                context=self.context,
+            )
+            return await rag.asearch(
+                query_text=query_text,
+                message_history=message_history,
+                retriever_config={"filters": filters},
+            )
+        return await self.rag_flights.do(
+            (normalize_text(query_text), scope_key(filters)),
+            lambda: self.__aanswer(llm, query_text, rag_template, filters),
+        )
+
+    async def __aanswer(
+        self,
+        llm: LLMInterface,
+        query_text: str,
+        rag_template: RagTemplate = None,
+        filters: dict[str, str] | None = None,
+    ) -> RagResultModel:
+        scope = scope_key(filters)
+        version = self.answer_cache.version
+        embedding = await self.embedder.async_embed_query(query_text)
+        answer = self.answer_cache.get(embedding, scope)
+        if answer is not None:
+            return RagResultModel(answer=answer)
+        rag = AsyncGraphRAG(
+            retriever=self.retriever,
+            llm=llm,
+            prompt_template=rag_template,
+            context=self.context,
+        )
+        response = await rag.asearch(
+            query_text=query_text, retriever_config={"filters": filters}
+        )
+        self.answer_cache.set(embedding, response.answer, scope, version)
+        return response
+
+    async def arag_stream(
+        self,
+        llm: LLMInterface,
+        query_text: str,
+        message_history: list[LLMMessage] = [],
+        rag_template: RagTemplate = None,
+        filters: dict[str, str] | None = None,
+    ) -> AsyncIterator[str]:
+        if not self.retriever:
+            self.set_retriever(self.embedder)
+        rag = AsyncGraphRAG(
+            retriever=self.retriever,
+            llm=llm,
+            prompt_template=rag_template,
+            context=self.context,
+        )
+        retriever_config = {"filters": filters}
+        if message_history:
+            async for token in rag.astream(
+                query_text=query_text,
+                message_history=message_history,
+                retriever_config=retriever_config,
+            ):
+                yield token
+            return
+        scope = scope_key(filters)
+        version = self.answer_cache.version
+        embedding = await self.embedder.async_embed_query(query_text)
+        answer = self.answer_cache.get(embedding, scope)
+        if answer is not None:
+            yield answer
+            return
+        tokens = []
+        async for token in rag.astream(
+            query_text=query_text, retriever_config=retriever_config
+        ):
+            tokens.append(token)
+            yield token
+        self.answer_cache.set(embedding, "".join(tokens), scope, version)
+
     def set_retriever(self, embedder: Embedder):
-        self.retriever = VectorCypherRetriever(
+        if self.retrieval_mode == "hybrid":
+            self.retriever = AsyncHybridCypherRetriever(
+                driver=self.__driver,
+                get_async_driver=self.get_async_driver,
+                embedder=embedder,
+                index_name="chunkEmbeddings",
+                fulltext_index_name="chunkText",
+                neo4j_database=self.database,
+                retrieval_query=RETRIEVAL_QUERY,
+                result_formatter=format_chunk_record,
+                top_k=self.retrieval_top_k,
+                candidates=self.retrieval_candidates,
+                reranker=(
+                    LexicalReranker(self.rerank_weight) if self.rerank_weight else None
+                ),
+            )
+            return
+        self.retriever = AsyncVectorCypherRetriever(
             driver=self.__driver,
+            get_async_driver=self.get_async_driver,
             embedder=embedder,
             index_name="chunkEmbeddings",
             neo4j_database=self.database,
-            retrieval_query="""
-                MATCH (chunk)-[]-(doc:Document)
-                RETURN chunk.text AS text,
-                    doc.subject AS subject,
-                    doc.file_name AS tittle,
-                    score
-            """,
+            retrieval_query=RETRIEVAL_QUERY,
+            result_formatter=format_chunk_record,
+            top_k=self.retrieval_top_k,
         )
 
     def get_message_history(
@@ -172,8 +782,179 @@ class Neo4jDatabase:
             database=self.database,
             window=window,
         )
+        history._driver = ProfiledDriver(history._driver)
         return history
 
+    async def aget_message_history(
+        self, session_id: str, window: int = 3
+    ) -> AsyncNeo4jMessageHistory:
+        history = AsyncNeo4jMessageHistory(
+            session_id=session_id,
+            driver=self.get_async_driver(),
+            database=self.database,
+            window=window,
+        )
+        await history.create_session()
+        return history
+
+    async def aopen_session(
+        self, model: BaseModel, session_id: str | None, window: int = 3
+    ) -> Tuple[AsyncNeo4jMessageHistory, List[LLMMessage]]:
+        label, _, merge_keys, _, merge_data = self.__extract_keys_basemodel(model)
+        query = f"""
+            OPTIONAL MATCH (owned:Session {{id: $session_id}})
+            WHERE EXISTS {{ (:{label} {{{merge_keys}}})-[:HAS_CONVERSATION]->(owned) }}
+            WITH coalesce(owned.id, $new_session_id) AS session_id
+            MATCH (n:{label} {{{merge_keys}}})
+            MERGE (s:Session {{id: session_id}})
+            ON CREATE SET s.createdAt = datetime()
+            ON MATCH SET s.updatedAt = datetime()
+            MERGE (n)-[:HAS_CONVERSATION]->(s)
+            WITH s
+            OPTIONAL MATCH (s)-[:HAS_SUMMARY]->(summary:Summary)
+                -[:SUMMARIZED_UP_TO]->(cursor)
+            OPTIONAL MATCH (s)-[:LAST_MESSAGE]->(last_message)
+            OPTIONAL MATCH p = (last_message)<-[:NEXT*0..{window - 1}]-()
+            WHERE cursor IS NULL OR NONE(node IN nodes(p) WHERE node = cursor)
+            WITH s, summary, p ORDER BY length(p) DESC LIMIT 1
+            RETURN s.id AS session_id,
+                summary.content AS summary,
+                CASE WHEN p IS NULL THEN [] ELSE
+                    [node IN reverse(nodes(p)) |
+                        {{role: node.role, content: node.content}}]
+                END AS messages
+        """
+        merge_data["session_id"] = session_id
+        merge_data["new_session_id"] = str(uuid4())
+        with STAGE_LATENCY.time(stage="session"):
+            records, _, _ = await self.__aexecute_query(
+                query, merge_data, database_=self.database
+            )
+        if not records:
+            raise ConstraintError(f"{label} not found")
+        history = AsyncNeo4jMessageHistory(
+            session_id=records[0]["session_id"],
+            driver=self.get_async_driver(),
+            database=self.database,
+            window=window,
+        )
+        messages = [
+            LLMMessage(role=message["role"], content=message["content"])
+            for message in records[0]["messages"]
+        ]
+        if records[0]["summary"]:
+            messages.insert(0, self.__summary_message(records[0]["summary"]))
+        return history, messages
+
+    async def arefresh_summary(
+        self, llm: LLMInterface, session_id: str, keep: int = 4, window: int = 28
+    ) -> str | None:
+        query = f"""
+            MATCH (s:Session {{id: $session_id}})-[:LAST_MESSAGE]->(last_message)
+            OPTIONAL MATCH (s)-[:HAS_SUMMARY]->(summary:Summary)
+                -[:SUMMARIZED_UP_TO]->(cursor)
+            MATCH p = (last_message)<-[:NEXT*0..{window - 1}]-()
+            WHERE cursor IS NULL OR NONE(node IN nodes(p) WHERE node = cursor)
+            WITH summary, p ORDER BY length(p) DESC LIMIT 1
+            RETURN summary.content AS summary,
+                [node IN reverse(nodes(p)) |
+                    {{id: elementId(node), role: node.role, content: node.content}}
+                ] AS messages
+        """
+        records, _, _ = await self.__aexecute_query(
+            query, {"session_id": session_id}, database_=self.database
+        )
+        if not records:
+            return None
+        messages = records[0]["messages"]
+        messages = messages[:-keep] if keep else messages
+        if not messages:
+            return None
+        with STAGE_LATENCY.time(stage="summary"):
+            response = await llm.ainvoke(
+                input=self.__summary_prompt(records[0]["summary"], messages),
+                system_instruction=SUMMARY_SYSTEM_INSTRUCTIONS,
+            )
+        query = """
+            MATCH (s:Session {id: $session_id})
+            MATCH (cursor:Message) WHERE elementId(cursor) = $cursor_id
+            MERGE (s)-[:HAS_SUMMARY]->(summary:Summary)
+            SET summary.content = $content,
+                summary.messages = coalesce(summary.messages, 0) + $count,
+                summary.updatedAt = datetime()
+            WITH summary, cursor
+            OPTIONAL MATCH (summary)-[previous:SUMMARIZED_UP_TO]->()
+            DELETE previous
+            WITH DISTINCT summary, cursor
+            CREATE (summary)-[:SUMMARIZED_UP_TO]->(cursor)
+        """
+        await self.__aexecute_query(
+            query,
+            {
+                "session_id": session_id,
+                "cursor_id": messages[-1]["id"],
+                "content": response.content,
+                "count": len(messages),
+            },
+            database_=self.database,
+        )
+        return response.content
+
+    def delete_session_summary(self, session_id: str) -> None:
+        query = """
+            MATCH (:Session {id: $session_id})-[:HAS_SUMMARY]->(summary:Summary)
+            DETACH DELETE summary
+        """
+        self.__execute_query(query, {"session_id": session_id})
+
+    @staticmethod
+    def __summary_message(summary: str) -> LLMMessage:
+        return LLMMessage(
+            role="system", content=f"Summary of the earlier conversation:\n{summary}"
+        )
+
+    @staticmethod
+    def __summary_prompt(summary: str | None, messages: List[dict]) -> str:
+        lines = "\n".join(
+            f"{message['role']}: {message['content']}" for message in messages
+        )
+        return f"Current summary:\n{summary or 'None'}\n\nNew messages:\n{lines}"
+
+    def save_messages_batch(self, rows: List[dict]) -> None:
+        query = """
+            UNWIND $rows AS row
+            MATCH (s:Session {id: row.session_id})
+            OPTIONAL MATCH (s)-[lm:LAST_MESSAGE]->(last_message)
+            DELETE lm
+            WITH s, last_message, row
+            UNWIND range(0, size(row.messages) - 1) AS index
+            CREATE (m:Message)
+            SET m += row.messages[index], m.createdAt = datetime()
+            WITH s, last_message, index, m ORDER BY index
+            WITH s, last_message, collect(m) AS created
+            WITH s, last_message, created, created[0] AS first, created[-1] AS latest
+            CREATE (s)-[:LAST_MESSAGE]->(latest)
+            FOREACH (previous IN CASE WHEN last_message IS NULL
+                THEN [] ELSE [last_message] END |
+                CREATE (previous)-[:NEXT]->(first))
+            FOREACH (index IN range(0, size(created) - 2) |
+                FOREACH (current IN [created[index]] |
+                    FOREACH (next IN [created[index + 1]] |
+                        CREATE (current)-[:NEXT]->(next))))
+        """
+        rows = [
+            {
+                "session_id": row["session_id"],
+                "messages": [
+                    {"role": message["role"], "content": message["content"]}
+                    for message in row["messages"]
+                ],
+            }
+            for row in rows
+        ]
+        with STAGE_LATENCY.time(stage="history_write"):
+            self.__execute_query(query, {"rows": rows}, database_=self.database)
+
     def link_basemodel_to_session(
         self, model: BaseModel, session_id: str
     ) -> EagerResult:
@@ -186,7 +967,24 @@ class Neo4jDatabase:
         RETURN n,r,s
         """
         merge_data["session_id"] = session_id
-        records, _, _ = self.__driver.execute_query(query, merge_data)
+        records, _, _ = self.__execute_query(query, merge_data)
+        return records
+
+    async def alink_basemodel_to_session(
+        self, model: BaseModel, session_id: str
+    ) -> list:
+        label, _, merge_keys, _, merge_data = self.__extract_keys_basemodel(model)
+
+        query = f"""
+        MATCH (n:{label} {{{merge_keys}}})
+        MATCH (s:Session {{id: $session_id}})
+        MERGE (n)-[r:HAS_CONVERSATION]->(s)
+        RETURN n,r,s
+        """
+        merge_data["session_id"] = session_id
+        records, _, _ = await self.__aexecute_query(
+            query, merge_data, database_=self.database
+        )
         return records
 
     def get_sessions_from_user(self, user: BaseModel) -> EagerResult:
@@ -195,5 +993,16 @@ class Neo4jDatabase:
             MATCH (n:{label} {{{merge_keys}}})-[]->(s:Session)
             RETURN s.id
             """
-        records, _, _ = self.__driver.execute_query(query, merge_data)
+        records, _, _ = self.__execute_query(query, merge_data)
+        return records
+
+    async def aget_sessions_from_user(self, user: BaseModel) -> list:
+        label, _, merge_keys, _, merge_data = self.__extract_keys_basemodel(user)
+        query = f"""
+            MATCH (n:{label} {{{merge_keys}}})-[]->(s:Session)
+            RETURN s.id
+            """
+        records, _, _ = await self.__aexecute_query(
+            query, merge_data, database_=self.database
+        )
         return records
@@ -0,0 +1,345 @@
+from typing import Any, AsyncIterator, Callable, List, Tuple
+
+import neo4j
+from neo4j_graphrag.embeddings import Embedder
+from neo4j_graphrag.generation import GraphRAG
+from neo4j_graphrag.generation.prompts import RagTemplate
+from neo4j_graphrag.generation.types import RagResultModel
+from neo4j_graphrag.neo4j_queries import NODE_VECTOR_INDEX_QUERY
+from neo4j_graphrag.llm import LLMInterface
+from neo4j_graphrag.retrievers.base import Retriever
+from neo4j_graphrag.retrievers.vector import VectorCypherRetriever
+from neo4j_graphrag.types import LLMMessage, RetrieverResult, RetrieverResultItem
+
+from app.utils.context import ContextAssembler
+from app.utils.metrics import STAGE_LATENCY
+from app.utils.profiling import ProfiledDriver, query_span, span
+from app.utils.rerank import LexicalReranker
+from app.utils.tools import fulltext_query, search_terms
+
+SCOPE_FILTERS = ("subject", "file_name")
+SCOPED_VECTOR_QUERY = """
+    MATCH (doc:Document)<-[:FROM_DOCUMENT]-(node:Chunk)
+    WHERE {condition} AND node.embedding IS NOT NULL
+    WITH node, vector.similarity.cosine(node.embedding, $query_vector) AS score
+    ORDER BY score DESC
+    LIMIT $top_k
+"""
+VECTOR_INDEX_CANDIDATES = """
+        CALL db.index.vector.queryNodes($vector_index_name, $candidates, $query_vector)
+        YIELD node
+"""
+FULLTEXT_INDEX_CANDIDATES = """
+        CALL db.index.fulltext.queryNodes(
+            $fulltext_index_name, $fulltext_query, {{limit: $candidates}}
+        )
+        YIELD node
+"""
+SCOPED_VECTOR_CANDIDATES = """
+        MATCH (doc:Document)<-[:FROM_DOCUMENT]-(node:Chunk)
+        WHERE {condition} AND node.embedding IS NOT NULL
+        WITH node, vector.similarity.cosine(node.embedding, $query_vector) AS score
+        ORDER BY score DESC
+        LIMIT $candidates
+"""
+SCOPED_FULLTEXT_CANDIDATES = """
+        MATCH (doc:Document)<-[:FROM_DOCUMENT]-(node:Chunk)
+        WHERE {condition}
+        WITH node, toLower(node.text) AS text
+        WITH node, size([term IN $search_terms WHERE text CONTAINS term]) AS score
+        WHERE score > 0
+        ORDER BY score DESC
+        LIMIT $candidates
+"""
+HYBRID_RRF_QUERY = """
+    CALL {{
+        {vector}
+        WITH collect(node) AS nodes
+        UNWIND range(0, size(nodes) - 1) AS rank
+        RETURN nodes[rank] AS node, 1.0 / ($rrf_k + rank + 1) AS score
+        UNION ALL
+        {fulltext}
+        WITH collect(node) AS nodes
+        UNWIND range(0, size(nodes) - 1) AS rank
+        RETURN nodes[rank] AS node, 1.0 / ($rrf_k + rank + 1) AS score
+    }}
+    WITH node, sum(score) AS score
+    ORDER BY score DESC
+    LIMIT $top_k
+"""
+
+
+def scope_condition(filters: dict[str, str]) -> str:
+    unknown = set(filters) - set(SCOPE_FILTERS)
+    if unknown:
+        raise ValueError(f"Unknown retrieval filters: {', '.join(sorted(unknown))}")
+    return " AND ".join(
+        f"doc.{key} = ${key}" for key in SCOPE_FILTERS if key in filters
+    )
+
+
+def hybrid_query(filters: dict[str, str] | None = None) -> str:
+    if not filters:
+        return HYBRID_RRF_QUERY.format(
+            vector=VECTOR_INDEX_CANDIDATES.strip(),
+            fulltext=FULLTEXT_INDEX_CANDIDATES.format().strip(),
+        )
+    condition = scope_condition(filters)
+    return HYBRID_RRF_QUERY.format(
+        vector=SCOPED_VECTOR_CANDIDATES.format(condition=condition).strip(),
+        fulltext=SCOPED_FULLTEXT_CANDIDATES.format(condition=condition).strip(),
+    )
+
+
+def format_chunk_record(record: neo4j.Record) -> RetrieverResultItem:
+    return RetrieverResultItem(
+        content=record["text"],
+        metadata={
+            "subject": record.get("subject"),
+            "file_name": record.get("tittle"),
+            "score": record.get("score"),
+        },
+    )
+
+
+class AsyncVectorCypherRetriever(VectorCypherRetriever):
+    def __init__(
+        self,
+        driver: neo4j.Driver,
+        get_async_driver: Callable[[], neo4j.AsyncDriver],
+        index_name: str,
+        retrieval_query: str,
+        embedder: Embedder | None = None,
+        result_formatter: Callable[[neo4j.Record], RetrieverResultItem] | None = None,
+        neo4j_database: str | None = None,
+        top_k: int = 5,
+    ) -> None:
+        super().__init__(
+            driver=driver,
+            index_name=index_name,
+            retrieval_query=retrieval_query,
+            embedder=embedder,
+            result_formatter=result_formatter,
+            neo4j_database=neo4j_database,
+        )
+        self.driver = ProfiledDriver(self.driver)
+        self.get_async_driver = get_async_driver
+        self.top_k = top_k
+
+    async def asearch(
+        self,
+        query_text: str,
+        top_k: int | None = None,
+        filters: dict[str, str] | None = None,
+        vector_query_text: str | None = None,
+    ) -> RetrieverResult:
+        top_k = top_k or self.top_k
+        query_vector = await self.embedder.async_embed_query(
+            vector_query_text or query_text
+        )
+        if filters:
+            query = SCOPED_VECTOR_QUERY.format(condition=scope_condition(filters))
+        else:
+            query = NODE_VECTOR_INDEX_QUERY
+        query = f"{query}\n{self.retrieval_query}"
+        parameters = {
+            "vector_index_name": self.index_name,
+            "top_k": top_k,
+            "effective_search_ratio": 1,
+            "query_vector": query_vector,
+            **(filters or {}),
+        }
+        with STAGE_LATENCY.time(stage="vector_search"), query_span(query, parameters):
+            records, _, _ = await self.get_async_driver().execute_query(
+                query,
+                parameters,
+                database_=self.neo4j_database,
+                routing_=neo4j.RoutingControl.READ,
+            )
+        formatter = self.get_result_formatter()
+        return RetrieverResult(
+            items=[formatter(record) for record in records],
+            metadata={
+                "query_vector": query_vector,
+                "__retriever": self.__class__.__name__,
+            },
+        )
+
+
+class AsyncHybridCypherRetriever(AsyncVectorCypherRetriever):
+    def __init__(
+        self,
+        driver: neo4j.Driver,
+        get_async_driver: Callable[[], neo4j.AsyncDriver],
+        index_name: str,
+        fulltext_index_name: str,
+        retrieval_query: str,
+        embedder: Embedder | None = None,
+        result_formatter: Callable[[neo4j.Record], RetrieverResultItem] | None = None,
+        neo4j_database: str | None = None,
+        top_k: int = 5,
+        candidates: int = 20,
+        rrf_k: int = 60,
+        reranker: LexicalReranker | None = None,
+    ) -> None:
+        super().__init__(
+            driver=driver,
+            get_async_driver=get_async_driver,
+            index_name=index_name,
+            retrieval_query=retrieval_query,
+            embedder=embedder,
+            result_formatter=result_formatter,
+            neo4j_database=neo4j_database,
+            top_k=top_k,
+        )
+        self.fulltext_index_name = fulltext_index_name
+        self.candidates = candidates
+        self.rrf_k = rrf_k
+        self.reranker = reranker
+
+    async def asearch(
+        self,
+        query_text: str,
+        top_k: int | None = None,
+        filters: dict[str, str] | None = None,
+        vector_query_text: str | None = None,
+    ) -> RetrieverResult:
+        top_k = top_k or self.top_k
+        fulltext = fulltext_query(query_text)
+        if not fulltext:
+            return await super().asearch(query_text, top_k, filters, vector_query_text)
+        query_vector = await self.embedder.async_embed_query(
+            vector_query_text or query_text
+        )
+        query = f"{hybrid_query(filters)}\n{self.retrieval_query}"
+        candidates = max(self.candidates, top_k)
+        parameters = {
+            "vector_index_name": self.index_name,
+            "fulltext_index_name": self.fulltext_index_name,
+            "candidates": candidates,
+            "search_terms": list(dict.fromkeys(search_terms(query_text))),
+            "top_k": candidates if self.reranker else top_k,
+            "rrf_k": self.rrf_k,
+            "query_vector": query_vector,
+            "fulltext_query": fulltext,
+            **(filters or {}),
+        }
+        with STAGE_LATENCY.time(stage="hybrid_search"), query_span(query, parameters):
+            records, _, _ = await self.get_async_driver().execute_query(
+                query,
+                parameters,
+                database_=self.neo4j_database,
+                routing_=neo4j.RoutingControl.READ,
+            )
+        formatter = self.get_result_formatter()
+        items = sorted(
+            (formatter(record) for record in records),
+            key=lambda item: -float((item.metadata or {}).get("score") or 0),
+        )
+        if self.reranker is not None:
+            with STAGE_LATENCY.time(stage="rerank"), span("rerank", size=len(items)):
+                items = self.reranker.rerank(query_text, items)
+        return RetrieverResult(
+            items=items[:top_k],
+            metadata={
+                "query_vector": query_vector,
+                "__retriever": self.__class__.__name__,
+            },
+        )
+
+
+class AsyncGraphRAG(GraphRAG):
+    def __init__(
+        self,
+        retriever: Retriever,
+        llm: LLMInterface,
+        prompt_template: RagTemplate = RagTemplate(),
+        context: ContextAssembler | None = None,
+    ) -> None:
+        super().__init__(retriever, llm, prompt_template)
+        self.context = context
+
+    async def asearch(
+        self,
+        query_text: str,
+        message_history: List[LLMMessage] | None = None,
+        retriever_config: dict[str, Any] | None = None,
+        return_context: bool = True,
+    ) -> RagResultModel:
+        prompt, retriever_result, message_history = await self._abuild_prompt(
+            query_text, message_history, retriever_config
+        )
+        llm_response = await self.llm.ainvoke(
+            input=prompt,
+            message_history=message_history,
+            system_instruction=self.prompt_template.system_instructions,
+        )
+        result: dict[str, Any] = {"answer": llm_response.content}
+        if return_context:
+            result["retriever_result"] = retriever_result
+        return RagResultModel(**result)
+
+    async def astream(
+        self,
+        query_text: str,
+        message_history: List[LLMMessage] | None = None,
+        retriever_config: dict[str, Any] | None = None,
+    ) -> AsyncIterator[str]:
+        prompt, _, message_history = await self._abuild_prompt(
+            query_text, message_history, retriever_config
+        )
+        async for token in self.llm.astream(
+            input=prompt,
+            message_history=message_history,
+            system_instruction=self.prompt_template.system_instructions,
+        ):
+            yield token
+
+    async def _abuild_prompt(
+        self,
+        query_text: str,
+        message_history: List[LLMMessage] | None = None,
+        retriever_config: dict[str, Any] | None = None,
+    ) -> Tuple[str, RetrieverResult, List[LLMMessage] | None]:
+        if self.context is not None:
+            message_history = self.context.fit_prompt(
+                query_text, message_history, self.prompt_template
+            )
+        query = await self._abuild_query(query_text, message_history)
+        retriever_result = await self.retriever.asearch(
+            query_text=query_text,
+            vector_query_text=query,
+            **(retriever_config or {}),
+        )
+        if self.context is None:
+            context = "\n".join(item.content for item in retriever_result.items)
+        else:
+            context, message_history, usage = self.context.assemble(
+                query_text,
+                retriever_result.items,
+                message_history,
+                self.prompt_template,
+            )
+            retriever_result.metadata = (retriever_result.metadata or {}) | {
+                "context_usage": usage.model_dump()
+            }
+        prompt = self.prompt_template.format(
+            query_text=query_text, context=context, examples=""
+        )
+        return prompt, retriever_result, message_history
+
+    async def _abuild_query(
+        self, query_text: str, message_history: List[LLMMessage] | None = None
+    ) -> str:
+        if not message_history:
+            return query_text
+        summary = await self.llm.ainvoke(
+            input=self._chat_summary_prompt(message_history=message_history),
+            system_instruction=(
+                "You are a summarization assistant. "
+                "Summarize the given text in no more than 300 words."
+            ),
+        )
+        return self.conversation_prompt(
+            summary=summary.content, current_query=query_text
+        )
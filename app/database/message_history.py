@@ -0,0 +1,77 @@
+from typing import List
+
+from neo4j import AsyncDriver, EagerResult
+from neo4j_graphrag.message_history import (
+    ADD_MESSAGE_QUERY,
+    CREATE_SESSION_NODE_QUERY,
+    DELETE_MESSAGES_QUERY,
+    DELETE_SESSION_AND_MESSAGES_QUERY,
+    GET_MESSAGES_QUERY,
+)
+from neo4j_graphrag.types import LLMMessage
+
+from app.utils.metrics import STAGE_LATENCY
+from app.utils.profiling import query_span
+
+
+class AsyncNeo4jMessageHistory:
+    def __init__(
+        self,
+        session_id: str,
+        driver: AsyncDriver,
+        window: int | None = None,
+        database: str | None = None,
+    ) -> None:
+        self.session_id = session_id
+        self._driver = driver
+        self._window = "" if window is None else window - 1
+        self._database = database
+
+    async def create_session(self) -> None:
+        await self.__aexecute_query(
+            CREATE_SESSION_NODE_QUERY.format(node_label="Session")
+        )
+
+    async def aget_messages(self) -> List[LLMMessage]:
+        records, _, _ = await self.__aexecute_query(
+            GET_MESSAGES_QUERY.format(node_label="Session", window=self._window)
+        )
+        return [
+            LLMMessage(
+                content=record["result"]["data"]["content"],
+                role=record["result"]["role"],
+            )
+            for record in records
+        ]
+
+    async def aadd_messages(self, messages: List[LLMMessage]) -> None:
+        query = ADD_MESSAGE_QUERY.format(node_label="Session")
+        with (
+            STAGE_LATENCY.time(stage="history_write"),
+            query_span(query, {"session_id": self.session_id, "messages": messages}),
+        ):
+            async with self._driver.session(database=self._database) as session:
+                async with await session.begin_transaction() as tx:
+                    for message in messages:
+                        await tx.run(
+                            query,
+                            session_id=self.session_id,
+                            role=message["role"],
+                            content=message["content"],
+                        )
+                    await tx.commit()
+
+    async def aclear(self, delete_session_node: bool = False) -> None:
+        query = (
+            DELETE_SESSION_AND_MESSAGES_QUERY
+            if delete_session_node
+            else DELETE_MESSAGES_QUERY
+        )
+        await self.__aexecute_query(query.format(node_label="Session"))
+
+    async def __aexecute_query(self, query: str) -> EagerResult:
+        parameters = {"session_id": self.session_id}
+        with query_span(query, parameters):
+            return await self._driver.execute_query(
+                query, parameters, database_=self._database
+            )
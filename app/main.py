@@ -1,19 +1,55 @@
-from fastapi import Depends, FastAPI
+from contextlib import asynccontextmanager
+import math
+from fastapi import Depends, FastAPI, Request, status
+from fastapi.responses import JSONResponse
 from dotenv import load_dotenv
 
 load_dotenv("./.env")
+from app.controller.admin import router as admin_router
 from app.controller.file_uploader import router as file_route
 from app.controller.llm import router as llm_router
+from app.controller.metrics import router as metrics_router
 from app.controller.user import router as user_router, get_current_active_user
+from app.services.admission import AdmissionRejectedError
+from app.services.registry import ClientRegistry, get_registry
+from app.utils.profiling import ProfileMiddleware
 import toml
 
-
 with open("pyproject.toml", "r") as f:
     config = toml.load(f)
     config: dict = config.get("project")
 
 
-app = FastAPI(title="FAQChatbot", version=config.get("version"))
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    registry = ClientRegistry()
+    registry.warm_up()
+    registry.bootstrap_schema()
+    app.state.registry = registry
+    yield
+    await registry.aclose()
+
+
+app = FastAPI(title="FAQChatbot", version=config.get("version"), lifespan=lifespan)
 app.include_router(file_route, dependencies=[Depends(get_current_active_user)])
 app.include_router(llm_router, dependencies=[Depends(get_current_active_user)])
 app.include_router(user_router)
+app.include_router(admin_router, dependencies=[Depends(get_current_active_user)])
+app.include_router(metrics_router)
+
+
+app.add_middleware(
+    ProfileMiddleware,
+    get_profiler=lambda scope: get_registry(Request(scope)).profiler,
+)
+
+
+@app.exception_handler(AdmissionRejectedError)
+async def admission_rejected_handler(
+    request: Request, error: AdmissionRejectedError
+) -> JSONResponse:
+    return JSONResponse(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        content={"detail": str(error)},
+        headers={"Retry-After": str(math.ceil(error.retry_after))},
+    )
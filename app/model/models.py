@@ -1,4 +1,7 @@
+from datetime import datetime, timezone
+from enum import Enum
 from typing import Annotated
+from uuid import uuid4
 from pydantic import BaseModel, Field, EmailStr
 
 
@@ -15,6 +18,11 @@ class User(BaseModel):
 class Message(BaseModel):
     session_id: str | None = Field(default=None)
     text: str = Field()
+    subject: str | None = Field(default=None)
+    file_name: str | None = Field(default=None)
+
+    def filters(self) -> dict[str, str]:
+        return self.model_dump(include={"subject", "file_name"}, exclude_none=True)
 
 
 class LLMResponseEndpoint(BaseModel):
@@ -33,3 +41,61 @@ class Token(BaseModel):
 
 class TokenData(BaseModel):
     username: str | None = None
+
+
+class JobStatus(str, Enum):
+    PENDING = "pending"
+    RUNNING = "running"
+    COMPLETED = "completed"
+    FAILED = "failed"
+    CANCELLED = "cancelled"
+
+
+class IngestionMode(str, Enum):
+    GRAPH = "graph"
+    VECTOR = "vector"
+
+
+class IngestionResult(BaseModel):
+    document_hash: str = Field()
+    chunks_total: int = Field(default=0)
+    chunks_added: int = Field(default=0)
+    chunks_removed: int = Field(default=0)
+    unchanged: bool = Field(default=False)
+
+
+class ContextUsage(BaseModel):
+    budget: int = Field()
+    prompt_tokens: int = Field(default=0)
+    history_tokens: int = Field(default=0)
+    context_tokens: int = Field(default=0)
+    total_tokens: int = Field(default=0)
+    chunks_used: int = Field(default=0)
+    chunks_dropped: int = Field(default=0)
+    duplicates_removed: int = Field(default=0)
+    messages_used: int = Field(default=0)
+    messages_dropped: int = Field(default=0)
+
+
+class IngestionJob(BaseModel):
+    id: str = Field(default_factory=lambda: str(uuid4()))
+    status: JobStatus = Field(default=JobStatus.PENDING)
+    document_subject: str = Field()
+    file_name: str = Field()
+    stage: str | None = Field(default=None)
+    chunks_total: int = Field(default=0)
+    chunks_processed: int = Field(default=0)
+    created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    started_at: datetime | None = Field(default=None)
+    finished_at: datetime | None = Field(default=None)
+    duration_seconds: float | None = Field(default=None)
+    error: str | None = Field(default=None)
+    result: IngestionResult | None = Field(default=None)
+
+    @property
+    def is_finished(self) -> bool:
+        return self.status in (
+            JobStatus.COMPLETED,
+            JobStatus.FAILED,
+            JobStatus.CANCELLED,
+        )
@@ -0,0 +1,161 @@
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from typing import AsyncIterator, Callable, Iterator
+import asyncio
+import math
+import threading
+import time
+
+
+class AdmissionRejectedError(Exception):
+    def __init__(self, retry_after: float) -> None:
+        super().__init__("Too many LLM requests waiting, try again later")
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    def __init__(
+        self,
+        max_concurrency: int = 8,
+        rate: float = 0,
+        burst: int | None = None,
+        max_queue: int = 32,
+        timeout: float = 30,
+        timer: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.max_concurrency = max_concurrency
+        self.rate = rate
+        self.burst = burst or max(1, math.ceil(rate))
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self.in_flight = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+        self.__timer = timer
+        self.__tokens = float(self.burst)
+        self.__updated = timer()
+        self.__waiters: deque[Callable[[], None]] = deque()
+        self.__lock = threading.Lock()
+
+    def acquire(self) -> None:
+        start = self.__timer()
+        event = threading.Event()
+        if self.__enter(event.set):
+            if not event.wait(self.timeout) and self.__abandon(event.set):
+                raise AdmissionRejectedError(self.__retry_after())
+        try:
+            time.sleep(self.__reserve_token())
+        except BaseException:
+            self.release()
+            raise
+        self.__record_wait(self.__timer() - start)
+
+    async def aacquire(self) -> None:
+        start = self.__timer()
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+
+        def wake() -> None:
+            loop.call_soon_threadsafe(lambda: future.done() or future.set_result(None))
+
+        if self.__enter(wake):
+            try:
+                await asyncio.wait_for(asyncio.shield(future), self.timeout)
+            except asyncio.TimeoutError:
+                if self.__abandon(wake):
+                    raise AdmissionRejectedError(self.__retry_after())
+            except BaseException:
+                if not self.__abandon(wake):
+                    self.release()
+                raise
+        try:
+            await asyncio.sleep(self.__reserve_token())
+        except BaseException:
+            self.release()
+            raise
+        self.__record_wait(self.__timer() - start)
+
+    def release(self) -> None:
+        with self.__lock:
+            if self.__waiters:
+                wake = self.__waiters.popleft()
+            else:
+                self.in_flight -= 1
+                wake = None
+        if wake:
+            wake()
+
+    @contextmanager
+    def slot(self) -> Iterator[None]:
+        self.acquire()
+        try:
+            yield
+        finally:
+            self.release()
+
+    @asynccontextmanager
+    async def aslot(self) -> AsyncIterator[None]:
+        await self.aacquire()
+        try:
+            yield
+        finally:
+            self.release()
+
+    def stats(self) -> dict:
+        with self.__lock:
+            return {
+                "in_flight": self.in_flight,
+                "queue_depth": len(self.__waiters),
+                "max_concurrency": self.max_concurrency,
+                "max_queue": self.max_queue,
+                "admitted": self.admitted,
+                "rejected": self.rejected,
+                "wait_seconds_total": self.wait_seconds_total,
+                "wait_seconds_max": self.wait_seconds_max,
+                "wait_seconds_avg": (
+                    self.wait_seconds_total / self.admitted if self.admitted else 0.0
+                ),
+            }
+
+    def __enter(self, wake: Callable[[], None]) -> bool:
+        with self.__lock:
+            if self.in_flight < self.max_concurrency and not self.__waiters:
+                self.in_flight += 1
+                return False
+            if len(self.__waiters) >= self.max_queue:
+                self.rejected += 1
+                raise AdmissionRejectedError(self.__retry_after())
+            self.__waiters.append(wake)
+            return True
+
+    def __abandon(self, wake: Callable[[], None]) -> bool:
+        with self.__lock:
+            if wake not in self.__waiters:
+                return False
+            self.__waiters.remove(wake)
+            self.rejected += 1
+            return True
+
+    def __reserve_token(self) -> float:
+        if not self.rate:
+            return 0
+        with self.__lock:
+            now = self.__timer()
+            elapsed = now - self.__updated
+            self.__tokens = min(self.burst, self.__tokens + elapsed * self.rate)
+            self.__updated = now
+            self.__tokens -= 1
+            return 0 if self.__tokens >= 0 else -self.__tokens / self.rate
+
+    def __record_wait(self, seconds: float) -> None:
+        with self.__lock:
+            self.admitted += 1
+            self.wait_seconds_total += seconds
+            self.wait_seconds_max = max(self.wait_seconds_max, seconds)
+
+    def __retry_after(self) -> float:
+        if self.rate:
+            return max(1.0, (len(self.__waiters) + 1) / self.rate)
+        return 1.0
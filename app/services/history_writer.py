@@ -0,0 +1,101 @@
+from typing import Callable, List
+import asyncio
+import logging
+import threading
+
+from neo4j_graphrag.types import LLMMessage
+
+logger = logging.getLogger(__name__)
+
+BatchWriter = Callable[[List[dict]], None]
+
+
+class MessageHistoryWriter:
+    def __init__(
+        self,
+        write: BatchWriter,
+        flush_interval_ms: float = 50,
+        max_batch: int = 100,
+    ) -> None:
+        self.flush_interval = flush_interval_ms / 1000
+        self.max_batch = max_batch
+        self.__write = write
+        self.__pending: dict[str, List[LLMMessage]] = {}
+        self.__count = 0
+        self.__closed = False
+        self.__lock = threading.Lock()
+        self.__wakeup = threading.Condition(self.__lock)
+        self.__write_lock = threading.Lock()
+        self.__thread = threading.Thread(
+            target=self.__run, name="history-writer", daemon=True
+        )
+        self.__thread.start()
+
+    def add_messages(self, session_id: str, messages: List[LLMMessage]) -> None:
+        with self.__lock:
+            if self.__closed:
+                raise RuntimeError("History writer is closed")
+            self.__pending.setdefault(session_id, []).extend(messages)
+            self.__count += len(messages)
+            if self.__count >= self.max_batch:
+                self.__wakeup.notify()
+
+    def has_pending(self, session_id: str | None = None) -> bool:
+        with self.__lock:
+            if session_id is None:
+                return self.__count > 0
+            return session_id in self.__pending
+
+    def flush(self, session_id: str | None = None) -> None:
+        with self.__write_lock:
+            with self.__lock:
+                if session_id is None:
+                    batch, self.__pending = self.__pending, {}
+                else:
+                    messages = self.__pending.pop(session_id, None)
+                    batch = {session_id: messages} if messages else {}
+                self.__count -= sum(len(messages) for messages in batch.values())
+            if not batch:
+                return
+            try:
+                self.__write(
+                    [
+                        {"session_id": session_id, "messages": messages}
+                        for session_id, messages in batch.items()
+                    ]
+                )
+            except Exception:
+                self.__requeue(batch)
+                raise
+
+    async def aflush(self, session_id: str | None = None) -> None:
+        if self.has_pending(session_id) or self.__write_lock.locked():
+            await asyncio.to_thread(self.flush, session_id)
+
+    def close(self) -> None:
+        with self.__lock:
+            self.__closed = True
+            self.__wakeup.notify()
+        self.__thread.join()
+        self.flush()
+
+    def __requeue(self, batch: dict[str, List[LLMMessage]]) -> None:
+        with self.__lock:
+            for session_id, messages in batch.items():
+                self.__pending[session_id] = messages + self.__pending.get(
+                    session_id, []
+                )
+                self.__count += len(messages)
+
+    def __run(self) -> None:
+        while True:
+            with self.__lock:
+                if not self.__closed and self.__count < self.max_batch:
+                    self.__wakeup.wait(self.flush_interval)
+                closed = self.__closed
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Flushing message history failed")
+            if closed:
+                return
@@ -0,0 +1,144 @@
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable
+import asyncio
+import logging
+import threading
+
+from app.model.models import IngestionJob, JobStatus
+
+logger = logging.getLogger(__name__)
+
+JobRunner = Callable[[IngestionJob], Awaitable[Any]]
+JobTeardown = Callable[[], Awaitable[None]]
+
+
+class JobQueueFullError(Exception):
+    pass
+
+
+class IngestionJobQueue:
+    def __init__(
+        self,
+        max_workers: int = 2,
+        max_pending: int = 100,
+        max_jobs: int = 1000,
+        teardown: JobTeardown | None = None,
+    ) -> None:
+        self.max_pending = max_pending
+        self.max_jobs = max_jobs
+        self.teardown = teardown
+        self.__executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="ingestion"
+        )
+        self.__jobs: dict[str, IngestionJob] = {}
+        self.__futures: dict[str, Future] = {}
+        self.__tasks: dict[str, tuple[asyncio.AbstractEventLoop, asyncio.Task]] = {}
+        self.__cancelled: set[str] = set()
+        self.__cleanups: dict[str, Callable[[], None]] = {}
+        self.__lock = threading.Lock()
+
+    def submit(
+        self,
+        job: IngestionJob,
+        run: JobRunner,
+        cleanup: Callable[[], None] | None = None,
+    ) -> IngestionJob:
+        with self.__lock:
+            pending = sum(
+                1
+                for queued in self.__jobs.values()
+                if queued.status == JobStatus.PENDING
+            )
+            if pending >= self.max_pending:
+                raise JobQueueFullError("Too many ingestion jobs waiting")
+            self.__jobs[job.id] = job
+            if cleanup:
+                self.__cleanups[job.id] = cleanup
+            self.__discard_finished_jobs()
+            self.__futures[job.id] = self.__executor.submit(self.__execute, job, run)
+        return job
+
+    def get(self, job_id: str) -> IngestionJob | None:
+        return self.__jobs.get(job_id)
+
+    def cancel(self, job_id: str) -> IngestionJob | None:
+        with self.__lock:
+            job = self.__jobs.get(job_id)
+            if job is None or job.is_finished:
+                return job
+            future = self.__futures.get(job_id)
+            if future is not None and future.cancel():
+                self.__finish(job, JobStatus.CANCELLED)
+                return job
+            self.__cancelled.add(job_id)
+            running = self.__tasks.get(job_id)
+        if running is not None:
+            loop, task = running
+            loop.call_soon_threadsafe(task.cancel)
+        return job
+
+    def shutdown(self) -> None:
+        with self.__lock:
+            job_ids = list(self.__jobs)
+        for job_id in job_ids:
+            self.cancel(job_id)
+        self.__executor.shutdown(wait=False, cancel_futures=True)
+
+    def __execute(self, job: IngestionJob, run: JobRunner) -> None:
+        job.status = JobStatus.RUNNING
+        job.started_at = datetime.now(timezone.utc)
+        try:
+            asyncio.run(self.__run(job, run))
+            self.__finish(job, JobStatus.COMPLETED)
+        except asyncio.CancelledError:
+            self.__finish(job, JobStatus.CANCELLED)
+        except Exception as error:
+            logger.exception("Ingestion job %s failed", job.id)
+            job.error = str(error)
+            self.__finish(job, JobStatus.FAILED)
+        finally:
+            with self.__lock:
+                self.__futures.pop(job.id, None)
+                self.__tasks.pop(job.id, None)
+                self.__cancelled.discard(job.id)
+
+    async def __run(self, job: IngestionJob, run: JobRunner) -> None:
+        with self.__lock:
+            if job.id in self.__cancelled:
+                raise asyncio.CancelledError()
+            self.__tasks[job.id] = (asyncio.get_running_loop(), asyncio.current_task())
+        try:
+            await run(job)
+        finally:
+            if self.teardown is not None:
+                try:
+                    await self.teardown()
+                except Exception:
+                    logger.exception("Teardown of ingestion job %s failed", job.id)
+
+    def __finish(self, job: IngestionJob, status: JobStatus) -> None:
+        job.status = status
+        job.finished_at = datetime.now(timezone.utc)
+        if job.started_at:
+            job.duration_seconds = (job.finished_at - job.started_at).total_seconds()
+        cleanup = self.__cleanups.pop(job.id, None)
+        if cleanup:
+            try:
+                cleanup()
+            except Exception:
+                logger.exception("Cleanup of ingestion job %s failed", job.id)
+
+    def __discard_finished_jobs(self) -> None:
+        finished = [job_id for job_id, job in self.__jobs.items() if job.is_finished]
+        for job_id in finished[: max(0, len(self.__jobs) - self.max_jobs)]:
+            del self.__jobs[job_id]
+
+
+def job_progress_callback(job: IngestionJob) -> Callable[[str, int, int], None]:
+    def callback(stage: str, processed: int, total: int) -> None:
+        job.stage = stage
+        job.chunks_processed = processed
+        job.chunks_total = total
+
+    return callback
@@ -1,17 +1,32 @@
+from contextlib import contextmanager, nullcontext
 from os import getenv
-from typing import Any, Coroutine, List, Sequence
+import asyncio
+from typing import Any, AsyncIterator, Coroutine, Iterator, List, Sequence
 from neo4j_graphrag.llm.types import LLMResponse, ToolCallResponse
 from neo4j_graphrag.message_history import MessageHistory
 from neo4j_graphrag.tool import Tool
 from neo4j_graphrag.types import LLMMessage
-from neo4j_graphrag.utils.rate_limit import RateLimitHandler
+from neo4j_graphrag.utils.rate_limit import (
+    RateLimitHandler,
+    async_rate_limit_handler,
+    rate_limit_handler,
+)
+from huggingface_hub import AsyncInferenceClient, InferenceClient
 from langchain_huggingface.embeddings import HuggingFaceEndpointEmbeddings
 from neo4j_graphrag.llm import LLMInterface
 from neo4j_graphrag.embeddings import Embedder
 from langchain.chat_models import init_chat_model
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models import BaseChatModel
 from langchain_core.messages import HumanMessage, SystemMessage, AIMessage
 from langchain.agents import create_agent
+from app.services.admission import AdmissionController
+from app.utils.cache import DiskStore, TTLCache
+from app.utils.context import ContextAssembler
+from app.utils.metrics import EMBEDDING_REQUESTS, LLM_ERRORS, LLM_TOKENS, STAGE_LATENCY
+from app.utils.profiling import span
 from app.utils.prompts import DEFAULT_SYSTEM_INSTRUCTIONS
+from app.utils.tools import normalize_text
 from neo4j_graphrag.message_history import Neo4jMessageHistory
 
 
@@ -22,13 +37,18 @@ class LLM(LLMInterface):
         model_name: str,
         model_params: dict[str, Any] | None = {},
         rate_limit_handler: RateLimitHandler | None = None,
+        admission: AdmissionController | None = None,
+        context: ContextAssembler | None = None,
+        model: BaseChatModel | None = None,
         **kwargs: Any,
     ):
         super().__init__(model_name, model_params, rate_limit_handler, **kwargs)
+        self.admission = admission
+        self.context = context
         self.model_kwargs: dict = model_params.get(
             "model_kwargs", {"response_format": {"type": "json_object"}}
         )
-        self.model = init_chat_model(
+        self.model = model or init_chat_model(
             self.model_name,
             temperature=model_params.get("temperature", 0.7),
             model_kwargs=self.model_kwargs,
@@ -49,19 +69,21 @@ class LLM(LLMInterface):
             SystemMessage(content=system_instruction),
             HumanMessage(content=input),
         ]
-        self.validate_model_kwargs(system_instruction, input)
+        model_kwargs = self.validate_model_kwargs(system_instruction, input)
         messages = self.format_messages(message_history, messages)
-        response = self.model.invoke(messages)
+        with self.admission.slot() if self.admission else nullcontext():
+            with self.__measure():
+                response = self.model.invoke(messages, **model_kwargs)
+        self.__record_usage(response)
         return LLMResponse(content=response.content)
 
-    def validate_model_kwargs(self, system_instruction: str, input: str):
+    def validate_model_kwargs(self, system_instruction: str, input: str) -> dict:
         is_json_format_requested = (
             "json" in system_instruction.lower() or "json" in input.lower()
         )
         if is_json_format_requested:
-            self.model.model_kwargs = {"response_format": {"type": "json_object"}}
-        else:
-            self.model.model_kwargs = {"response_format": {"type": "text"}}
+            return {"response_format": {"type": "json_object"}}
+        return {"response_format": {"type": "text"}}
 
     async def ainvoke(
         self,
@@ -69,14 +91,38 @@ class LLM(LLMInterface):
         message_history: List[LLMMessage] | MessageHistory | None = [],
         system_instruction: str | None = "",
     ) -> Coroutine[Any, Any, LLMResponse]:
-        messages = message_history + [
+        messages = [
             SystemMessage(content=system_instruction),
             HumanMessage(content=input),
         ]
+        model_kwargs = self.validate_model_kwargs(system_instruction, input)
         messages = self.format_messages(message_history, messages)
-        response = await self.model.ainvoke(messages)
+        async with self.admission.aslot() if self.admission else nullcontext():
+            with self.__measure():
+                response = await self.model.ainvoke(messages, **model_kwargs)
+        self.__record_usage(response)
         return LLMResponse(content=response.content)
 
+    async def astream(
+        self,
+        input: str,
+        message_history: List[LLMMessage] | MessageHistory | None = [],
+        system_instruction: str | None = "",
+    ) -> AsyncIterator[str]:
+        messages = [
+            SystemMessage(content=system_instruction),
+            HumanMessage(content=input),
+        ]
+        messages = self.format_messages(message_history, messages)
+        async with self.admission.aslot() if self.admission else nullcontext():
+            with self.__measure():
+                async for chunk in self.model.astream(
+                    messages, response_format={"type": "text"}
+                ):
+                    self.__record_usage(chunk)
+                    if chunk.content:
+                        yield chunk.content
+
     def invoke_with_tools(
         self,
         input: str,
@@ -111,12 +157,29 @@ class LLM(LLMInterface):
         )
         return result
 
+    @contextmanager
+    def __measure(self) -> Iterator[None]:
+        try:
+            with span("llm", model=self.model_name), STAGE_LATENCY.time(stage="llm"):
+                yield
+        except Exception:
+            LLM_ERRORS.inc(model=self.model_name)
+            raise
+
+    def __record_usage(self, message: Any) -> None:
+        usage = getattr(message, "usage_metadata", None) or {}
+        for kind in ("input_tokens", "output_tokens"):
+            if usage.get(kind):
+                LLM_TOKENS.inc(usage[kind], model=self.model_name, kind=kind)
+
     def format_messages(self, message_history: Neo4jMessageHistory, messages: list):
         message_history = (
             message_history.messages
             if hasattr(message_history, "messages")
             else message_history
         )
+        if message_history and self.context is not None:
+            message_history, _ = self.context.fit_history(message_history)
         if message_history:
             formatted_messages = []
             for message in message_history:
@@ -129,11 +192,107 @@ class LLM(LLMInterface):
 
 
 class EmbbeddingHuggingFace(Embedder):
-    def __init__(self, rate_limit_handler: RateLimitHandler | None = None):
+    def __init__(
+        self,
+        rate_limit_handler: RateLimitHandler | None = None,
+        cache: TTLCache | None = None,
+        batch_size: int | None = None,
+        max_concurrency: int | None = None,
+        embeddings: Embeddings | None = None,
+    ):
         super().__init__(rate_limit_handler)
-        self.embedder = HuggingFaceEndpointEmbeddings(
-            model=getenv("HUGGINGFACE_EMBEDDER_MODEL"),
+        self.model_name = getenv("HUGGINGFACE_EMBEDDER_MODEL")
+        self.embedder = embeddings or HuggingFaceEndpointEmbeddings(
+            model=self.model_name,
+        )
+        endpoint_url = getenv("HUGGINGFACE_EMBEDDER_URL")
+        if endpoint_url and embeddings is None:
+            token = getenv("HUGGINGFACEHUB_API_TOKEN") or getenv("HF_TOKEN")
+            self.embedder.client = InferenceClient(model=endpoint_url, token=token)
+            self.embedder.async_client = AsyncInferenceClient(
+                model=endpoint_url, token=token
+            )
+        self.cache = cache if cache is not None else self.create_cache()
+        self.batch_size = batch_size or int(getenv("EMBEDDING_BATCH_SIZE") or 32)
+        self.max_concurrency = max_concurrency or int(
+            getenv("EMBEDDING_MAX_CONCURRENCY") or 4
+        )
+
+    @staticmethod
+    def create_cache() -> TTLCache:
+        cache_path = getenv("EMBEDDING_CACHE_PATH")
+        return TTLCache(
+            max_size=int(getenv("EMBEDDING_CACHE_SIZE") or 1024),
+            ttl=float(getenv("EMBEDDING_CACHE_TTL_SECONDS") or 3600),
+            store=(
+                DiskStore(
+                    cache_path,
+                    max_size=int(getenv("EMBEDDING_CACHE_DISK_SIZE") or 10000),
+                )
+                if cache_path
+                else None
+            ),
         )
 
+    def cache_key(self, text: str) -> str:
+        return f"{self.model_name}:{normalize_text(text)}"
+
     def embed_query(self, text: str) -> List[float]:
-        return self.embedder.embed_query(text)
+        key = self.cache_key(text)
+        embedding = self.cache.get(key)
+        if embedding is None:
+            EMBEDDING_REQUESTS.inc(kind="query")
+            with span("embedding"), STAGE_LATENCY.time(stage="embedding"):
+                embedding = self.embedder.embed_query(text)
+            self.cache.set(key, embedding)
+        return embedding
+
+    async def async_embed_query(self, text: str) -> List[float]:
+        key = self.cache_key(text)
+        embedding = self.cache.get(key)
+        if embedding is None:
+            EMBEDDING_REQUESTS.inc(kind="query")
+            with span("embedding"), STAGE_LATENCY.time(stage="embedding"):
+                embedding = await self.embedder.aembed_query(text)
+            self.cache.set(key, embedding)
+        return embedding
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        embeddings = []
+        for batch in self.batches(texts):
+            embeddings.extend(self.__embed_batch(batch))
+        return embeddings
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def embed(batch: List[str]) -> List[List[float]]:
+            async with semaphore:
+                return await self.__aembed_batch(batch)
+
+        results = await asyncio.gather(*(embed(batch) for batch in self.batches(texts)))
+        return [embedding for batch in results for embedding in batch]
+
+    def batches(self, texts: List[str]) -> List[List[str]]:
+        return [
+            texts[start : start + self.batch_size]
+            for start in range(0, len(texts), self.batch_size)
+        ]
+
+    @rate_limit_handler
+    def __embed_batch(self, texts: List[str]) -> List[List[float]]:
+        EMBEDDING_REQUESTS.inc(kind="documents")
+        with (
+            span("embedding_batch", size=len(texts)),
+            STAGE_LATENCY.time(stage="embedding_batch"),
+        ):
+            return self.embedder.embed_documents(texts)
+
+    @async_rate_limit_handler
+    async def __aembed_batch(self, texts: List[str]) -> List[List[float]]:
+        EMBEDDING_REQUESTS.inc(kind="documents")
+        with (
+            span("embedding_batch", size=len(texts)),
+            STAGE_LATENCY.time(stage="embedding_batch"),
+        ):
+            return await self.embedder.aembed_documents(texts)
@@ -0,0 +1,251 @@
+from os import getenv
+import logging
+import threading
+from typing import Annotated
+
+from fastapi import Depends, Request
+from neo4j_graphrag.embeddings import Embedder
+
+from app.database.database import Neo4jDatabase
+from app.services.admission import AdmissionController
+from app.services.history_writer import MessageHistoryWriter
+from app.services.jobs import IngestionJobQueue
+from app.services.llm import LLM, EmbbeddingHuggingFace
+from app.services.summarizer import ConversationSummarizer
+from app.utils.cache import TTLCache
+from app.utils.context import ContextAssembler
+from app.utils.metrics import MetricsRegistry, metrics
+from app.utils.profiling import Profiler
+
+logger = logging.getLogger(__name__)
+
+
+class ClientRegistry:
+    def __init__(
+        self, embedder: Embedder | None = None, db: Neo4jDatabase = None
+    ) -> None:
+        self.embedder: Embedder = embedder or EmbbeddingHuggingFace()
+        self.context: ContextAssembler | None = None
+        if int(getenv("CONTEXT_TOKEN_BUDGET") or 3000) > 0:
+            self.context = ContextAssembler(
+                max_tokens=int(getenv("CONTEXT_TOKEN_BUDGET") or 3000),
+                history_tokens=int(getenv("HISTORY_TOKEN_BUDGET") or 1000),
+                encoding_name=getenv("TOKEN_ENCODING", "cl100k_base"),
+            )
+        self.db: Neo4jDatabase = db or Neo4jDatabase(self.embedder, self.context)
+        self.jobs = IngestionJobQueue(
+            max_workers=int(getenv("INGESTION_CONCURRENCY") or 2),
+            max_pending=int(getenv("INGESTION_MAX_PENDING") or 100),
+            teardown=self.db.aclose,
+        )
+        self.admission = AdmissionController(
+            max_concurrency=int(getenv("LLM_MAX_CONCURRENCY") or 8),
+            rate=float(getenv("LLM_RATE_PER_SECOND") or 0),
+            burst=int(getenv("LLM_RATE_BURST") or 0) or None,
+            max_queue=int(getenv("LLM_MAX_QUEUE") or 32),
+            timeout=float(getenv("LLM_QUEUE_TIMEOUT_SECONDS") or 30),
+        )
+        self.users = TTLCache(
+            max_size=int(getenv("USER_CACHE_SIZE") or 1024),
+            ttl=float(getenv("USER_CACHE_TTL_SECONDS") or 30),
+        )
+        self.profiler = Profiler(
+            sample_rate=float(getenv("PROFILE_SAMPLE_RATE") or 0),
+            max_profiles=int(getenv("PROFILE_BUFFER_SIZE") or 100),
+            enabled=getenv("PROFILING_ENABLED", "false").lower() == "true",
+        )
+        self.history_writer: MessageHistoryWriter | None = None
+        if getenv("HISTORY_WRITE_BEHIND", "false").lower() == "true":
+            self.history_writer = MessageHistoryWriter(
+                self.db.save_messages_batch,
+                flush_interval_ms=float(getenv("HISTORY_FLUSH_INTERVAL_MS") or 50),
+                max_batch=int(getenv("HISTORY_FLUSH_BATCH_SIZE") or 100),
+            )
+        self.summarizer: ConversationSummarizer | None = None
+        if int(getenv("SUMMARY_EVERY_TURNS") or 5) > 0:
+            self.summarizer = ConversationSummarizer(
+                self.db,
+                every_turns=int(getenv("SUMMARY_EVERY_TURNS") or 5),
+                recent_messages=int(getenv("SUMMARY_RECENT_MESSAGES") or 4),
+            )
+        self.__llms: dict[tuple[str, str], LLM] = {}
+        self.__lock = threading.Lock()
+        self.register_metrics(metrics)
+
+    def get_llm(
+        self, model_name: str | None = None, response_format: str = "text"
+    ) -> LLM:
+        model_name = model_name or f"groq:{getenv('GROQ_MODEL')}"
+        key = (model_name, response_format)
+        llm = self.__llms.get(key)
+        if llm is None:
+            with self.__lock:
+                llm = self.__llms.get(key)
+                if llm is None:
+                    llm = LLM(
+                        model_name=model_name,
+                        model_params={
+                            "model_kwargs": {
+                                "response_format": {"type": response_format}
+                            }
+                        },
+                        admission=self.admission if response_format == "text" else None,
+                        context=self.context,
+                    )
+                    self.__llms[key] = llm
+        return llm
+
+    def cache_stats(self) -> dict[str, dict]:
+        stats = {"user": self.users.stats(), "answer": self.db.answer_cache.stats()}
+        cache = getattr(self.embedder, "cache", None)
+        if cache is not None:
+            stats["embedding"] = cache.stats()
+        return stats
+
+    def register_metrics(self, registry: MetricsRegistry) -> None:
+        for key, name, kind in (
+            ("hits", "faqchatbot_cache_hits_total", "counter"),
+            ("misses", "faqchatbot_cache_misses_total", "counter"),
+            ("size", "faqchatbot_cache_size", "gauge"),
+        ):
+            registry.callback(
+                name,
+                f"Cache {key} per cache.",
+                kind,
+                lambda key=key: {
+                    (cache,): stats[key] for cache, stats in self.cache_stats().items()
+                },
+                ["cache"],
+            )
+        for key, name, kind in (
+            ("in_flight", "faqchatbot_llm_in_flight", "gauge"),
+            ("queue_depth", "faqchatbot_llm_queue_depth", "gauge"),
+            ("admitted", "faqchatbot_llm_admitted_total", "counter"),
+            ("rejected", "faqchatbot_llm_rejected_total", "counter"),
+            (
+                "wait_seconds_total",
+                "faqchatbot_llm_queue_wait_seconds_total",
+                "counter",
+            ),
+        ):
+            registry.callback(
+                name,
+                f"LLM admission control {key.replace('_', ' ')}.",
+                kind,
+                lambda key=key: {(): self.admission.stats()[key]},
+            )
+        for key, name, kind in (
+            ("refreshed", "faqchatbot_summary_refreshes_total", "counter"),
+            ("failed", "faqchatbot_summary_failures_total", "counter"),
+            ("in_flight", "faqchatbot_summary_in_flight", "gauge"),
+        ):
+            registry.callback(
+                name,
+                f"Conversation summary {key.replace('_', ' ')}.",
+                kind,
+                lambda key=key: (
+                    {(): self.summarizer.stats()[key]} if self.summarizer else {}
+                ),
+            )
+        for key in ("calls", "shared"):
+            registry.callback(
+                f"faqchatbot_rag_singleflight_{key}_total",
+                f"RAG single-flight {key}.",
+                "counter",
+                lambda key=key: {(): self.db.rag_flights.stats()[key]},
+            )
+
+    def warm_up(self) -> None:
+        self.get_llm()
+        self.get_llm(response_format="json_object")
+        try:
+            self.db.get_graph()._driver.verify_connectivity()
+            self.embedder.embed_query("warm up")
+        except Exception as error:
+            logger.warning("Client warm up failed: %s", error)
+
+    def bootstrap_schema(self) -> None:
+        try:
+            version = self.db.bootstrap_schema()
+            logger.info("Neo4j schema at version %s", version)
+        except Exception as error:
+            logger.warning("Schema bootstrap failed: %s", error)
+
+    async def aclose(self) -> None:
+        if self.summarizer is not None:
+            await self.summarizer.aclose()
+        await self.db.aclose()
+        self.close()
+
+    def close(self) -> None:
+        self.jobs.shutdown()
+        if self.history_writer is not None:
+            try:
+                self.history_writer.close()
+            except Exception:
+                logger.exception("Flushing message history on shutdown failed")
+        self.db.close()
+
+
+def get_registry(request: Request) -> ClientRegistry:
+    registry = getattr(request.app.state, "registry", None)
+    if registry is None:
+        registry = ClientRegistry()
+        request.app.state.registry = registry
+    return registry
+
+
+def get_db(registry: Annotated[ClientRegistry, Depends(get_registry)]) -> Neo4jDatabase:
+    return registry.db
+
+
+def get_embedder(
+    registry: Annotated[ClientRegistry, Depends(get_registry)],
+) -> Embedder:
+    return registry.embedder
+
+
+def get_chat_llm(registry: Annotated[ClientRegistry, Depends(get_registry)]) -> LLM:
+    return registry.get_llm()
+
+
+def get_ingestion_llm(
+    registry: Annotated[ClientRegistry, Depends(get_registry)],
+) -> LLM:
+    return registry.get_llm(response_format="json_object")
+
+
+def get_job_queue(
+    registry: Annotated[ClientRegistry, Depends(get_registry)],
+) -> IngestionJobQueue:
+    return registry.jobs
+
+
+def get_user_cache(
+    registry: Annotated[ClientRegistry, Depends(get_registry)],
+) -> TTLCache:
+    return registry.users
+
+
+def get_history_writer(
+    registry: Annotated[ClientRegistry, Depends(get_registry)],
+) -> MessageHistoryWriter | None:
+    return registry.history_writer
+
+
+def get_admission(
+    registry: Annotated[ClientRegistry, Depends(get_registry)],
+) -> AdmissionController:
+    return registry.admission
+
+
+def get_profiler(
+    registry: Annotated[ClientRegistry, Depends(get_registry)],
+) -> Profiler:
+    return registry.profiler
+
+
+def get_summarizer(
+    registry: Annotated[ClientRegistry, Depends(get_registry)],
+) -> ConversationSummarizer | None:
+    return registry.summarizer
@@ -0,0 +1,69 @@
+from itertools import takewhile
+from typing import List
+import asyncio
+import logging
+
+from neo4j_graphrag.llm import LLMInterface
+from neo4j_graphrag.types import LLMMessage
+
+from app.database.database import Neo4jDatabase
+
+logger = logging.getLogger(__name__)
+
+
+class ConversationSummarizer:
+    def __init__(
+        self,
+        db: Neo4jDatabase,
+        every_turns: int = 5,
+        recent_messages: int = 4,
+    ) -> None:
+        self.db = db
+        self.every_turns = every_turns
+        self.recent_messages = recent_messages
+        self.refreshed = 0
+        self.failed = 0
+        self.__running: dict[str, asyncio.Task] = {}
+
+    @property
+    def window(self) -> int:
+        return self.recent_messages + 2 * self.every_turns
+
+    def needs_refresh(self, messages: List[LLMMessage]) -> bool:
+        unsummarized = sum(1 for message in messages if message["role"] != "system")
+        return unsummarized - self.recent_messages >= 2 * self.every_turns
+
+    def recent(self, messages: List[LLMMessage]) -> List[LLMMessage]:
+        summary = list(takewhile(lambda message: message["role"] == "system", messages))
+        rest = messages[len(summary) :]
+        return summary + (rest[-self.recent_messages :] if self.recent_messages else [])
+
+    def schedule(
+        self, llm: LLMInterface, session_id: str, messages: List[LLMMessage]
+    ) -> asyncio.Task | None:
+        if session_id in self.__running or not self.needs_refresh(messages):
+            return None
+        task = asyncio.create_task(self.arefresh(llm, session_id))
+        self.__running[session_id] = task
+        task.add_done_callback(lambda _: self.__running.pop(session_id, None))
+        return task
+
+    async def arefresh(self, llm: LLMInterface, session_id: str) -> None:
+        try:
+            await self.db.arefresh_summary(
+                llm, session_id, keep=self.recent_messages, window=2 * self.window
+            )
+            self.refreshed += 1
+        except Exception:
+            self.failed += 1
+            logger.exception("Refreshing the summary of session %s failed", session_id)
+
+    async def aclose(self) -> None:
+        await asyncio.gather(*self.__running.values(), return_exceptions=True)
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "refreshed": self.refreshed,
+            "failed": self.failed,
+            "in_flight": len(self.__running),
+        }
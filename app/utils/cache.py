@@ -0,0 +1,247 @@
+from collections import OrderedDict
+from typing import Any, Callable, Hashable
+import json
+import sqlite3
+import threading
+import time
+
+import numpy as np
+
+
+class DiskStore:
+    def __init__(
+        self,
+        path: str,
+        max_size: int = 10000,
+        timer: Callable[[], float] = time.time,
+    ) -> None:
+        self.max_size = max_size
+        self.__timer = timer
+        self.__lock = threading.Lock()
+        self.__connection = sqlite3.connect(path, check_same_thread=False)
+        with self.__lock, self.__connection:
+            self.__connection.execute(
+                "CREATE TABLE IF NOT EXISTS cache "
+                "(key TEXT PRIMARY KEY, value TEXT, expires_at REAL)"
+            )
+            columns = [
+                row[1] for row in self.__connection.execute("PRAGMA table_info(cache)")
+            ]
+            if "accessed_at" not in columns:
+                self.__connection.execute(
+                    "ALTER TABLE cache ADD COLUMN accessed_at REAL DEFAULT 0"
+                )
+            self.__connection.execute(
+                "CREATE INDEX IF NOT EXISTS cache_expires_at ON cache (expires_at)"
+            )
+            self.__connection.execute(
+                "CREATE INDEX IF NOT EXISTS cache_accessed_at ON cache (accessed_at)"
+            )
+
+    def get(self, key: str) -> tuple[Any, float] | None:
+        now = self.__timer()
+        with self.__lock, self.__connection:
+            row = self.__connection.execute(
+                "SELECT value, expires_at FROM cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if row[1] <= now:
+                self.__connection.execute("DELETE FROM cache WHERE key = ?", (key,))
+                return None
+            self.__connection.execute(
+                "UPDATE cache SET accessed_at = ? WHERE key = ?", (now, key)
+            )
+        return json.loads(row[0]), row[1]
+
+    def set(self, key: str, value: Any, expires_at: float) -> None:
+        now = self.__timer()
+        with self.__lock, self.__connection:
+            self.__connection.execute(
+                "INSERT OR REPLACE INTO cache (key, value, expires_at, accessed_at) "
+                "VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value), expires_at, now),
+            )
+            self.__connection.execute("DELETE FROM cache WHERE expires_at <= ?", (now,))
+            self.__connection.execute(
+                "DELETE FROM cache WHERE key IN "
+                "(SELECT key FROM cache ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_size,),
+            )
+
+    def delete(self, key: str) -> None:
+        with self.__lock, self.__connection:
+            self.__connection.execute("DELETE FROM cache WHERE key = ?", (key,))
+
+    def clear(self) -> None:
+        with self.__lock, self.__connection:
+            self.__connection.execute("DELETE FROM cache")
+
+    def __len__(self) -> int:
+        with self.__lock:
+            return self.__connection.execute("SELECT count(*) FROM cache").fetchone()[0]
+
+
+class TTLCache:
+    def __init__(
+        self,
+        max_size: int = 1024,
+        ttl: float = 3600,
+        store: DiskStore | None = None,
+        timer: Callable[[], float] = time.time,
+    ) -> None:
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.__store = store
+        self.__timer = timer
+        self.__entries: OrderedDict[Hashable, tuple[Any, float]] = OrderedDict()
+        self.__lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Any | None:
+        now = self.__timer()
+        with self.__lock:
+            entry = self.__entries.get(key)
+            if entry is not None and entry[1] <= now:
+                del self.__entries[key]
+                entry = None
+            if entry is not None:
+                self.__entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+        if self.__store is not None:
+            entry = self.__store.get(str(key))
+            if entry is not None and entry[1] > now:
+                with self.__lock:
+                    self.__put(key, entry)
+                    self.hits += 1
+                return entry[0]
+        with self.__lock:
+            self.misses += 1
+        return None
+
+    def set(self, key: Hashable, value: Any) -> None:
+        entry = (value, self.__timer() + self.ttl)
+        with self.__lock:
+            self.__put(key, entry)
+        if self.__store is not None:
+            self.__store.set(str(key), value, entry[1])
+
+    def delete(self, key: Hashable) -> None:
+        with self.__lock:
+            self.__entries.pop(key, None)
+        if self.__store is not None:
+            self.__store.delete(str(key))
+
+    def clear(self) -> None:
+        with self.__lock:
+            self.__entries.clear()
+        if self.__store is not None:
+            self.__store.clear()
+
+    def stats(self) -> dict:
+        with self.__lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "size": len(self.__entries),
+                "max_size": self.max_size,
+            }
+
+    def __put(self, key: Hashable, entry: tuple[Any, float]) -> None:
+        self.__entries[key] = entry
+        self.__entries.move_to_end(key)
+        while len(self.__entries) > self.max_size:
+            self.__entries.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self.__entries)
+
+
+class SemanticAnswerCache:
+    def __init__(
+        self,
+        threshold: float = 0.95,
+        max_size: int = 512,
+        ttl: float = 86400,
+        timer: Callable[[], float] = time.time,
+    ) -> None:
+        self.threshold = threshold
+        self.max_size = max_size
+        self.ttl = ttl
+        self.version = 0
+        self.hits = 0
+        self.misses = 0
+        self.__timer = timer
+        self.__entries: OrderedDict[int, tuple[str | None, np.ndarray, str, float]] = (
+            OrderedDict()
+        )
+        self.__next_id = 0
+        self.__lock = threading.Lock()
+
+    def get(self, embedding: list[float], scope: str | None = None) -> str | None:
+        vector = self.__normalize(embedding)
+        now = self.__timer()
+        with self.__lock:
+            best_id, best_score = None, self.threshold
+            for entry_id, (entry_scope, entry_vector, _, expires_at) in list(
+                self.__entries.items()
+            ):
+                if expires_at <= now:
+                    del self.__entries[entry_id]
+                    continue
+                if entry_scope != scope:
+                    continue
+                score = float(np.dot(vector, entry_vector))
+                if score >= best_score:
+                    best_id, best_score = entry_id, score
+            if best_id is None:
+                self.misses += 1
+                return None
+            self.__entries.move_to_end(best_id)
+            self.hits += 1
+            return self.__entries[best_id][2]
+
+    def set(
+        self,
+        embedding: list[float],
+        answer: str,
+        scope: str | None = None,
+        version: int | None = None,
+    ) -> None:
+        with self.__lock:
+            if version is not None and version != self.version:
+                return
+            self.__entries[self.__next_id] = (
+                scope,
+                self.__normalize(embedding),
+                answer,
+                self.__timer() + self.ttl,
+            )
+            self.__next_id += 1
+            while len(self.__entries) > self.max_size:
+                self.__entries.popitem(last=False)
+
+    def invalidate(self) -> None:
+        with self.__lock:
+            self.version += 1
+            self.__entries.clear()
+
+    def stats(self) -> dict:
+        with self.__lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "size": len(self.__entries),
+                "version": self.version,
+            }
+
+    @staticmethod
+    def __normalize(embedding: list[float]) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def __len__(self) -> int:
+        return len(self.__entries)
@@ -0,0 +1,170 @@
+from itertools import takewhile
+from typing import Callable, List, Sequence, Tuple
+
+from neo4j_graphrag.generation.prompts import RagTemplate
+from neo4j_graphrag.types import LLMMessage, RetrieverResultItem
+
+from app.model.models import ContextUsage
+from app.utils.metrics import PROMPT_TOKENS
+from app.utils.profiling import span
+
+
+class FittedHistory(list):
+    def __init__(
+        self, messages: Sequence[LLMMessage] = (), tokens: int = 0, dropped: int = 0
+    ) -> None:
+        super().__init__(messages)
+        self.tokens = tokens
+        self.dropped = dropped
+
+
+class ContextAssembler:
+    def __init__(
+        self,
+        max_tokens: int = 3000,
+        history_tokens: int = 1000,
+        encoding_name: str = "cl100k_base",
+        count_tokens: Callable[[str], int] | None = None,
+        min_overlap: int = 16,
+        max_overlap: int = 512,
+    ) -> None:
+        self.max_tokens = max_tokens
+        self.history_tokens = history_tokens
+        self.encoding_name = encoding_name
+        self.min_overlap = min_overlap
+        self.max_overlap = max_overlap
+        self.__count_tokens = count_tokens
+
+    def count(self, text: str) -> int:
+        if self.__count_tokens is None:
+            import tiktoken
+
+            encoding = tiktoken.get_encoding(self.encoding_name)
+            self.__count_tokens = lambda text: len(
+                encoding.encode(text, disallowed_special=())
+            )
+        return self.__count_tokens(text) if text else 0
+
+    def fit_history(
+        self, message_history: Sequence[LLMMessage] | None, budget: int | None = None
+    ) -> Tuple[FittedHistory, int]:
+        budget = self.history_tokens if budget is None else budget
+        if isinstance(message_history, FittedHistory):
+            if message_history.tokens <= budget:
+                return message_history, message_history.tokens
+        messages = list(message_history or [])
+        pinned = list(takewhile(lambda message: message["role"] == "system", messages))
+        used = sum(self.count(message["content"]) for message in pinned)
+        if used > budget:
+            pinned, used = [], 0
+        fitted = []
+        for message in reversed(messages[len(pinned) :]):
+            tokens = self.count(message["content"])
+            if used + tokens > budget:
+                break
+            fitted.append(message)
+            used += tokens
+        history = pinned + fitted[::-1]
+        dropped = len(messages) - len(history)
+        if isinstance(message_history, FittedHistory):
+            dropped += message_history.dropped
+        return FittedHistory(history, used, dropped), used
+
+    def fit_prompt(
+        self,
+        query_text: str,
+        message_history: Sequence[LLMMessage] | None = None,
+        template: RagTemplate | None = None,
+    ) -> FittedHistory:
+        prompt_tokens = self.prompt_tokens(query_text, template)
+        history, _ = self.fit_history(
+            message_history, self.history_budget(prompt_tokens)
+        )
+        return history
+
+    def prompt_tokens(
+        self, query_text: str, template: RagTemplate | None = None
+    ) -> int:
+        template = template or RagTemplate()
+        return self.count(template.system_instructions or "") + self.count(
+            template.format(query_text=query_text, context="", examples="")
+        )
+
+    def history_budget(self, prompt_tokens: int) -> int:
+        return min(self.history_tokens, max(self.max_tokens - prompt_tokens, 0))
+
+    def assemble(
+        self,
+        query_text: str,
+        items: Sequence[RetrieverResultItem],
+        message_history: Sequence[LLMMessage] | None = None,
+        template: RagTemplate | None = None,
+    ) -> Tuple[str, FittedHistory, ContextUsage]:
+        with span("context_assembly", chunks=len(items)) as current:
+            prompt_tokens = self.prompt_tokens(query_text, template)
+            history, history_tokens = self.fit_history(
+                message_history, self.history_budget(prompt_tokens)
+            )
+            budget = self.max_tokens - prompt_tokens - history_tokens
+            selected: list[tuple[str, str]] = []
+            context_tokens = duplicates = dropped = 0
+            for item in self.rank(items):
+                text = self.deduplicate(item.content, [text for text, _ in selected])
+                if text is None:
+                    duplicates += 1
+                    continue
+                chunk = self.render(text, item)
+                tokens = self.count(chunk)
+                if context_tokens + tokens > budget:
+                    dropped += 1
+                    continue
+                selected.append((text, chunk))
+                context_tokens += tokens
+            usage = ContextUsage(
+                budget=self.max_tokens,
+                prompt_tokens=prompt_tokens,
+                history_tokens=history_tokens,
+                context_tokens=context_tokens,
+                total_tokens=prompt_tokens + history_tokens + context_tokens,
+                chunks_used=len(selected),
+                chunks_dropped=dropped,
+                duplicates_removed=duplicates,
+                messages_used=len(history),
+                messages_dropped=history.dropped,
+            )
+            if current is not None:
+                current.attributes.update(usage.model_dump())
+        for part in ("prompt", "history", "context", "total"):
+            PROMPT_TOKENS.observe(getattr(usage, f"{part}_tokens"), part=part)
+        return "\n".join(chunk for _, chunk in selected), history, usage
+
+    def rank(self, items: Sequence[RetrieverResultItem]) -> List[RetrieverResultItem]:
+        return sorted(
+            items, key=lambda item: -float((item.metadata or {}).get("score") or 0)
+        )
+
+    def deduplicate(self, text: str, selected: Sequence[str]) -> str | None:
+        for other in selected:
+            if text in other:
+                return None
+            text = text[self.__overlap(other, text) :]
+            cut = self.__overlap(text, other)
+            if cut:
+                text = text[:-cut]
+            if not text.strip():
+                return None
+        return text
+
+    def render(self, text: str, item: RetrieverResultItem) -> str:
+        metadata = item.metadata or {}
+        source = " - ".join(
+            str(metadata[key]) for key in ("subject", "file_name") if metadata.get(key)
+        )
+        return f"[{source}]\n{text}" if source else text
+
+    def __overlap(self, head: str, tail: str) -> int:
+        longest = min(len(head), len(tail), self.max_overlap)
+        for size in range(longest, self.min_overlap - 1, -1):
+            if head.endswith(tail[:size]):
+                return size
+        return 0
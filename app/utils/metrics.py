@@ -0,0 +1,230 @@
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Callable, Iterator, Sequence
+import math
+import threading
+import time
+
+DEFAULT_BUCKETS = (
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+    60.0,
+)
+
+LabelValues = tuple[str, ...]
+Collector = Callable[[], dict[LabelValues, float]]
+
+
+def escape_label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def format_labels(names: Sequence[str], values: LabelValues, **extra: str) -> str:
+    pairs = list(zip(names, values)) + list(extra.items())
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{escape_label(v)}"' for k, v in pairs) + "}"
+
+
+def format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value))
+
+
+class Metric:
+    type = "untyped"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()) -> None:
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def labels_key(self, labels: dict[str, str]) -> LabelValues:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def render(self) -> list[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type}"]
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()) -> None:
+        super().__init__(name, help, labelnames)
+        self.__values: dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = self.labels_key(labels)
+        with self._lock:
+            self.__values[key] = self.__values.get(key, 0) + amount
+
+    def value(self, **labels: str) -> float:
+        with self._lock:
+            return self.__values.get(self.labels_key(labels), 0)
+
+    def render(self) -> list[str]:
+        with self._lock:
+            values = dict(self.__values)
+        return super().render() + [
+            f"{self.name}{format_labels(self.labelnames, key)} {format_value(value)}"
+            for key, value in sorted(values.items())
+        ]
+
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ) -> None:
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self.__counts: dict[LabelValues, list[int]] = {}
+        self.__sums: dict[LabelValues, float] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self.labels_key(labels)
+        with self._lock:
+            counts = self.__counts.setdefault(key, [0] * (len(self.buckets) + 1))
+            counts[bisect_left(self.buckets, value)] += 1
+            self.__sums[key] = self.__sums.get(key, 0) + value
+
+    @contextmanager
+    def time(self, **labels: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def count(self, **labels: str) -> int:
+        with self._lock:
+            return sum(self.__counts.get(self.labels_key(labels), []))
+
+    def render(self) -> list[str]:
+        with self._lock:
+            counts = {key: list(value) for key, value in self.__counts.items()}
+            sums = dict(self.__sums)
+        lines = super().render()
+        for key in sorted(counts):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts[key]):
+                cumulative += count
+                labels = format_labels(self.labelnames, key, le=format_value(bound))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {format_value(sums[key])}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class CallbackMetric(Metric):
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        type: str,
+        collect: Collector,
+        labelnames: Sequence[str] = (),
+    ) -> None:
+        super().__init__(name, help, labelnames)
+        self.type = type
+        self.collect = collect
+
+    def render(self) -> list[str]:
+        return super().render() + [
+            f"{self.name}{format_labels(self.labelnames, key)} {format_value(value)}"
+            for key, value in sorted(self.collect().items())
+        ]
+
+
+class MetricsRegistry:
+    def __init__(self) -> None:
+        self.__metrics: dict[str, Metric] = {}
+        self.__lock = threading.Lock()
+
+    def register(self, metric: Metric) -> Metric:
+        with self.__lock:
+            self.__metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, help, labelnames))
+
+    def histogram(
+        self,
+        name: str,
+        help: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ) -> Histogram:
+        return self.register(Histogram(name, help, labelnames, buckets))
+
+    def callback(
+        self,
+        name: str,
+        help: str,
+        type: str,
+        collect: Collector,
+        labelnames: Sequence[str] = (),
+    ) -> CallbackMetric:
+        return self.register(CallbackMetric(name, help, type, collect, labelnames))
+
+    def render(self) -> str:
+        with self.__lock:
+            metrics = list(self.__metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+metrics = MetricsRegistry()
+
+STAGE_LATENCY = metrics.histogram(
+    "faqchatbot_stage_duration_seconds",
+    "Latency of each request and ingestion stage.",
+    ["stage"],
+)
+LLM_TOKENS = metrics.counter(
+    "faqchatbot_llm_tokens_total",
+    "Tokens reported by the LLM provider.",
+    ["model", "kind"],
+)
+LLM_ERRORS = metrics.counter(
+    "faqchatbot_llm_errors_total",
+    "LLM calls that raised an error.",
+    ["model"],
+)
+EMBEDDING_REQUESTS = metrics.counter(
+    "faqchatbot_embedding_requests_total",
+    "Requests sent to the embedding endpoint.",
+    ["kind"],
+)
+INGESTED_CHUNKS = metrics.counter(
+    "faqchatbot_ingested_chunks_total",
+    "Chunks embedded and written by ingestion.",
+    ["mode"],
+)
+PROMPT_TOKENS = metrics.histogram(
+    "faqchatbot_prompt_tokens",
+    "Tokens assembled into each RAG prompt, by part.",
+    ["part"],
+    buckets=(64, 128, 256, 512, 1024, 2048, 4096, 8192, 16384),
+)
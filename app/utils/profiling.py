@@ -0,0 +1,248 @@
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from os import getenv
+from typing import Any, Callable, Iterator, Mapping
+from uuid import uuid4
+import logging
+import random
+import threading
+import time
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+logger = logging.getLogger(__name__)
+
+current_span: ContextVar["Span | None"] = ContextVar("current_span", default=None)
+
+
+class Span:
+    def __init__(self, name: str, **attributes: Any) -> None:
+        self.id = uuid4().hex
+        self.name = name
+        self.attributes = attributes
+        self.children: list[Span] = []
+        self.started_at = time.time()
+        self.start = time.perf_counter()
+        self.duration_ms: float | None = None
+
+    def finish(self) -> None:
+        self.duration_ms = (time.perf_counter() - self.start) * 1000
+
+    def totals(self) -> dict[str, float]:
+        totals: dict[str, float] = {}
+
+        def walk(span: Span, names: frozenset[str]) -> None:
+            for child in list(span.children):
+                if child.name not in names and child.duration_ms is not None:
+                    totals[child.name] = totals.get(child.name, 0) + child.duration_ms
+                walk(child, names | {child.name})
+
+        walk(self, frozenset())
+        return totals
+
+    def server_timing(self) -> str:
+        timings = [f"total;dur={self.duration_ms or 0:.1f}"]
+        timings += [
+            f"{name};dur={duration:.1f}" for name, duration in self.totals().items()
+        ]
+        return ", ".join(timings)
+
+    def to_dict(self, origin: float | None = None) -> dict:
+        origin = self.start if origin is None else origin
+        return {
+            "name": self.name,
+            "offset_ms": round((self.start - origin) * 1000, 3),
+            "duration_ms": (
+                None if self.duration_ms is None else round(self.duration_ms, 3)
+            ),
+            "attributes": self.attributes,
+            "children": [child.to_dict(origin) for child in list(self.children)],
+        }
+
+
+@contextmanager
+def span(name: str, **attributes: Any) -> Iterator[Span | None]:
+    parent = current_span.get()
+    if parent is None:
+        yield None
+        return
+    child = Span(name, **attributes)
+    parent.children.append(child)
+    token = current_span.set(child)
+    try:
+        yield child
+    finally:
+        child.finish()
+        try:
+            current_span.reset(token)
+        except ValueError:
+            current_span.set(parent)
+
+
+def parameters_shape(value: Any) -> Any:
+    if isinstance(value, Mapping):
+        return {key: parameters_shape(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        if not value:
+            return "list[0]"
+        return f"list[{len(value)}] of {type(value[0]).__name__}"
+    if isinstance(value, str):
+        return f"str[{len(value)}]"
+    return type(value).__name__
+
+
+def compact_query(query: str, limit: int = 500) -> str:
+    query = " ".join(query.split())
+    return query if len(query) <= limit else f"{query[:limit]}..."
+
+
+@contextmanager
+def query_span(query: str, parameters: Mapping | None = None) -> Iterator[None]:
+    start = time.perf_counter()
+    active = current_span.get() is not None
+    try:
+        if not active:
+            yield
+        else:
+            with span(
+                "cypher",
+                query=compact_query(query),
+                parameters=parameters_shape(parameters or {}),
+            ):
+                yield
+    finally:
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        slow_query_ms = float(getenv("SLOW_QUERY_MS") or 500)
+        if slow_query_ms > 0 and elapsed_ms >= slow_query_ms:
+            logger.warning(
+                "Slow Cypher query took %.0f ms: %s parameters=%s",
+                elapsed_ms,
+                compact_query(query),
+                parameters_shape(parameters or {}),
+            )
+
+
+def query_parameters(parameters: Mapping | None, kwargs: Mapping) -> dict:
+    return dict(parameters or {}) | {
+        key: value for key, value in kwargs.items() if not key.endswith("_")
+    }
+
+
+class ProfiledSession:
+    def __init__(self, session: Any) -> None:
+        self.__session = session
+
+    def __enter__(self) -> "ProfiledSession":
+        self.__session.__enter__()
+        return self
+
+    def __exit__(self, *exc: Any) -> Any:
+        return self.__session.__exit__(*exc)
+
+    def run(self, query: str, parameters: dict | None = None, **kwargs: Any) -> Any:
+        with query_span(str(query), query_parameters(parameters, kwargs)):
+            return self.__session.run(query, parameters, **kwargs)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.__session, name)
+
+
+class ProfiledDriver:
+    def __init__(self, driver: Any) -> None:
+        self.__driver = driver
+
+    def execute_query(
+        self, query_: str, parameters_: dict | None = None, **kwargs: Any
+    ) -> Any:
+        with query_span(str(query_), query_parameters(parameters_, kwargs)):
+            return self.__driver.execute_query(query_, parameters_, **kwargs)
+
+    def session(self, **kwargs: Any) -> ProfiledSession:
+        return ProfiledSession(self.__driver.session(**kwargs))
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.__driver, name)
+
+
+class Profiler:
+    def __init__(
+        self,
+        sample_rate: float = 0,
+        max_profiles: int = 100,
+        header: str = "X-Profile",
+        enabled: bool = False,
+    ) -> None:
+        self.enabled = enabled
+        self.sample_rate = sample_rate
+        self.header = header
+        self.__profiles: deque[Span] = deque(maxlen=max_profiles)
+        self.__lock = threading.Lock()
+
+    def should_profile(self, headers: Mapping[str, str]) -> bool:
+        if not self.enabled:
+            return False
+        value = headers.get(self.header)
+        if value is not None:
+            return value.lower() in ("1", "true", "yes")
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    @contextmanager
+    def profile(self, name: str, **attributes: Any) -> Iterator[Span]:
+        root = Span(name, **attributes)
+        token = current_span.set(root)
+        try:
+            yield root
+        finally:
+            root.finish()
+            current_span.reset(token)
+            with self.__lock:
+                self.__profiles.append(root)
+
+    def recent(self) -> list[dict]:
+        with self.__lock:
+            profiles = list(self.__profiles)
+        return [
+            {
+                "id": profile.id,
+                "name": profile.name,
+                "started_at": profile.started_at,
+                "duration_ms": profile.duration_ms,
+                "timings": profile.totals(),
+            }
+            for profile in reversed(profiles)
+        ]
+
+    def get(self, profile_id: str) -> dict | None:
+        with self.__lock:
+            profile = next((p for p in self.__profiles if p.id == profile_id), None)
+        if profile is None:
+            return None
+        return {"id": profile.id, "started_at": profile.started_at} | profile.to_dict()
+
+
+class ProfileMiddleware:
+    def __init__(self, app: ASGIApp, get_profiler: Callable[[Scope], Profiler]) -> None:
+        self.app = app
+        self.get_profiler = get_profiler
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        profiler = self.get_profiler(scope)
+        if not profiler.should_profile(Headers(scope=scope)):
+            await self.app(scope, receive, send)
+            return
+        with profiler.profile(f"{scope['method']} {scope['path']}") as root:
+
+            async def send_with_profile(message: Message) -> None:
+                if message["type"] == "http.response.start":
+                    root.finish()
+                    headers = MutableHeaders(scope=message)
+                    headers["X-Profile-Id"] = root.id
+                    headers["Server-Timing"] = root.server_timing()
+                await send(message)
+
+            await self.app(scope, receive, send_with_profile)
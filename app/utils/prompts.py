@@ -3,3 +3,8 @@ Do not use prior knowledge or make assumptions.
 If the provided context does not contain enough information to answer the question, clearly state that you do not have enough knowledge to answer.
 At the end of the answer add a reference, puting the tittle of the document and the subject using this format References: File:  Subject:.
 """
+
+SUMMARY_SYSTEM_INSTRUCTIONS = """You keep a running summary of a conversation between a user and an assistant.
+Update the current summary with the new messages, keeping the facts, names, decisions and open questions the assistant may need later.
+Return only the updated summary in plain text, in no more than 200 words.
+"""
@@ -0,0 +1,69 @@
+from collections import Counter
+from typing import List, Sequence
+import math
+
+from neo4j_graphrag.types import RetrieverResultItem
+
+from app.utils.tools import search_terms
+
+
+class LexicalReranker:
+    def __init__(self, weight: float = 0.3, k1: float = 1.2, b: float = 0.75) -> None:
+        self.weight = weight
+        self.k1 = k1
+        self.b = b
+
+    def scores(self, query_text: str, texts: Sequence[str]) -> List[float]:
+        terms = set(search_terms(query_text))
+        documents = [Counter(search_terms(text)) for text in texts]
+        if not terms or not documents:
+            return [0.0] * len(documents)
+        lengths = [sum(document.values()) for document in documents]
+        average = max(sum(lengths) / len(lengths), 1)
+        idf = {}
+        for term in terms:
+            found = sum(1 for document in documents if term in document)
+            idf[term] = math.log(1 + (len(documents) - found + 0.5) / (found + 0.5))
+        scores = []
+        for document, length in zip(documents, lengths):
+            norm = self.k1 * (1 - self.b + self.b * length / average)
+            scores.append(
+                sum(
+                    idf[term] * document[term] * (self.k1 + 1) / (document[term] + norm)
+                    for term in terms
+                    if term in document
+                )
+            )
+        return scores
+
+    def rerank(
+        self, query_text: str, items: Sequence[RetrieverResultItem]
+    ) -> List[RetrieverResultItem]:
+        if not items:
+            return []
+        lexical = self.__normalize(
+            self.scores(query_text, [item.content for item in items])
+        )
+        fused = self.__normalize(
+            [float((item.metadata or {}).get("score") or 0) for item in items]
+        )
+        reranked = [
+            RetrieverResultItem(
+                content=item.content,
+                metadata=(item.metadata or {})
+                | {
+                    "fused_score": (item.metadata or {}).get("score"),
+                    "score": (1 - self.weight) * fused_score
+                    + self.weight * lexical_score,
+                },
+            )
+            for item, lexical_score, fused_score in zip(items, lexical, fused)
+        ]
+        return sorted(reranked, key=lambda item: -item.metadata["score"])
+
+    @staticmethod
+    def __normalize(values: List[float]) -> List[float]:
+        low, high = min(values), max(values)
+        if high == low:
+            return [1.0 if high else 0.0] * len(values)
+        return [(value - low) / (high - low) for value in values]
@@ -0,0 +1,40 @@
+from typing import Any, Awaitable, Callable, Hashable
+import asyncio
+import threading
+
+
+class SingleFlight:
+    def __init__(self) -> None:
+        self.calls = 0
+        self.shared = 0
+        self.__tasks: dict[tuple[int, Hashable], asyncio.Task] = {}
+        self.__lock = threading.Lock()
+
+    async def do(self, key: Hashable, call: Callable[[], Awaitable[Any]]) -> Any:
+        loop = asyncio.get_running_loop()
+        flight_key = (id(loop), key)
+        with self.__lock:
+            task = self.__tasks.get(flight_key)
+            if task is None:
+                task = loop.create_task(call())
+                task.add_done_callback(lambda done: self.__finish(flight_key, done))
+                self.__tasks[flight_key] = task
+                self.calls += 1
+            else:
+                self.shared += 1
+        return await asyncio.shield(task)
+
+    def stats(self) -> dict:
+        with self.__lock:
+            return {
+                "calls": self.calls,
+                "shared": self.shared,
+                "in_flight": len(self.__tasks),
+            }
+
+    def __finish(self, flight_key: tuple[int, Hashable], task: asyncio.Task) -> None:
+        with self.__lock:
+            if self.__tasks.get(flight_key) is task:
+                del self.__tasks[flight_key]
+        if not task.cancelled():
+            task.exception()
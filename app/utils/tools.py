@@ -1,3 +1,8 @@
+import hashlib
+import json
+import re
+
+
 def singleton(cls):
     instances = {}
 
@@ -6,4 +11,42 @@ def singleton(cls):
             instances[cls] = cls(*args, **kwargs)
         return instances[cls]
 
+    get_instance.__wrapped__ = cls
     return get_instance
+
+
+def format_sse(data: dict, event: str | None = None) -> str:
+    message = f"data: {json.dumps(data)}\n\n"
+    if event:
+        message = f"event: {event}\n{message}"
+    return message
+
+
+def normalize_text(text: str) -> str:
+    return " ".join(text.split()).casefold()
+
+
+def scope_key(filters: dict[str, str] | None) -> str | None:
+    if not filters:
+        return None
+    return "&".join(f"{key}={value}" for key, value in sorted(filters.items()))
+
+
+def hash_text(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def hash_file(file_path: str, chunk_size: int = 1024 * 1024) -> str:
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as file:
+        while chunk := file.read(chunk_size):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def search_terms(text: str) -> list[str]:
+    return re.findall(r"\w+(?:[.\-:/]\w+)*", text.casefold())
+
+
+def fulltext_query(text: str) -> str:
+    return " OR ".join(f'"{term}"' for term in dict.fromkeys(search_terms(text)))
@@ -0,0 +1,690 @@
+from itertools import count
+from types import SimpleNamespace
+from typing import Any, AsyncIterator, Callable, List
+import asyncio
+import json
+import math
+import random
+import re
+import threading
+import time
+
+from langchain_core.embeddings import Embeddings
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from neo4j import AsyncDriver, Driver, EagerResult, Record
+
+from app.database.database import Neo4jDatabase
+from app.services.admission import AdmissionController
+from app.services.llm import LLM, EmbbeddingHuggingFace
+from app.utils.cache import TTLCache
+from app.utils.context import ContextAssembler
+from app.utils.tools import hash_text
+
+
+class FakeChatModel:
+    def __init__(self, latency: float = 0.2, tokens: int = 20) -> None:
+        self.latency = latency
+        self.tokens = tokens
+
+    def invoke(
+        self, messages: List[BaseMessage], response_format: dict | None = None
+    ) -> AIMessage:
+        time.sleep(self.latency)
+        return AIMessage(content=self.answer(messages, response_format))
+
+    async def ainvoke(
+        self, messages: List[BaseMessage], response_format: dict | None = None
+    ) -> AIMessage:
+        await asyncio.sleep(self.latency)
+        return AIMessage(content=self.answer(messages, response_format))
+
+    async def astream(
+        self, messages: List[BaseMessage], response_format: dict | None = None
+    ) -> AsyncIterator[AIMessageChunk]:
+        for token in self.answer(messages, response_format).split(" "):
+            await asyncio.sleep(self.latency / self.tokens)
+            yield AIMessageChunk(content=f"{token} ")
+
+    def answer(
+        self, messages: List[BaseMessage], response_format: dict | None = None
+    ) -> str:
+        digest = hash_text(messages[-1].content)[:8]
+        if (response_format or {}).get("type") == "json_object":
+            node = {"id": "0", "label": "Topic", "properties": {"name": digest}}
+            return json.dumps({"nodes": [node], "relationships": []})
+        return " ".join(["token"] * (self.tokens - 1) + [digest])
+
+
+class FakeLLM(LLM):
+    def __init__(
+        self,
+        latency: float = 0.2,
+        tokens: int = 20,
+        admission: AdmissionController | None = None,
+        context: ContextAssembler | None = None,
+    ) -> None:
+        super().__init__(
+            "fake",
+            admission=admission,
+            context=context,
+            model=FakeChatModel(latency, tokens),
+        )
+
+
+class FakeEmbeddings(Embeddings):
+    def __init__(self, latency: float = 0.05, dimensions: int = 384) -> None:
+        self.latency = latency
+        self.dimensions = dimensions
+
+    def vector(self, text: str) -> List[float]:
+        generator = random.Random(hash_text(text))
+        return [generator.uniform(-1, 1) for _ in range(self.dimensions)]
+
+    def embed_query(self, text: str) -> List[float]:
+        time.sleep(self.latency)
+        return self.vector(text)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        await asyncio.sleep(self.latency)
+        return self.vector(text)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        time.sleep(self.latency)
+        return [self.vector(text) for text in texts]
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        await asyncio.sleep(self.latency)
+        return [self.vector(text) for text in texts]
+
+
+class FakeEmbedder(EmbbeddingHuggingFace):
+    def __init__(
+        self,
+        latency: float = 0.05,
+        dimensions: int = 384,
+        cache: TTLCache | None = None,
+    ) -> None:
+        super().__init__(
+            cache=cache if cache is not None else TTLCache(),
+            embeddings=FakeEmbeddings(latency, dimensions),
+        )
+        self.model_name = "fake"
+        self.dimensions = dimensions
+
+    def vector(self, text: str) -> List[float]:
+        return self.embedder.vector(text)
+
+
+def cosine(left: List[float], right: List[float]) -> float:
+    norm = math.sqrt(sum(x * x for x in left)) * math.sqrt(sum(y * y for y in right))
+    return sum(x * y for x, y in zip(left, right)) / norm if norm else 0.0
+
+
+class InMemoryGraph:
+    def __init__(self, dimensions: int = 384) -> None:
+        self.dimensions = dimensions
+        self.schema_version: int | None = None
+        self.nodes: dict[tuple, dict] = {}
+        self.sessions: dict[str, dict] = {}
+        self.documents: dict[str, dict] = {}
+        self.chunks: dict[str, dict] = {}
+        self.entities: dict[str, dict] = {}
+        self.__ids = count()
+        self.__lock = threading.Lock()
+        self.__handlers: list[tuple[re.Pattern, Callable[[str, dict], list]]] = [
+            (r"CALL dbms\.components\(\)", self.__components),
+            (r"SHOW VECTOR INDEXES", self.__vector_indexes),
+            (r"MATCH \(v:SchemaVersion\)", self.__get_schema_version),
+            (r"MERGE \(v:SchemaVersion", self.__set_schema_version),
+            (r"^\s*CREATE (VECTOR |FULLTEXT )?(INDEX|CONSTRAINT)", self.__noop),
+            (r"RETURN d\.hash AS hash", self.__document_chunks),
+            (r"REMOVE d\.hash", self.__reset_document_hash),
+            (r"WHERE c\.extracted = false", self.__pending_extraction),
+            (r"SET c\.extracted = true", self.__mark_extracted),
+            (r"WITH c, collect\(e\) AS entities", self.__delete_chunks),
+            (r"CREATE \(c:Chunk:__KGBuilder__", self.__write_chunks),
+            (r"MATCH \(c:Chunk \{ingestion_id:", self.__ingestion_chunks),
+            (r"__tmp_internal_id IN \$node_ids", self.__delete_written_nodes),
+            (r"MERGE \(c\)-\[:FROM_DOCUMENT\]->\(d\)", self.__link_chunks),
+            (r"MERGE \(previous\)-\[:NEXT_CHUNK\]", self.__noop),
+            (r"FOREACH \(node IN documents", self.__delete_document),
+            (r"CREATE \(n:__KGBuilder__", self.__upsert_nodes),
+            (r"apoc\.merge\.relationship", self.__upsert_relationships),
+            (r"apoc\.refactor\.mergeNodes", self.__merge_entities),
+            (r"RETURN count\(entity\) as c", self.__count_entities),
+            (r"SET n\.__tmp_internal_id = NULL", self.__clean_written_nodes),
+            (r"OPTIONAL MATCH \(owned:Session", self.__open_session),
+            (r"MERGE \(s:`Session` \{id:\$session_id\}\)", self.__create_session),
+            (r"CREATE \(s\)-\[:LAST_MESSAGE\]->\(new:Message\)", self.__add_message),
+            (r"AS result$", self.__get_messages),
+            (r"UNWIND nodes(\(p\))? as node", self.__clear_session),
+            (r"MATCH \(s:Session \{id: row\.session_id\}\)", self.__save_messages),
+            (r"id: elementId\(node\)", self.__summary_window),
+            (r"MERGE \(s\)-\[:HAS_SUMMARY\]", self.__save_summary),
+            (r"DETACH DELETE summary", self.__delete_summary),
+            (r"-\[\]->\(s:Session\)", self.__sessions_of),
+            (r"MERGE \(n\)-\[r:HAS_CONVERSATION\]->\(s\)", self.__link_session),
+            (r"vector\.similarity\.cosine|db\.index\.vector", self.__search),
+            (r"^\s*MERGE \(n:\w+ \{", self.__save_node),
+            (r"^\s*MATCH \(n:\w+ \{[^}]*\}\)\s+RETURN n", self.__get_node),
+            (r"^\s*MATCH \(n:\w+ \{[^}]*\}\)\s+DETACH DELETE n", self.__delete_node),
+        ]
+        self.__handlers = [
+            (re.compile(pattern, re.MULTILINE | re.IGNORECASE), handler)
+            for pattern, handler in self.__handlers
+        ]
+
+    def handler(self, query: str) -> Callable[[str, dict], list]:
+        handlers = [
+            handler for pattern, handler in self.__handlers if pattern.search(query)
+        ]
+        if len(handlers) != 1:
+            names = ", ".join(handler.__name__ for handler in handlers) or "no handler"
+            raise NotImplementedError(
+                f"Query matches {names}: {' '.join(query.split())}"
+            )
+        return handlers[0]
+
+    def run(self, query: str, parameters: dict | None = None) -> List[Record]:
+        handler = self.handler(query)
+        with self.__lock:
+            return [Record(row) for row in handler(query, parameters or {})]
+
+    def add_document(
+        self, metadata: dict, texts: List[str], vector: Callable[[str], List[float]]
+    ) -> None:
+        with self.__lock:
+            document_id = self.__new_id()
+            self.documents[document_id] = dict(metadata)
+            for index, text in enumerate(texts):
+                self.chunks[self.__new_id()] = {
+                    "text": text,
+                    "index": index,
+                    "hash": hash_text(text),
+                    "embedding": vector(text),
+                    "document": document_id,
+                }
+
+    def __new_id(self) -> str:
+        return f"4:fake:{next(self.__ids)}"
+
+    def __noop(self, query: str, parameters: dict) -> list:
+        return []
+
+    def __components(self, query: str, parameters: dict) -> list:
+        return [{"name": "Neo4j Kernel", "versions": ["5.26.0"], "edition": "fake"}]
+
+    def __vector_indexes(self, query: str, parameters: dict) -> list:
+        return [
+            {
+                "labels": ["Chunk"],
+                "properties": ["embedding"],
+                "dimensions": self.dimensions,
+                "filterable_properties": [],
+            }
+        ]
+
+    def __get_schema_version(self, query: str, parameters: dict) -> list:
+        return [{"version": self.schema_version}]
+
+    def __set_schema_version(self, query: str, parameters: dict) -> list:
+        self.schema_version = parameters["version"]
+        return []
+
+    def __find_documents(self, metadata: dict) -> List[str]:
+        return [
+            document_id
+            for document_id, document in self.documents.items()
+            if all(document.get(key) == value for key, value in metadata.items())
+        ]
+
+    def __document_chunks(self, query: str, parameters: dict) -> list:
+        return [
+            {
+                "hash": self.documents[document_id].get("hash"),
+                "chunks": [
+                    [chunk_id, chunk["hash"]]
+                    for chunk_id, chunk in self.chunks.items()
+                    if chunk.get("document") == document_id
+                ],
+            }
+            for document_id in self.__find_documents(parameters["metadata"])
+        ]
+
+    def __reset_document_hash(self, query: str, parameters: dict) -> list:
+        for document_id in self.__find_documents(parameters["metadata"]):
+            self.documents[document_id].pop("hash", None)
+        return []
+
+    def __pending_extraction(self, query: str, parameters: dict) -> list:
+        rows = []
+        for document_id in self.__find_documents(parameters["metadata"]):
+            for chunk_id, chunk in self.chunks.items():
+                if chunk.get("document") == document_id and not chunk["extracted"]:
+                    chunk["tmp_id"] = chunk_id
+                    rows.append(
+                        {"element_id": chunk_id, "text": chunk["text"], "index": 0}
+                    )
+        return rows
+
+    def __mark_extracted(self, query: str, parameters: dict) -> list:
+        for chunk_id in parameters["element_ids"]:
+            self.chunks[chunk_id]["extracted"] = True
+        return []
+
+    def __remove_chunks(self, chunk_ids: List[str]) -> None:
+        for chunk_id in chunk_ids:
+            self.chunks.pop(chunk_id, None)
+        for entity_id, entity in list(self.entities.items()):
+            if entity["chunks"] & set(chunk_ids):
+                entity["chunks"] -= set(chunk_ids)
+                if not entity["chunks"]:
+                    del self.entities[entity_id]
+
+    def __delete_chunks(self, query: str, parameters: dict) -> list:
+        self.__remove_chunks(parameters["element_ids"])
+        return []
+
+    def __ingestion_chunks(self, query: str, parameters: dict) -> list:
+        return [
+            {"element_id": chunk_id}
+            for chunk_id, chunk in self.chunks.items()
+            if chunk.get("ingestion_id") == parameters["ingestion_id"]
+        ]
+
+    def __delete_written_nodes(self, query: str, parameters: dict) -> list:
+        node_ids = set(parameters["node_ids"])
+        self.__remove_chunks(
+            [
+                chunk_id
+                for chunk_id, chunk in self.chunks.items()
+                if chunk.get("tmp_id") in node_ids
+            ]
+        )
+        for entity_id, entity in list(self.entities.items()):
+            if entity.get("tmp_id") in node_ids:
+                del self.entities[entity_id]
+        return []
+
+    def __clean_written_nodes(self, query: str, parameters: dict) -> list:
+        for node in list(self.chunks.values()) + list(self.entities.values()):
+            node.pop("tmp_id", None)
+        return []
+
+    def __write_chunks(self, query: str, parameters: dict) -> list:
+        for row in parameters["rows"]:
+            self.chunks[self.__new_id()] = row["properties"] | {
+                "id": row["id"],
+                "embedding": row["embedding"],
+            }
+        return []
+
+    def __link_chunks(self, query: str, parameters: dict) -> list:
+        metadata = parameters["metadata"]
+        found = self.__find_documents(metadata)
+        document_id = found[0] if found else self.__new_id()
+        self.documents.setdefault(document_id, dict(metadata)).update(
+            hash=parameters["document_hash"], path=parameters["path"]
+        )
+        for row in parameters["chunks"]:
+            for chunk in self.chunks.values():
+                if chunk["hash"] == row["hash"] and (
+                    chunk.get("ingestion_id") == parameters["ingestion_id"]
+                    or chunk.get("document") == document_id
+                ):
+                    chunk.pop("ingestion_id", None)
+                    chunk.update(document=document_id, index=row["index"])
+        return []
+
+    def __delete_document(self, query: str, parameters: dict) -> list:
+        for document_id in self.__find_documents(parameters["metadata"]):
+            self.__remove_chunks(
+                [
+                    chunk_id
+                    for chunk_id, chunk in self.chunks.items()
+                    if chunk.get("document") == document_id
+                ]
+            )
+            del self.documents[document_id]
+        return []
+
+    def __upsert_nodes(self, query: str, parameters: dict) -> list:
+        for row in parameters["rows"]:
+            element_id = self.__new_id()
+            node = row["properties"] | {"tmp_id": row["id"], "chunks": set()}
+            if "Chunk" in row["labels"]:
+                node["embedding"] = (row.get("embedding_properties") or {}).get(
+                    "embedding"
+                )
+                self.chunks[element_id] = node
+            else:
+                self.entities[element_id] = node
+        return []
+
+    def __upsert_relationships(self, query: str, parameters: dict) -> list:
+        chunks = {
+            chunk.get("tmp_id"): chunk_id for chunk_id, chunk in self.chunks.items()
+        }
+        entities = {entity.get("tmp_id"): entity for entity in self.entities.values()}
+        for row in parameters["rows"]:
+            if row["type"] == "FROM_CHUNK" and row["start_node_id"] in entities:
+                entities[row["start_node_id"]]["chunks"].add(chunks[row["end_node_id"]])
+        return []
+
+    def __count_entities(self, query: str, parameters: dict) -> list:
+        return [{"c": len(self.entities)}]
+
+    def __merge_entities(self, query: str, parameters: dict) -> list:
+        return [{"c": 0}]
+
+    def __owner(self, query: str, parameters: dict, pattern: str) -> tuple:
+        label, keys = re.search(pattern, query).groups()
+        return (label,) + tuple(
+            parameters[name] for _, name in re.findall(r"(\w+): \$(\w+)", keys)
+        )
+
+    def __session(self, session_id: str, owner: tuple | None = None) -> dict:
+        return self.sessions.setdefault(
+            session_id,
+            {"owner": owner, "messages": [], "summary": None, "cursor": 0},
+        )
+
+    def __unsummarized(self, query: str, session: dict) -> List[dict]:
+        window = int(re.search(r"NEXT\*0\.\.(\d+)", query).group(1)) + 1
+        return session["messages"][session["cursor"] :][-window:]
+
+    def __open_session(self, query: str, parameters: dict) -> list:
+        owner = self.__owner(query, parameters, r"\(:(\w+) \{([^}]*)\}\)")
+        if owner not in self.nodes:
+            return []
+        session_id = parameters["session_id"]
+        if self.sessions.get(session_id, {}).get("owner") != owner:
+            session_id = parameters["new_session_id"]
+        session = self.__session(session_id, owner)
+        return [
+            {
+                "session_id": session_id,
+                "summary": session["summary"],
+                "messages": [
+                    {"role": message["role"], "content": message["content"]}
+                    for message in self.__unsummarized(query, session)
+                ],
+            }
+        ]
+
+    def __create_session(self, query: str, parameters: dict) -> list:
+        self.__session(parameters["session_id"])
+        return []
+
+    def __add_message(self, query: str, parameters: dict) -> list:
+        session = self.sessions.get(parameters["session_id"])
+        if session is not None:
+            session["messages"].append(
+                {
+                    "id": self.__new_id(),
+                    "role": parameters["role"],
+                    "content": parameters["content"],
+                }
+            )
+        return []
+
+    def __get_messages(self, query: str, parameters: dict) -> list:
+        session = self.sessions.get(parameters["session_id"], {"messages": []})
+        window = re.search(r"NEXT\*0\.\.(\d*)", query).group(1)
+        messages = session["messages"]
+        if window:
+            messages = messages[-(int(window) + 1) :]
+        return [
+            {
+                "result": {
+                    "data": {"content": message["content"]},
+                    "role": message["role"],
+                }
+            }
+            for message in messages
+        ]
+
+    def __clear_session(self, query: str, parameters: dict) -> list:
+        if "CASE WHEN p IS NULL" in query:
+            self.sessions.pop(parameters["session_id"], None)
+        elif parameters["session_id"] in self.sessions:
+            self.sessions[parameters["session_id"]]["messages"] = []
+        return []
+
+    def __save_messages(self, query: str, parameters: dict) -> list:
+        for row in parameters["rows"]:
+            for message in row["messages"]:
+                self.__add_message(query, {"session_id": row["session_id"]} | message)
+        return []
+
+    def __summary_window(self, query: str, parameters: dict) -> list:
+        session = self.sessions.get(parameters["session_id"])
+        if not session or not session["messages"]:
+            return []
+        return [
+            {
+                "summary": session["summary"],
+                "messages": self.__unsummarized(query, session),
+            }
+        ]
+
+    def __save_summary(self, query: str, parameters: dict) -> list:
+        session = self.sessions[parameters["session_id"]]
+        ids = [message["id"] for message in session["messages"]]
+        session["summary"] = parameters["content"]
+        session["cursor"] = ids.index(parameters["cursor_id"]) + 1
+        return []
+
+    def __delete_summary(self, query: str, parameters: dict) -> list:
+        session = self.sessions.get(parameters["session_id"])
+        if session is not None:
+            session["summary"], session["cursor"] = None, 0
+        return []
+
+    def __sessions_of(self, query: str, parameters: dict) -> list:
+        owner = self.__owner(query, parameters, r"\(n:(\w+) \{([^}]*)\}\)")
+        return [
+            {"s.id": session_id}
+            for session_id, session in self.sessions.items()
+            if session["owner"] == owner
+        ]
+
+    def __link_session(self, query: str, parameters: dict) -> list:
+        owner = self.__owner(query, parameters, r"\(n:(\w+) \{([^}]*)\}\)")
+        self.__session(parameters["session_id"])["owner"] = owner
+        return []
+
+    def __search(self, query: str, parameters: dict) -> list:
+        filters = {
+            key: parameters[key]
+            for key in ("subject", "file_name")
+            if key in parameters
+        }
+        documents = set(self.__find_documents(filters))
+        candidates = [
+            chunk
+            for chunk in self.chunks.values()
+            if chunk.get("document") in documents and chunk.get("embedding")
+        ]
+        scored = sorted(
+            (
+                (cosine(chunk["embedding"], parameters["query_vector"]), chunk)
+                for chunk in candidates
+            ),
+            key=lambda pair: -pair[0],
+        )
+        return [
+            {
+                "text": chunk["text"],
+                "subject": self.documents[chunk["document"]].get("subject"),
+                "tittle": self.documents[chunk["document"]].get("file_name"),
+                "score": score,
+            }
+            for score, chunk in scored[: parameters["top_k"]]
+        ]
+
+    def __save_node(self, query: str, parameters: dict) -> list:
+        key = self.__owner(query, parameters, r"MERGE \(n:(\w+) \{([^}]*)\}\)")
+        node = self.nodes.setdefault(key, {})
+        node.update(parameters)
+        return [{"n": dict(node)}]
+
+    def __get_node(self, query: str, parameters: dict) -> list:
+        key = self.__owner(query, parameters, r"MATCH \(n:(\w+) \{([^}]*)\}\)")
+        return [{"n": dict(self.nodes[key])}] if key in self.nodes else []
+
+    def __delete_node(self, query: str, parameters: dict) -> list:
+        self.nodes.pop(
+            self.__owner(query, parameters, r"MATCH \(n:(\w+) \{([^}]*)\}\)"), None
+        )
+        return []
+
+
+def query_parameters(parameters: dict | None, kwargs: dict) -> dict:
+    return dict(parameters or {}) | {
+        key: value for key, value in kwargs.items() if not key.endswith("_")
+    }
+
+
+class FakeSession:
+    def __init__(self, graph: InMemoryGraph) -> None:
+        self.graph = graph
+
+    def __enter__(self) -> "FakeSession":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        pass
+
+    def run(self, query: str, parameters: dict | None = None, **kwargs: Any) -> list:
+        return self.graph.run(query, query_parameters(parameters, kwargs))
+
+
+class FakeDriver(Driver):
+    def __init__(self, graph: InMemoryGraph, latency: float = 0.005) -> None:
+        self.graph = graph
+        self.latency = latency
+        self._closed = False
+        self._pool = SimpleNamespace(pool_config=SimpleNamespace(user_agent=None))
+
+    def execute_query(
+        self, query_: str, parameters_: dict | None = None, **kwargs: Any
+    ) -> EagerResult:
+        time.sleep(self.latency)
+        records = self.graph.run(query_, query_parameters(parameters_, kwargs))
+        return EagerResult(records, None, list(records[0].keys()) if records else [])
+
+    def session(self, **kwargs: Any) -> FakeSession:
+        return FakeSession(self.graph)
+
+    def verify_connectivity(self) -> None:
+        pass
+
+    def close(self) -> None:
+        self._closed = True
+
+
+class FakeAsyncTransaction:
+    def __init__(self, graph: InMemoryGraph, latency: float) -> None:
+        self.graph = graph
+        self.latency = latency
+        self.queries: list[tuple[str, dict]] = []
+
+    async def __aenter__(self) -> "FakeAsyncTransaction":
+        return self
+
+    async def __aexit__(self, *exc: Any) -> None:
+        pass
+
+    async def run(self, query: str, parameters: dict | None = None, **kwargs: Any):
+        self.queries.append((query, query_parameters(parameters, kwargs)))
+
+    async def commit(self) -> None:
+        await asyncio.sleep(self.latency)
+        for query, parameters in self.queries:
+            self.graph.run(query, parameters)
+        self.queries = []
+
+
+class FakeAsyncSession:
+    def __init__(self, graph: InMemoryGraph, latency: float) -> None:
+        self.graph = graph
+        self.latency = latency
+
+    async def __aenter__(self) -> "FakeAsyncSession":
+        return self
+
+    async def __aexit__(self, *exc: Any) -> None:
+        pass
+
+    async def begin_transaction(self) -> FakeAsyncTransaction:
+        return FakeAsyncTransaction(self.graph, self.latency)
+
+
+class FakeAsyncDriver(AsyncDriver):
+    def __init__(self, graph: InMemoryGraph, latency: float = 0.005) -> None:
+        self.graph = graph
+        self.latency = latency
+        self._closed = False
+
+    async def execute_query(
+        self, query_: str, parameters_: dict | None = None, **kwargs: Any
+    ) -> EagerResult:
+        await asyncio.sleep(self.latency)
+        records = self.graph.run(query_, query_parameters(parameters_, kwargs))
+        return EagerResult(records, None, list(records[0].keys()) if records else [])
+
+    def session(self, **kwargs: Any) -> FakeAsyncSession:
+        return FakeAsyncSession(self.graph, self.latency)
+
+    async def close(self) -> None:
+        self._closed = True
+
+
+def in_memory_database(
+    embedder: FakeEmbedder,
+    latency: float = 0.005,
+    chunks: int = 1000,
+    context: ContextAssembler | None = None,
+) -> Neo4jDatabase:
+    graph = InMemoryGraph(embedder.dimensions)
+    graph.add_document(
+        {"subject": "Benchmark", "file_name": "documentation.pdf"},
+        [f"Chunk {index} of the documentation" for index in range(chunks)],
+        embedder.vector,
+    )
+    return Neo4jDatabase.__wrapped__(
+        embedder,
+        context,
+        driver=FakeDriver(graph, latency),
+        async_driver_factory=lambda: FakeAsyncDriver(graph, latency),
+    )
+
+
+def estimate_tokens(text: str) -> int:
+    return max(len(text) // 4, 1)
+
+
+def pdf_document(text: str) -> bytes:
+    content = f"BT /F1 12 Tf 72 720 Td ({text}) Tj ET".encode()
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"<< /Type /Pages /Kids [3 0 R] /Count 1 >>",
+        b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Contents 4 0 R "
+        b"/Resources << /Font << /F1 5 0 R >> >> >>",
+        b"<< /Length %d >>\nstream\n%s\nendstream" % (len(content), content),
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    document = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(document))
+        document += b"%d 0 obj\n%s\nendobj\n" % (number, body)
+    xref = len(document)
+    document += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    document += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    document += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (
+        len(objects) + 1,
+        xref,
+    )
+    return bytes(document)
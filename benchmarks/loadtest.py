@@ -0,0 +1,272 @@
+from itertools import cycle
+from pathlib import Path
+from time import perf_counter
+from typing import Iterator
+import argparse
+import asyncio
+import json
+import random
+
+import httpx
+
+from benchmarks.stats import percentile, summarize
+
+KINDS = ("chat", "rag", "sessions", "login", "upload")
+DEFAULT_MIX = {"chat": 3, "rag": 5, "sessions": 1, "login": 1, "upload": 0}
+QUESTIONS = [
+    "How do I configure the graph?",
+    "What is a vector index?",
+    "How are documents split into chunks?",
+    "Which embedding model is used?",
+    "How do I reset my password?",
+    "What does the resolver do?",
+]
+
+
+class VirtualUser:
+    def __init__(self, index: int) -> None:
+        self.email = f"loadtest-{index}@email.com"
+        self.password = f"loadtest-{index}"
+        self.headers: dict = {}
+        self.session_id: str | None = None
+
+
+class Traffic:
+    def __init__(
+        self,
+        mix: dict[str, float],
+        session_reuse: float,
+        users: int,
+        seed: int,
+        replay: list[dict] | None = None,
+    ) -> None:
+        self.mix = mix
+        self.session_reuse = session_reuse
+        self.users = users
+        self.random = random.Random(seed)
+        self.replay: Iterator[dict] | None = cycle(replay) if replay else None
+
+    def next(self) -> dict:
+        if self.replay is not None:
+            return next(self.replay)
+        kinds = [kind for kind in KINDS if self.mix.get(kind)]
+        kind = self.random.choices(kinds, [self.mix[kind] for kind in kinds])[0]
+        return {
+            "kind": kind,
+            "user": self.random.randrange(self.users),
+            "text": self.random.choice(QUESTIONS),
+            "reuse_session": self.random.random() < self.session_reuse,
+        }
+
+
+async def setup_users(client: httpx.AsyncClient, total: int) -> list[VirtualUser]:
+    users = [VirtualUser(index) for index in range(total)]
+
+    async def login(user: VirtualUser) -> None:
+        await client.post(
+            "/user/",
+            json={
+                "email": user.email,
+                "username": user.email,
+                "password": user.password,
+            },
+        )
+        response = await client.post(
+            "/user/token", data={"username": user.email, "password": user.password}
+        )
+        response.raise_for_status()
+        user.headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+    await asyncio.gather(*(login(user) for user in users))
+    return users
+
+
+async def send(
+    client: httpx.AsyncClient, user: VirtualUser, request: dict, pdf: bytes | None
+) -> httpx.Response:
+    kind = request["kind"]
+    if kind in ("chat", "rag"):
+        session_id = user.session_id if request.get("reuse_session") else None
+        response = await client.post(
+            "/llm/rag/" if kind == "rag" else "/llm/",
+            json={"text": request.get("text", QUESTIONS[0]), "session_id": session_id},
+            headers=user.headers,
+        )
+        if response.status_code == 200:
+            user.session_id = response.json()["session_id"]
+        return response
+    if kind == "sessions":
+        return await client.get("/llm/sessions", headers=user.headers)
+    if kind == "login":
+        return await client.post(
+            "/user/token", data={"username": user.email, "password": user.password}
+        )
+    if kind == "upload":
+        return await client.post(
+            "/files/",
+            files={"file": ("loadtest.pdf", pdf or b"", "application/pdf")},
+            data={
+                "document_subject": "Load test",
+                "file_name": f"loadtest-{request['user']}.pdf",
+                "mode": request.get("mode", "vector"),
+            },
+            headers=user.headers,
+        )
+    raise ValueError(f"Unknown request kind: {kind}")
+
+
+async def run_stage(
+    client: httpx.AsyncClient,
+    users: list[VirtualUser],
+    traffic: Traffic,
+    concurrency: int,
+    duration: float,
+    pdf: bytes | None,
+    recorded: list[dict] | None = None,
+) -> dict:
+    latencies: list[float] = []
+    statuses: dict[int, int] = {}
+    kinds: dict[str, list[float]] = {}
+    deadline = perf_counter() + duration
+
+    async def worker() -> None:
+        while perf_counter() < deadline:
+            request = traffic.next()
+            if recorded is not None:
+                recorded.append(request)
+            start = perf_counter()
+            try:
+                response = await send(
+                    client, users[request["user"] % len(users)], request, pdf
+                )
+                status = response.status_code
+            except httpx.HTTPError:
+                status = 599
+            latency = perf_counter() - start
+            latencies.append(latency)
+            kinds.setdefault(request["kind"], []).append(latency)
+            statuses[status] = statuses.get(status, 0) + 1
+
+    start = perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = perf_counter() - start
+    return (
+        {"concurrency": concurrency}
+        | summarize(latencies, statuses, elapsed)
+        | {
+            "p95_ms_by_kind": {
+                kind: percentile(values, 95) * 1000 for kind, values in kinds.items()
+            }
+        }
+    )
+
+
+async def run(args: argparse.Namespace) -> list[dict]:
+    replay = None
+    if args.replay:
+        with open(args.replay) as file:
+            replay = [json.loads(line) for line in file if line.strip()]
+    traffic = Traffic(args.mix, args.session_reuse, args.users, args.seed, replay)
+    pdf = Path(args.pdf).read_bytes() if args.pdf else None
+    recorded: list[dict] | None = [] if args.record else None
+    async with httpx.AsyncClient(
+        base_url=args.url,
+        timeout=args.timeout,
+        limits=httpx.Limits(max_connections=max(args.ramp) + args.users),
+    ) as client:
+        users = await setup_users(client, args.users)
+        results = []
+        for concurrency in args.ramp:
+            result = await run_stage(
+                client, users, traffic, concurrency, args.stage_seconds, pdf, recorded
+            )
+            results.append(result)
+            if not args.json:
+                print(format_stage(result), flush=True)
+    if args.record:
+        with open(args.record, "w") as file:
+            file.writelines(json.dumps(request) + "\n" for request in recorded)
+    return results
+
+
+def format_stage(result: dict) -> str:
+    return (
+        f"{result['concurrency']:>11}{result['requests']:>10}"
+        f"{result['error_rate'] * 100:>9.1f}%{result['rps']:>9.1f}"
+        f"{result['p50_ms']:>10.1f}{result['p95_ms']:>10.1f}{result['p99_ms']:>10.1f}"
+    )
+
+
+def saturation(results: list[dict], max_error_rate: float) -> dict | None:
+    healthy = [result for result in results if result["error_rate"] <= max_error_rate]
+    return max(healthy, key=lambda result: result["rps"], default=None)
+
+
+def parse_mix(value: str) -> dict[str, float]:
+    mix = {kind: 0.0 for kind in KINDS}
+    for item in value.split(","):
+        kind, _, weight = item.partition("=")
+        if kind not in KINDS:
+            raise argparse.ArgumentTypeError(f"Unknown request kind: {kind}")
+        mix[kind] = float(weight or 1)
+    return mix
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Replay mixed traffic against a running API while ramping up concurrency."
+    )
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument(
+        "--ramp",
+        type=lambda value: [int(step) for step in value.split(",")],
+        default=[1, 2, 4, 8, 16, 32],
+        help="Comma separated concurrency steps (default: 1,2,4,8,16,32)",
+    )
+    parser.add_argument("--stage-seconds", type=float, default=20)
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument(
+        "--mix",
+        type=parse_mix,
+        default=DEFAULT_MIX,
+        help="Request weights, e.g. chat=3,rag=5,sessions=1,login=1,upload=0",
+    )
+    parser.add_argument(
+        "--session-reuse",
+        type=float,
+        default=0.7,
+        help="Probability that a chat continues the user's last session",
+    )
+    parser.add_argument("--pdf", help="PDF sent by upload requests")
+    parser.add_argument("--replay", help="JSON lines file of recorded requests")
+    parser.add_argument("--record", help="Write the requests sent to a JSON lines file")
+    parser.add_argument("--max-error-rate", type=float, default=0.01)
+    parser.add_argument("--timeout", type=float, default=120)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args(argv)
+    if args.mix.get("upload") and not args.pdf and not args.replay:
+        parser.error("--pdf is required when the mix includes uploads")
+    return args
+
+
+def main(argv: list[str] | None = None) -> None:
+    args = parse_args(argv)
+    if not args.json:
+        print(
+            f"{'concurrency':>11}{'requests':>10}{'errors':>10}{'rps':>9}"
+            f"{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}"
+        )
+    results = asyncio.run(run(args))
+    best = saturation(results, args.max_error_rate)
+    if args.json:
+        print(json.dumps({"stages": results, "saturation": best}, indent=2))
+    elif best is not None:
+        print(
+            f"Peak throughput {best['rps']:.1f} rps at concurrency {best['concurrency']} "
+            f"with error rate under {args.max_error_rate * 100:.1f}%"
+        )
+
+
+if __name__ == "__main__":
+    main()
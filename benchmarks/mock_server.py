@@ -0,0 +1,115 @@
+from typing import AsyncIterator
+from uuid import uuid4
+import argparse
+import asyncio
+import json
+import random
+import time
+
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+
+from app.utils.tools import hash_text
+
+EXTRACTION_ANSWER = json.dumps({"nodes": [], "relationships": []})
+
+
+def create_app(
+    llm_latency: float = 0.2,
+    embedding_latency: float = 0.05,
+    dimensions: int = 384,
+    tokens: int = 40,
+) -> FastAPI:
+    app = FastAPI(title="Mock Groq and HuggingFace")
+
+    def vector(text: str) -> list[float]:
+        generator = random.Random(hash_text(text))
+        return [generator.uniform(-1, 1) for _ in range(dimensions)]
+
+    def completion_chunk(model: str, completion_id: str, delta: dict) -> str:
+        chunk = {
+            "id": completion_id,
+            "object": "chat.completion.chunk",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{"index": 0, "delta": delta, "finish_reason": None}],
+        }
+        return f"data: {json.dumps(chunk)}\n\n"
+
+    async def stream(model: str, answer: str) -> AsyncIterator[str]:
+        completion_id = f"chatcmpl-{uuid4().hex}"
+        words = answer.split(" ")
+        yield completion_chunk(model, completion_id, {"role": "assistant"})
+        for word in words:
+            await asyncio.sleep(llm_latency / len(words))
+            yield completion_chunk(model, completion_id, {"content": f"{word} "})
+        yield "data: [DONE]\n\n"
+
+    @app.post("/openai/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        model = body.get("model", "mock")
+        response_format = (body.get("response_format") or {}).get("type")
+        prompt = json.dumps(body.get("messages", []))
+        if response_format == "json_object":
+            answer = EXTRACTION_ANSWER
+        else:
+            answer = " ".join(["mock"] * (tokens - 1) + [hash_text(prompt)[:8]])
+        if body.get("stream"):
+            return StreamingResponse(
+                stream(model, answer), media_type="text/event-stream"
+            )
+        await asyncio.sleep(llm_latency)
+        prompt_tokens = len(prompt.split())
+        return {
+            "id": f"chatcmpl-{uuid4().hex}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [
+                {
+                    "index": 0,
+                    "message": {"role": "assistant", "content": answer},
+                    "finish_reason": "stop",
+                }
+            ],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": tokens,
+                "total_tokens": prompt_tokens + tokens,
+            },
+        }
+
+    @app.post("/embed")
+    async def embed(request: Request):
+        inputs = (await request.json())["inputs"]
+        await asyncio.sleep(embedding_latency)
+        if isinstance(inputs, str):
+            return [vector(inputs)]
+        return [vector(text) for text in inputs]
+
+    return app
+
+
+def main(argv: list[str] | None = None) -> None:
+    import uvicorn
+
+    parser = argparse.ArgumentParser(
+        description="Serve mock Groq chat completions and HuggingFace embeddings."
+    )
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9000)
+    parser.add_argument("--llm-latency", type=float, default=0.2)
+    parser.add_argument("--embedding-latency", type=float, default=0.05)
+    parser.add_argument("--dimensions", type=int, default=384)
+    args = parser.parse_args(argv)
+    uvicorn.run(
+        create_app(args.llm_latency, args.embedding_latency, args.dimensions),
+        host=args.host,
+        port=args.port,
+        log_level="warning",
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,202 @@
+from os import environ
+
+environ.setdefault("SECRET_KEY", "benchmark-secret-key-with-at-least-32-bytes")
+environ.setdefault("ALGORITHM", "HS256")
+environ.setdefault("INGESTION_MAX_PENDING", "100000")
+
+from itertools import count
+from time import perf_counter
+from typing import Awaitable, Callable
+import argparse
+import asyncio
+import json
+
+import httpx
+
+from app.controller.file_uploader import get_text_splitter
+from app.main import app
+from app.services.registry import ClientRegistry, get_chat_llm, get_ingestion_llm
+from app.utils.context import ContextAssembler
+from benchmarks.fakes import (
+    FakeEmbedder,
+    FakeLLM,
+    estimate_tokens,
+    in_memory_database,
+    pdf_document,
+)
+from benchmarks.stats import summarize
+
+SCENARIOS = ("token", "llm", "rag", "files")
+EMAIL = "benchmark@email.com"
+PASSWORD = "benchmark"
+
+Request = Callable[[httpx.AsyncClient, int], Awaitable[httpx.Response]]
+
+
+def build_registry(args: argparse.Namespace) -> ClientRegistry:
+    embedder = FakeEmbedder(latency=args.embedding_latency)
+    context = ContextAssembler(count_tokens=estimate_tokens)
+    db = in_memory_database(embedder, latency=args.db_latency, context=context)
+    registry = ClientRegistry(embedder=embedder, db=db)
+    chat_llm = FakeLLM(
+        latency=args.llm_latency, admission=registry.admission, context=context
+    )
+    ingestion_llm = FakeLLM(latency=args.llm_latency)
+    app.state.registry = registry
+    app.dependency_overrides[get_chat_llm] = lambda: chat_llm
+    app.dependency_overrides[get_ingestion_llm] = lambda: ingestion_llm
+    app.dependency_overrides[get_text_splitter] = lambda: None
+    return registry
+
+
+async def login(client: httpx.AsyncClient) -> dict:
+    await client.post(
+        "/user/",
+        json={"email": EMAIL, "username": "benchmark", "password": PASSWORD},
+    )
+    response = await client.post(
+        "/user/token", data={"username": EMAIL, "password": PASSWORD}
+    )
+    response.raise_for_status()
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+def scenario_requests(headers: dict, args: argparse.Namespace) -> dict[str, Request]:
+    def question(index: int) -> str:
+        return "What is a graph?" if args.repeat_questions else f"Question {index}?"
+
+    async def token(client: httpx.AsyncClient, index: int) -> httpx.Response:
+        return await client.post(
+            "/user/token", data={"username": EMAIL, "password": PASSWORD}
+        )
+
+    async def llm(client: httpx.AsyncClient, index: int) -> httpx.Response:
+        return await client.post(
+            "/llm/", json={"text": question(index)}, headers=headers
+        )
+
+    async def rag(client: httpx.AsyncClient, index: int) -> httpx.Response:
+        return await client.post(
+            "/llm/rag/", json={"text": question(index)}, headers=headers
+        )
+
+    async def files(client: httpx.AsyncClient, index: int) -> httpx.Response:
+        return await client.post(
+            "/files/",
+            files={
+                "file": (
+                    "benchmark.pdf",
+                    pdf_document(f"Benchmark document {index} about graphs"),
+                    "application/pdf",
+                )
+            },
+            data={
+                "document_subject": "Benchmark",
+                "file_name": f"benchmark-{index}.pdf",
+                "mode": args.ingestion_mode,
+            },
+            headers=headers,
+        )
+
+    return {"token": token, "llm": llm, "rag": rag, "files": files}
+
+
+async def run_scenario(
+    client: httpx.AsyncClient,
+    name: str,
+    request: Request,
+    requests: int,
+    concurrency: int,
+) -> dict:
+    latencies: list[float] = []
+    statuses: dict[int, int] = {}
+    indexes = count()
+
+    async def worker() -> None:
+        while (index := next(indexes)) < requests:
+            start = perf_counter()
+            response = await request(client, index)
+            latencies.append(perf_counter() - start)
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+    start = perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = perf_counter() - start
+    return {"scenario": name, "concurrency": concurrency} | summarize(
+        latencies, statuses, elapsed
+    )
+
+
+async def run(args: argparse.Namespace) -> list[dict]:
+    registry = build_registry(args)
+    transport = httpx.ASGITransport(app=app)
+    try:
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://benchmark", timeout=None
+        ) as client:
+            headers = await login(client)
+            requests = scenario_requests(headers, args)
+            return [
+                await run_scenario(
+                    client, name, requests[name], args.requests, args.concurrency
+                )
+                for name in args.scenarios
+            ]
+    finally:
+        await registry.aclose()
+        app.dependency_overrides.clear()
+
+
+def format_report(results: list[dict]) -> str:
+    lines = [
+        f"{'scenario':<10}{'requests':>10}{'errors':>8}{'rps':>10}"
+        f"{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}"
+    ]
+    for result in results:
+        lines.append(
+            f"{result['scenario']:<10}{result['requests']:>10}{result['errors']:>8}"
+            f"{result['rps']:>10.1f}{result['p50_ms']:>10.1f}"
+            f"{result['p95_ms']:>10.1f}{result['p99_ms']:>10.1f}"
+        )
+    return "\n".join(lines)
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Benchmark the API request path against in-process stand-ins."
+    )
+    parser.add_argument(
+        "--scenarios",
+        type=lambda value: [name for name in value.split(",") if name],
+        default=list(SCENARIOS),
+        help=f"Comma separated scenarios to run (default: {','.join(SCENARIOS)})",
+    )
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--llm-latency", type=float, default=0.2)
+    parser.add_argument("--embedding-latency", type=float, default=0.05)
+    parser.add_argument("--db-latency", type=float, default=0.005)
+    parser.add_argument(
+        "--ingestion-mode", choices=["graph", "vector"], default="vector"
+    )
+    parser.add_argument(
+        "--repeat-questions",
+        action="store_true",
+        help="Ask the same question every time to exercise the answer cache",
+    )
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args(argv)
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"Unknown scenarios: {', '.join(sorted(unknown))}")
+    return args
+
+
+def main(argv: list[str] | None = None) -> None:
+    args = parse_args(argv)
+    results = asyncio.run(run(args))
+    print(json.dumps(results, indent=2) if args.json else format_report(results))
+
+
+if __name__ == "__main__":
+    main()
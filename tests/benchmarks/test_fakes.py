@@ -0,0 +1,155 @@
+import asyncio
+
+import pytest
+from neo4j_graphrag.generation.prompts import RagTemplate
+from neo4j_graphrag.message_history import (
+    ADD_MESSAGE_QUERY,
+    CREATE_SESSION_NODE_QUERY,
+    DELETE_MESSAGES_QUERY,
+    DELETE_SESSION_AND_MESSAGES_QUERY,
+    GET_MESSAGES_QUERY,
+)
+from neo4j_graphrag.neo4j_queries import (
+    db_cleaning_query,
+    upsert_node_query,
+    upsert_relationship_query,
+)
+from neo4j_graphrag.types import LLMMessage
+
+from app.database.graphrag import SCOPED_VECTOR_QUERY, hybrid_query
+from benchmarks.fakes import (
+    FakeEmbedder,
+    FakeLLM,
+    InMemoryGraph,
+    estimate_tokens,
+    in_memory_database,
+    pdf_document,
+)
+from app.model.models import IngestionMode
+from app.utils.context import ContextAssembler
+from app.utils.prompts import DEFAULT_SYSTEM_INSTRUCTIONS
+from tests import USER
+
+TEMPLATE = RagTemplate(system_instructions=DEFAULT_SYSTEM_INSTRUCTIONS)
+
+
+def test_fake_embedder_is_deterministic() -> None:
+    embedder = FakeEmbedder(latency=0, dimensions=8)
+    assert embedder.embed_query("graph") == asyncio.run(
+        embedder.async_embed_query("graph")
+    )
+    assert embedder.embed_query("graph") != embedder.embed_query("vector")
+    assert len(asyncio.run(embedder.aembed_documents(["a", "b"]))) == 2
+
+
+def test_in_memory_sessions_belong_to_their_user() -> None:
+    db = in_memory_database(FakeEmbedder(latency=0, dimensions=8), latency=0)
+    other = USER.model_copy(update={"email": "other@email.com"})
+    db.save_basemodel(USER)
+    db.save_basemodel(other)
+
+    async def run() -> None:
+        history, messages = await db.aopen_session(USER, None)
+        assert messages == []
+        await history.aadd_messages([LLMMessage(role="user", content="hi")])
+        same, messages = await db.aopen_session(USER, history.session_id)
+        assert same.session_id == history.session_id
+        assert messages == [LLMMessage(role="user", content="hi")]
+        stolen, _ = await db.aopen_session(other, history.session_id)
+        assert stolen.session_id != history.session_id
+
+    asyncio.run(run())
+
+
+def test_in_memory_rag_answers_from_llm() -> None:
+    db = in_memory_database(FakeEmbedder(latency=0, dimensions=8), latency=0)
+    llm = FakeLLM(latency=0, tokens=3)
+    first = asyncio.run(
+        db.arag_response(llm, "What is a graph?", rag_template=TEMPLATE)
+    )
+    assert first.answer.startswith("token token ")
+    assert first.retriever_result.items
+    asyncio.run(db.arag_response(llm, "What is a graph?", rag_template=TEMPLATE))
+    assert db.answer_cache.stats()["hits"] == 1
+
+
+def test_in_memory_rag_cache_is_scoped_by_filters() -> None:
+    db = in_memory_database(FakeEmbedder(latency=0, dimensions=8), latency=0)
+    llm = FakeLLM(latency=0, tokens=3)
+    asyncio.run(
+        db.arag_response(
+            llm, "What is a graph?", rag_template=TEMPLATE, filters={"subject": "A"}
+        )
+    )
+    asyncio.run(
+        db.arag_response(
+            llm, "What is a graph?", rag_template=TEMPLATE, filters={"subject": "B"}
+        )
+    )
+    asyncio.run(
+        db.arag_response(
+            llm, "What is a graph?", rag_template=TEMPLATE, filters={"subject": "A"}
+        )
+    )
+    assert db.answer_cache.stats()["hits"] == 1
+
+
+def test_in_memory_ingestion_runs_the_real_pipeline(tmp_path) -> None:
+    embedder = FakeEmbedder(latency=0, dimensions=8)
+    db = in_memory_database(
+        embedder,
+        latency=0,
+        chunks=0,
+        context=ContextAssembler(count_tokens=estimate_tokens),
+    )
+    file_path = tmp_path / "graph.pdf"
+    file_path.write_bytes(pdf_document("Graphs are nodes linked by edges"))
+    metadata = {"subject": "Graphs", "file_name": "graph.pdf"}
+    llm = FakeLLM(latency=0, tokens=3)
+
+    async def run() -> tuple:
+        vector = await db.acreate_graph_from_pdf(
+            llm, str(file_path), metadata, mode=IngestionMode.VECTOR
+        )
+        unchanged = await db.acreate_graph_from_pdf(llm, str(file_path), metadata)
+        extracted = await db.aextract_entities(llm, metadata)
+        response = await db.arag_response(
+            llm, "What is a graph?", rag_template=TEMPLATE, filters=metadata
+        )
+        return vector, unchanged, extracted, response
+
+    vector, unchanged, extracted, response = asyncio.run(run())
+    assert vector.chunks_added == vector.chunks_total == 1
+    assert unchanged.unchanged
+    assert extracted == 1
+    assert [item.content for item in response.retriever_result.items] == [
+        "Graphs are nodes linked by edges"
+    ]
+
+
+@pytest.mark.parametrize(
+    "query, handler",
+    [
+        (CREATE_SESSION_NODE_QUERY.format(node_label="Session"), "create_session"),
+        (ADD_MESSAGE_QUERY.format(node_label="Session"), "add_message"),
+        (GET_MESSAGES_QUERY.format(node_label="Session", window=3), "get_messages"),
+        (DELETE_MESSAGES_QUERY.format(node_label="Session"), "clear_session"),
+        (
+            DELETE_SESSION_AND_MESSAGES_QUERY.format(node_label="Session"),
+            "clear_session",
+        ),
+        (upsert_node_query(True, True), "upsert_nodes"),
+        (upsert_relationship_query(True), "upsert_relationships"),
+        (db_cleaning_query(True, 1000), "clean_written_nodes"),
+        (hybrid_query(), "search"),
+        (hybrid_query({"subject": "Graphs"}), "search"),
+        (SCOPED_VECTOR_QUERY.format(condition="doc.subject = $subject"), "search"),
+    ],
+)
+def test_in_memory_graph_dispatches_library_queries(query: str, handler: str) -> None:
+    assert InMemoryGraph().handler(query).__name__.split("__", 1)[1] == handler
+
+
+def test_in_memory_graph_rejects_unknown_queries() -> None:
+    with pytest.raises(NotImplementedError):
+        InMemoryGraph().run("MATCH (n:Unknown) RETURN n")
@@ -0,0 +1,36 @@
+import argparse
+
+import pytest
+
+from benchmarks.loadtest import Traffic, parse_mix, saturation
+
+
+def test_parse_mix() -> None:
+    mix = parse_mix("rag=4,login")
+    assert mix["rag"] == 4 and mix["login"] == 1 and mix["chat"] == 0
+    with pytest.raises(argparse.ArgumentTypeError):
+        parse_mix("delete=1")
+
+
+def test_synthetic_traffic_follows_mix() -> None:
+    traffic = Traffic(parse_mix("chat=1,sessions=1"), 1.0, users=3, seed=1)
+    requests = [traffic.next() for _ in range(50)]
+    assert {request["kind"] for request in requests} == {"chat", "sessions"}
+    assert {request["user"] for request in requests} <= {0, 1, 2}
+    assert all(request["reuse_session"] for request in requests)
+
+
+def test_replay_cycles_recorded_requests() -> None:
+    recorded = [{"kind": "login", "user": 0}, {"kind": "rag", "user": 1}]
+    traffic = Traffic(parse_mix("chat"), 0, users=1, seed=0, replay=recorded)
+    assert [traffic.next()["kind"] for _ in range(3)] == ["login", "rag", "login"]
+
+
+def test_saturation_ignores_failing_stages() -> None:
+    results = [
+        {"concurrency": 4, "rps": 10, "error_rate": 0},
+        {"concurrency": 8, "rps": 14, "error_rate": 0.005},
+        {"concurrency": 16, "rps": 20, "error_rate": 0.2},
+    ]
+    assert saturation(results, 0.01)["concurrency"] == 8
+    assert saturation(results[2:], 0.01) is None
@@ -0,0 +1,8 @@
+import pytest
+from tests.controller import client
+
+
+@pytest.fixture(scope="session", autouse=True)
+def client_lifespan():
+    with client:
+        yield
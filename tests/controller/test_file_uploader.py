@@ -1,4 +1,13 @@
+from io import BytesIO
+from time import sleep
+from fastapi import FastAPI, HTTPException, UploadFile
+from fastapi.testclient import TestClient
+import os
+import pytest
+import tempfile
 from typing import Tuple
+from app.controller import file_uploader
+from app.controller.file_uploader import remove_file, save_upload
 from tests.controller import client, setup_user
 from tests import PATH_PDF_SAMPLE, DOCUMENT_METADATA
 
@@ -15,7 +24,40 @@ def test_post_file(setup_user: Tuple[dict, dict]) -> None:
         },
         files=files,
     )
-    assert response.status_code == 200
+    assert response.status_code == 202
+    job = wait_job(response.json())
+    assert job["status"] == "completed"
+    assert job["chunks_total"] > 0
+
+
+def test_post_file_vector_mode(setup_user: Tuple[dict, dict]) -> None:
+    _, _ = setup_user
+    pdf_file = open(PATH_PDF_SAMPLE, "rb")
+    files = {"file": (pdf_file.name, pdf_file.read(), "application/pdf")}
+    data = {"document_subject": "Vector Test", "file_name": "PDF VECTOR FILE"}
+    response = client.post("/files/", data={**data, "mode": "vector"}, files=files)
+    assert response.status_code == 202
+    job = wait_job(response.json())
+    assert job["status"] == "completed"
+    assert job["result"]["chunks_added"] == job["chunks_total"]
+    response = client.post("/files/entities/", data=data)
+    assert response.status_code == 202
+    job = wait_job(response.json())
+    assert job["status"] == "completed"
+    assert job["chunks_processed"] == job["chunks_total"]
+    client.delete(f"/files/{data['document_subject']}")
+
+
+def wait_job(job: dict) -> dict:
+    while job["status"] in ("pending", "running"):
+        sleep(1)
+        job = client.get(f"/files/jobs/{job['id']}").json()
+    return job
+
+
+def test_get_job_not_found(setup_user: Tuple[dict, dict]) -> None:
+    response = client.get("/files/jobs/unknown")
+    assert response.status_code == 404
 
 
 def test_post_file_not_supported(setup_user: Tuple[dict, dict]) -> None:
@@ -41,3 +83,34 @@ def test_delete_file_with_subject(setup_user: Tuple[dict, dict]) -> None:
         f"/files/{DOCUMENT_METADATA.get('subject')}",
     )
     assert response.status_code == 200
+
+
+def test_save_upload_removes_file_too_large() -> None:
+    upload = UploadFile(BytesIO(b"%PDF" + b"0" * 2048), filename="large.pdf")
+    files_before = set(os.listdir(tempfile.gettempdir()))
+    with pytest.raises(HTTPException) as error:
+        save_upload(upload, max_size=1024)
+    assert error.value.status_code == 413
+    assert set(os.listdir(tempfile.gettempdir())) == files_before
+
+
+def test_save_upload() -> None:
+    pdf_file = open(PATH_PDF_SAMPLE, "rb")
+    upload = UploadFile(pdf_file, filename="sample.pdf")
+    file_path = save_upload(upload)
+    assert os.path.getsize(file_path) == os.path.getsize(PATH_PDF_SAMPLE)
+    remove_file(file_path)
+    assert not os.path.exists(file_path)
+
+
+def test_post_file_rejects_large_content_length(monkeypatch) -> None:
+    monkeypatch.setattr(file_uploader, "MAX_UPLOAD_SIZE", 1024)
+    app = FastAPI()
+    app.include_router(file_uploader.router)
+    body = b"%PDF" + b"0" * (file_uploader.MULTIPART_OVERHEAD + 2048)
+    response = TestClient(app).post(
+        "/files/",
+        files={"file": ("large.pdf", body, "application/pdf")},
+        data=DOCUMENT_METADATA,
+    )
+    assert response.status_code == 413
@@ -1,3 +1,4 @@
+import json
 from typing import Tuple
 from tests.controller import client, delete_user, setup_user, insert_user, authenticate
 from tests.database.test_database import setup_pdf_sample
@@ -16,6 +17,24 @@ def test_post_new_session(setup_user: Tuple[dict, dict]) -> None:
     )
 
 
+def test_post_stream(setup_user: Tuple[dict, dict]) -> None:
+    message = {"text": "How many hours are in a day?"}
+    with client.stream("POST", "/llm/stream", json=message) as response:
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/event-stream")
+        events = [line for line in response.iter_lines() if line]
+    assert events[0] == "event: session"
+    assert events[-2] == "event: end"
+    answer = json.loads(events[-1].removeprefix("data: "))
+    assert answer["answer"]
+    response = client.get(f"/llm/sessions/{answer['session_id']}")
+    assert len(response.json()) == 2
+    client.delete(
+        "/llm/sessions",
+        params={"session_id": answer["session_id"]},
+    )
+
+
 def test_delete_session(setup_user: Tuple[dict, dict]) -> None:
     message = {"text": "How many hours are in a day?"}
     response = client.post("/llm", json=message)
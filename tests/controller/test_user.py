@@ -1,4 +1,6 @@
+import asyncio
 import pytest
+from app.controller.user import aget_password_hash, averify_password
 from tests.controller import client, setup_user
 from tests import USER
 
@@ -20,3 +22,19 @@ def test_token(setup_user: dict, email: str, pwd: str, status_code: int) -> None
         response = response.json()
         assert response["access_token"]
         assert response["token_type"] == "Bearer"
+
+
+def test_current_user_is_cached(setup_user: dict) -> None:
+    users = client.app.state.registry.users
+    client.get("/user/me/")
+    hits = users.hits
+    response = client.get("/user/me/")
+    assert response.status_code == 200
+    assert response.json()["email"] == USER.email
+    assert users.hits == hits + 1
+
+
+def test_password_hash_in_executor() -> None:
+    hashed = asyncio.run(aget_password_hash(USER.password))
+    assert asyncio.run(averify_password(USER.password, hashed))
+    assert not asyncio.run(averify_password("wrong", hashed))
@@ -1,5 +1,5 @@
-from app.database.database import Neo4jDatabase
-from app.model.models import User
+from app.database.database import SCHEMA_VERSION, Neo4jDatabase
+from app.model.models import IngestionMode, User
 from app.services.llm import LLM, EmbbeddingHuggingFace
 from app.utils.prompts import DEFAULT_SYSTEM_INSTRUCTIONS
 from langchain_text_splitters import TokenTextSplitter
@@ -13,6 +13,7 @@ import pytest
 from typing import Generator, Tuple
 from time import sleep
 from tests import PATH_PDF_SAMPLE, DOCUMENT_METADATA, SESSION_ID, USER
+import asyncio
 import uuid
 
 
@@ -56,6 +57,13 @@ def test_database_neo4j_connection() -> None:
     assert db.get_graph()._check_driver_state() is None
 
 
+def test_bootstrap_schema() -> None:
+    db, _, _, _ = setup()
+    assert db.bootstrap_schema() == SCHEMA_VERSION
+    assert db.bootstrap_schema() == SCHEMA_VERSION
+    assert db.schema_version == SCHEMA_VERSION
+
+
 def test_insert_basemodel_user() -> None:
     db, _, _, _ = setup()
 
@@ -76,6 +84,20 @@ def test_get_basemodel_user() -> None:
     assert len(records) == 0
 
 
+def test_async_basemodel_user() -> None:
+    db, _, _, _ = setup()
+
+    async def run() -> User:
+        await db.asave_basemodel(USER)
+        user_bd = await db.aget_basemodel(USER)
+        await db.adelete_basemodel(USER)
+        return user_bd
+
+    user_bd = asyncio.run(run())
+    assert isinstance(user_bd, User)
+    assert user_bd.email == USER.email
+
+
 def test_get_message_history() -> None:
     db, _, _, _ = setup()
     session_id = str(uuid.uuid4())
@@ -97,6 +119,35 @@ def test_save_message_history() -> None:
     assert len(history.messages) == 0
 
 
+def test_save_messages_batch() -> None:
+    db, _, _, _ = setup()
+    session_id = str(uuid.uuid4())
+    history = db.get_message_history(session_id=session_id, window=10)
+    history.add_message(LLMMessage(role="user", content="first"))
+    db.save_messages_batch(
+        [
+            {
+                "session_id": session_id,
+                "messages": [
+                    LLMMessage(role="assistant", content="second"),
+                    LLMMessage(role="user", content="third"),
+                ],
+            }
+        ]
+    )
+    db.save_messages_batch(
+        [
+            {
+                "session_id": session_id,
+                "messages": [LLMMessage(role="assistant", content="fourth")],
+            }
+        ]
+    )
+    contents = [message["content"] for message in history.messages]
+    history.clear(True)
+    assert contents == ["first", "second", "third", "fourth"]
+
+
 def test_link_basemodel_to_session() -> None:
     db, _, _, _ = setup()
     db = Neo4jDatabase()
@@ -110,9 +161,138 @@ def test_link_basemodel_to_session() -> None:
     db.delete_basemodel(USER)
 
 
+def test_async_message_history() -> None:
+    db, _, _, _ = setup()
+    session_id = str(uuid.uuid4())
+
+    async def run() -> list:
+        history = await db.aget_message_history(session_id=session_id)
+        await history.aadd_messages(
+            [
+                LLMMessage(role="user", content="Making a Test"),
+                LLMMessage(role="assistant", content="Test Answer"),
+            ]
+        )
+        messages = await history.aget_messages()
+        await history.aclear(True)
+        return messages
+
+    messages = asyncio.run(run())
+    assert [message["role"] for message in messages] == ["user", "assistant"]
+
+
+def test_aopen_session() -> None:
+    db, _, _, _ = setup()
+    db.save_basemodel(USER)
+
+    async def run() -> tuple:
+        history, messages = await db.aopen_session(USER, None)
+        await history.aadd_messages(
+            [
+                LLMMessage(role="user", content="Making a Test"),
+                LLMMessage(role="assistant", content="Test Answer"),
+            ]
+        )
+        reopened, reopened_messages = await db.aopen_session(USER, history.session_id)
+        other, _ = await db.aopen_session(USER, str(uuid.uuid4()))
+        await history.aclear(True)
+        await other.aclear(True)
+        return history, messages, reopened, reopened_messages, other
+
+    history, messages, reopened, reopened_messages, other = asyncio.run(run())
+    db.delete_basemodel(USER)
+    assert messages == []
+    assert reopened.session_id == history.session_id
+    assert [message["role"] for message in reopened_messages] == ["user", "assistant"]
+    assert other.session_id != history.session_id
+
+
+def test_arefresh_summary() -> None:
+    db, chat_model, _, _ = setup()
+    db.save_basemodel(USER)
+
+    async def run() -> tuple:
+        history, _ = await db.aopen_session(USER, None)
+        await history.aadd_messages(
+            [
+                LLMMessage(role="user", content="My name is Ada"),
+                LLMMessage(role="assistant", content="Nice to meet you, Ada"),
+                LLMMessage(role="user", content="What is a graph?"),
+                LLMMessage(role="assistant", content="Nodes linked by edges"),
+            ]
+        )
+        summary = await db.arefresh_summary(chat_model, history.session_id, keep=2)
+        _, messages = await db.aopen_session(USER, history.session_id, window=10)
+        db.delete_session_summary(history.session_id)
+        await history.aclear(True)
+        return summary, messages
+
+    summary, messages = asyncio.run(run())
+    db.delete_basemodel(USER)
+    assert summary
+    assert messages[0]["role"] == "system"
+    assert [message["content"] for message in messages[1:]] == [
+        "What is a graph?",
+        "Nodes linked by edges",
+    ]
+
+
 def test_create_graph_from_pdf(setup_pdf_sample: dict) -> None:
     result = setup_pdf_sample.get("result")
     assert result is not None
+    assert result.chunks_added == result.chunks_total
+
+
+def test_create_graph_from_pdf_unchanged(setup_pdf_sample: dict) -> None:
+    db: Neo4jDatabase = setup_pdf_sample.get("db")
+    result = db.create_graph_from_pdf(
+        llm=setup_pdf_sample.get("chat_model"),
+        file_path=PATH_PDF_SAMPLE,
+        document_metada=DOCUMENT_METADATA,
+    )
+    assert result.unchanged
+    assert result.chunks_added == 0
+    assert result.chunks_total == setup_pdf_sample.get("result").chunks_total
+
+
+def test_failed_ingestion_leaves_no_orphan_chunks() -> None:
+    db, chat_model, _, adapter_splitter = setup()
+    metadata = {"subject": "Test", "file_name": "FAILED PDF TEST FILE"}
+    orphans = "MATCH (c:Chunk) WHERE NOT (c)-[:FROM_DOCUMENT]->() RETURN count(c) AS c"
+    before = db.get_graph().query(orphans)[0]["c"]
+
+    def fail_before_linking(stage: str, processed: int, total: int) -> None:
+        if stage == "linker":
+            raise RuntimeError("Ingestion stopped")
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(
+            db.acreate_graph_from_pdf(
+                llm=chat_model,
+                file_path=PATH_PDF_SAMPLE,
+                document_metada=metadata,
+                text_splitter=adapter_splitter,
+                on_progress=fail_before_linking,
+                mode=IngestionMode.VECTOR,
+            )
+        )
+    assert db.get_graph().query(orphans)[0]["c"] == before
+
+
+def test_delete_document_vector_mode() -> None:
+    db, chat_model, _, adapter_splitter = setup()
+    metadata = {"subject": "Vector Delete Test", "file_name": "PDF VECTOR FILE"}
+    documents = "MATCH (d:Document {subject: $subject}) RETURN count(d) AS c"
+    db.create_graph_from_pdf(
+        llm=chat_model,
+        file_path=PATH_PDF_SAMPLE,
+        document_metada=metadata,
+        text_splitter=adapter_splitter,
+        mode=IngestionMode.VECTOR,
+    )
+    assert db.get_graph().query(documents, metadata)[0]["c"] == 1
+    db.delete_document_with_metadata(metadata={"subject": metadata["subject"]})
+    assert db.get_graph().query(documents, metadata)[0]["c"] == 0
 
 
 def test_retriever(setup_pdf_sample: dict) -> None:
@@ -125,6 +305,35 @@ def test_retriever(setup_pdf_sample: dict) -> None:
     assert len(records.records) > 1
 
 
+def test_hybrid_retriever(setup_pdf_sample: dict) -> None:
+    db: Neo4jDatabase = setup_pdf_sample.get("db")
+    db.set_retriever(setup_pdf_sample.get("embedder"))
+    result = asyncio.run(
+        db.retriever.asearch(query_text="What is Large Language Models (LLM) ?")
+    )
+    scores = [item.metadata["score"] for item in result.items]
+    assert 0 < len(result.items) <= db.retrieval_top_k
+    assert scores == sorted(scores, reverse=True)
+
+
+def test_scoped_retriever(setup_pdf_sample: dict) -> None:
+    db: Neo4jDatabase = setup_pdf_sample.get("db")
+    db.set_retriever(setup_pdf_sample.get("embedder"))
+    query_text = "What is Large Language Models (LLM) ?"
+    scoped = asyncio.run(
+        db.retriever.asearch(query_text=query_text, filters=DOCUMENT_METADATA)
+    )
+    missing = asyncio.run(
+        db.retriever.asearch(query_text=query_text, filters={"subject": "Missing"})
+    )
+    assert scoped.items
+    assert all(
+        item.metadata["subject"] == DOCUMENT_METADATA["subject"]
+        for item in scoped.items
+    )
+    assert missing.items == []
+
+
 def test_rag_response(setup_pdf_sample: dict) -> None:
     db: Neo4jDatabase = setup_pdf_sample.get("db")
     chat_model: LLM = setup_pdf_sample.get("chat_model")
@@ -165,3 +374,15 @@ def test_rag_response_with_message_history(setup_pdf_sample: dict) -> None:
     assert response_question_2.answer
     assert response_question_2.answer != response_question_1.answer
     history.clear(True)
+
+
+def test_arag_response(setup_pdf_sample: dict) -> None:
+    db: Neo4jDatabase = setup_pdf_sample.get("db")
+    chat_model: LLM = setup_pdf_sample.get("chat_model")
+    rag_template = RagTemplate(system_instructions=DEFAULT_SYSTEM_INSTRUCTIONS)
+    query = "What is Large Language Models (LLM)?"
+    sleep(120)  # Since free tier has a low limit of token usage per minute
+    response = asyncio.run(
+        db.arag_response(llm=chat_model, query_text=query, rag_template=rag_template)
+    )
+    assert response.answer
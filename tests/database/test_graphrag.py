@@ -0,0 +1,109 @@
+import asyncio
+
+import pytest
+from neo4j_graphrag.generation.prompts import RagTemplate
+
+from app.database.database import RETRIEVAL_QUERY
+from app.database.graphrag import (
+    AsyncGraphRAG,
+    AsyncHybridCypherRetriever,
+    format_chunk_record,
+    hybrid_query,
+    scope_condition,
+)
+from app.utils.rerank import LexicalReranker
+from app.utils.tools import fulltext_query
+from benchmarks.fakes import (
+    FakeAsyncDriver,
+    FakeDriver,
+    FakeEmbedder,
+    FakeLLM,
+    InMemoryGraph,
+)
+
+
+def test_scope_condition_only_accepts_known_filters() -> None:
+    assert (
+        scope_condition({"file_name": "guide.pdf", "subject": "Neo4j"})
+        == "doc.subject = $subject AND doc.file_name = $file_name"
+    )
+    with pytest.raises(ValueError):
+        scope_condition({"subject": "Neo4j", "tittle": "x} RETURN 1 //"})
+
+
+def test_hybrid_query_scans_only_the_scoped_corpus() -> None:
+    unscoped = hybrid_query()
+    scoped = hybrid_query({"subject": "Neo4j"})
+    assert "db.index.vector.queryNodes" in unscoped
+    assert "doc.subject" not in unscoped
+    assert "db.index.vector.queryNodes" not in scoped
+    assert scoped.count("WHERE doc.subject = $subject") == 2
+    assert "WHERE doc.subject = $subject AND node.embedding IS NOT NULL" in scoped
+    assert "db.index.fulltext.queryNodes" not in scoped
+    assert "$search_terms" in scoped
+
+
+class RecordingAsyncDriver(FakeAsyncDriver):
+    def __init__(self, graph: InMemoryGraph) -> None:
+        super().__init__(graph, latency=0)
+        self.parameters = []
+
+    async def execute_query(self, query, parameters_=None, **kwargs):
+        self.parameters.append(parameters_)
+        return await super().execute_query(query, parameters_, **kwargs)
+
+
+class RecordingEmbedder(FakeEmbedder):
+    def __init__(self) -> None:
+        super().__init__(latency=0, dimensions=8)
+        self.texts = []
+
+    async def async_embed_query(self, text: str) -> list[float]:
+        self.texts.append(text)
+        return await super().async_embed_query(text)
+
+
+class RecordingReranker(LexicalReranker):
+    def __init__(self) -> None:
+        super().__init__()
+        self.queries = []
+
+    def rerank(self, query_text, items):
+        self.queries.append(query_text)
+        return super().rerank(query_text, items)
+
+
+def test_history_only_rewrites_the_vector_query() -> None:
+    graph = InMemoryGraph(dimensions=8)
+    embedder = RecordingEmbedder()
+    graph.add_document(
+        {"subject": "Graphs", "file_name": "graph.pdf"},
+        ["Error ERR-404 means the node was not found"],
+        embedder.vector,
+    )
+    async_driver = RecordingAsyncDriver(graph)
+    reranker = RecordingReranker()
+    retriever = AsyncHybridCypherRetriever(
+        driver=FakeDriver(graph, latency=0),
+        get_async_driver=lambda: async_driver,
+        index_name="chunkEmbeddings",
+        fulltext_index_name="chunkText",
+        retrieval_query=RETRIEVAL_QUERY,
+        embedder=embedder,
+        result_formatter=format_chunk_record,
+        reranker=reranker,
+    )
+    rag = AsyncGraphRAG(
+        retriever=retriever,
+        llm=FakeLLM(latency=0, tokens=3),
+        prompt_template=RagTemplate(system_instructions="Answer."),
+    )
+    question = "Why ERR-404?"
+    history = [
+        {"role": "user", "content": "How do I create a node?"},
+        {"role": "assistant", "content": "Use CREATE."},
+    ]
+    asyncio.run(rag.asearch(question, message_history=history))
+    assert embedder.texts[-1] != question and question in embedder.texts[-1]
+    assert async_driver.parameters[-1]["fulltext_query"] == fulltext_query(question)
+    assert reranker.queries == [question]
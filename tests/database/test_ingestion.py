@@ -0,0 +1,151 @@
+import asyncio
+import time
+
+import pytest
+from neo4j.exceptions import ClientError
+
+from app.database.database import GraphWriteError, Neo4jDatabase
+from app.model.models import IngestionJob, IngestionMode, JobStatus
+from app.services.jobs import IngestionJobQueue
+from benchmarks.fakes import (
+    FakeAsyncDriver,
+    FakeDriver,
+    FakeEmbedder,
+    FakeLLM,
+    InMemoryGraph,
+    pdf_document,
+)
+
+METADATA = {"subject": "Graphs", "file_name": "graph.pdf"}
+
+
+class StageFailure(Exception):
+    pass
+
+
+def setup(
+    tmp_path, driver: type[FakeDriver] = FakeDriver
+) -> tuple[Neo4jDatabase, InMemoryGraph, str]:
+    graph = InMemoryGraph(dimensions=8)
+    db = Neo4jDatabase.__wrapped__(
+        FakeEmbedder(latency=0, dimensions=8),
+        driver=driver(graph, latency=0),
+        async_driver_factory=lambda: FakeAsyncDriver(graph, latency=0),
+    )
+    file_path = tmp_path / "graph.pdf"
+    file_path.write_bytes(pdf_document("Graphs are nodes linked by edges"))
+    return db, graph, str(file_path)
+
+
+def fail_at(stage: str, error: BaseException = StageFailure()):
+    def progress(current: str, processed: int, total: int) -> None:
+        if current == stage:
+            raise error
+
+    return progress
+
+
+@pytest.mark.parametrize("mode", [IngestionMode.VECTOR, IngestionMode.GRAPH])
+def test_failed_ingestion_discards_its_nodes(tmp_path, mode: IngestionMode) -> None:
+    db, graph, file_path = setup(tmp_path)
+    with pytest.raises(StageFailure):
+        asyncio.run(
+            db.acreate_graph_from_pdf(
+                FakeLLM(latency=0, tokens=3),
+                file_path,
+                METADATA,
+                on_progress=fail_at("linker"),
+                mode=mode,
+            )
+        )
+    assert graph.chunks == {}
+    assert graph.entities == {}
+    assert graph.documents == {}
+
+
+def test_cancelled_ingestion_job_discards_its_nodes(tmp_path) -> None:
+    db, graph, file_path = setup(tmp_path)
+    queue = IngestionJobQueue(max_workers=1, teardown=db.aclose)
+
+    async def run(job: IngestionJob) -> None:
+        await db.acreate_graph_from_pdf(
+            FakeLLM(latency=0, tokens=3),
+            file_path,
+            METADATA,
+            on_progress=fail_at("linker", asyncio.CancelledError()),
+        )
+
+    job = queue.submit(
+        IngestionJob(document_subject="Graphs", file_name="graph.pdf"), run
+    )
+    deadline = time.monotonic() + 5
+    while not job.is_finished and time.monotonic() < deadline:
+        time.sleep(0.01)
+    queue.shutdown()
+    assert job.status == JobStatus.CANCELLED
+    assert graph.chunks == {}
+    assert graph.entities == {}
+
+
+@pytest.mark.parametrize("mode", [IngestionMode.VECTOR, IngestionMode.GRAPH])
+def test_delete_document(tmp_path, mode: IngestionMode) -> None:
+    db, graph, file_path = setup(tmp_path)
+    asyncio.run(
+        db.acreate_graph_from_pdf(
+            FakeLLM(latency=0, tokens=3), file_path, METADATA, mode=mode
+        )
+    )
+    assert len(graph.chunks) == 1
+    db.delete_document_with_metadata({"subject": METADATA["subject"]})
+    assert graph.documents == {}
+    assert graph.chunks == {}
+    assert graph.entities == {}
+
+
+@pytest.mark.parametrize("stage", ["embedder", "writer", "linker"])
+def test_failed_update_keeps_the_previous_version(tmp_path, stage: str) -> None:
+    db, graph, file_path = setup(tmp_path)
+    llm = FakeLLM(latency=0, tokens=3)
+    asyncio.run(db.acreate_graph_from_pdf(llm, file_path, METADATA))
+    texts = [chunk["text"] for chunk in graph.chunks.values()]
+    updated_path = tmp_path / "updated.pdf"
+    updated_path.write_bytes(pdf_document("Trees are graphs without cycles"))
+    with pytest.raises(StageFailure):
+        asyncio.run(
+            db.acreate_graph_from_pdf(
+                llm, str(updated_path), METADATA, on_progress=fail_at(stage)
+            )
+        )
+    result = asyncio.run(db.acreate_graph_from_pdf(llm, file_path, METADATA))
+    assert result.unchanged == (stage != "linker")
+    assert result.chunks_total == 1
+    assert [chunk["text"] for chunk in graph.chunks.values()] == texts
+
+
+class FailingWriteDriver(FakeDriver):
+    def execute_query(self, query_, parameters_=None, **kwargs):
+        if "CREATE (n:__KGBuilder__" in query_:
+            raise ClientError("write failed")
+        return super().execute_query(query_, parameters_, **kwargs)
+
+
+def test_failed_graph_write_fails_the_ingestion(tmp_path) -> None:
+    db, graph, file_path = setup(tmp_path, FailingWriteDriver)
+    with pytest.raises(GraphWriteError):
+        asyncio.run(
+            db.acreate_graph_from_pdf(FakeLLM(latency=0, tokens=3), file_path, METADATA)
+        )
+    assert graph.chunks == {}
+    assert graph.documents == {}
+
+
+def test_failed_entity_write_keeps_chunks_pending(tmp_path) -> None:
+    db, graph, file_path = setup(tmp_path, FailingWriteDriver)
+    llm = FakeLLM(latency=0, tokens=3)
+    asyncio.run(
+        db.acreate_graph_from_pdf(llm, file_path, METADATA, mode=IngestionMode.VECTOR)
+    )
+    with pytest.raises(GraphWriteError):
+        asyncio.run(db.aextract_entities(llm, METADATA))
+    assert [chunk["extracted"] for chunk in graph.chunks.values()] == [False]
+    assert graph.entities == {}
@@ -0,0 +1,83 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from app.services.admission import AdmissionController, AdmissionRejectedError
+
+
+def test_reject_when_queue_full() -> None:
+    admission = AdmissionController(max_concurrency=1, max_queue=0)
+    admission.acquire()
+    with pytest.raises(AdmissionRejectedError) as error:
+        admission.acquire()
+    assert error.value.retry_after >= 1
+    admission.release()
+    assert admission.stats()["rejected"] == 1
+    assert admission.stats()["in_flight"] == 0
+
+
+def test_waiter_gets_released_slot() -> None:
+    admission = AdmissionController(max_concurrency=1, max_queue=1)
+    admission.acquire()
+    acquired = threading.Event()
+
+    def wait() -> None:
+        with admission.slot():
+            acquired.set()
+
+    thread = threading.Thread(target=wait)
+    thread.start()
+    deadline = time.monotonic() + 5
+    while admission.stats()["queue_depth"] == 0 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert not acquired.is_set()
+    admission.release()
+    thread.join(5)
+    assert acquired.is_set()
+    stats = admission.stats()
+    assert (stats["in_flight"], stats["queue_depth"], stats["admitted"]) == (0, 0, 2)
+
+
+def test_async_waiter_times_out() -> None:
+    admission = AdmissionController(max_concurrency=1, max_queue=1, timeout=0.05)
+
+    async def run() -> None:
+        async with admission.aslot():
+            with pytest.raises(AdmissionRejectedError):
+                await admission.aacquire()
+
+    asyncio.run(run())
+    stats = admission.stats()
+    assert (stats["in_flight"], stats["queue_depth"], stats["rejected"]) == (0, 0, 1)
+
+
+def test_async_waiters_run_in_turn() -> None:
+    admission = AdmissionController(max_concurrency=2, max_queue=10)
+    running = 0
+    peak = 0
+
+    async def call() -> None:
+        nonlocal running, peak
+        async with admission.aslot():
+            running += 1
+            peak = max(peak, running)
+            await asyncio.sleep(0.01)
+            running -= 1
+
+    async def run() -> None:
+        await asyncio.gather(*(call() for _ in range(6)))
+
+    asyncio.run(run())
+    assert peak == 2
+    assert admission.stats()["admitted"] == 6
+
+
+def test_token_bucket_delays_over_rate() -> None:
+    admission = AdmissionController(max_concurrency=5, rate=20, burst=1)
+    with admission.slot():
+        pass
+    with admission.slot():
+        pass
+    assert admission.stats()["wait_seconds_max"] >= 0.03
@@ -0,0 +1,84 @@
+import threading
+import time
+
+import pytest
+from neo4j_graphrag.types import LLMMessage
+
+from app.services.history_writer import MessageHistoryWriter
+
+
+class FakeStore:
+    def __init__(self, fail: bool = False) -> None:
+        self.fail = fail
+        self.batches = []
+        self.lock = threading.Lock()
+
+    def write(self, rows: list[dict]) -> None:
+        if self.fail:
+            raise ConnectionError("Neo4j unavailable")
+        with self.lock:
+            self.batches.append(rows)
+
+    def messages(self, session_id: str) -> list[str]:
+        with self.lock:
+            return [
+                message["content"]
+                for rows in self.batches
+                for row in rows
+                if row["session_id"] == session_id
+                for message in row["messages"]
+            ]
+
+
+def message(content: str) -> LLMMessage:
+    return LLMMessage(role="user", content=content)
+
+
+def test_flush_after_interval() -> None:
+    store = FakeStore()
+    writer = MessageHistoryWriter(store.write, flush_interval_ms=10)
+    writer.add_messages("1", [message("a"), message("b")])
+    deadline = time.monotonic() + 5
+    while writer.has_pending() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert store.messages("1") == ["a", "b"]
+    writer.close()
+
+
+def test_flush_session_keeps_order() -> None:
+    store = FakeStore()
+    writer = MessageHistoryWriter(store.write, flush_interval_ms=60000)
+    writer.add_messages("1", [message("a")])
+    writer.add_messages("2", [message("x")])
+    writer.add_messages("1", [message("b")])
+    writer.flush("1")
+    assert store.messages("1") == ["a", "b"]
+    assert store.messages("2") == []
+    assert writer.has_pending("2")
+    writer.close()
+    assert store.messages("2") == ["x"]
+
+
+def test_flush_when_batch_is_full() -> None:
+    store = FakeStore()
+    writer = MessageHistoryWriter(store.write, flush_interval_ms=60000, max_batch=2)
+    writer.add_messages("1", [message("a"), message("b")])
+    deadline = time.monotonic() + 5
+    while writer.has_pending() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert store.messages("1") == ["a", "b"]
+    writer.close()
+
+
+def test_failed_write_is_requeued() -> None:
+    store = FakeStore(fail=True)
+    writer = MessageHistoryWriter(store.write, flush_interval_ms=60000)
+    writer.add_messages("1", [message("a")])
+    with pytest.raises(ConnectionError):
+        writer.flush("1")
+    writer.add_messages("1", [message("b")])
+    store.fail = False
+    writer.close()
+    assert store.messages("1") == ["a", "b"]
+    with pytest.raises(RuntimeError):
+        writer.add_messages("1", [message("c")])
@@ -0,0 +1,116 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from app.model.models import IngestionJob, JobStatus
+from app.services.jobs import IngestionJobQueue, JobQueueFullError
+from app.services.jobs import job_progress_callback
+
+
+def wait_finished(job: IngestionJob, timeout: float = 5) -> None:
+    deadline = time.monotonic() + timeout
+    while not job.is_finished and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+
+def new_job() -> IngestionJob:
+    return IngestionJob(document_subject="Test", file_name="PDF TEST FILE")
+
+
+def test_job_completed() -> None:
+    queue = IngestionJobQueue(max_workers=1)
+
+    async def run(job: IngestionJob) -> None:
+        job.chunks_total = job.chunks_processed = 3
+
+    job = queue.submit(new_job(), run)
+    wait_finished(job)
+    assert job.status == JobStatus.COMPLETED
+    assert job.chunks_processed == 3
+    assert job.duration_seconds is not None
+    assert queue.get(job.id) is job
+    queue.shutdown()
+
+
+def test_job_failed() -> None:
+    queue = IngestionJobQueue(max_workers=1)
+
+    async def run(job: IngestionJob) -> None:
+        raise ValueError("Invalid PDF")
+
+    job = queue.submit(new_job(), run)
+    wait_finished(job)
+    assert job.status == JobStatus.FAILED
+    assert job.error == "Invalid PDF"
+    queue.shutdown()
+
+
+def test_cancel_running_and_pending_job() -> None:
+    queue = IngestionJobQueue(max_workers=1)
+    started = threading.Event()
+
+    async def run(job: IngestionJob) -> None:
+        started.set()
+        await asyncio.sleep(10)
+
+    cleaned = []
+    running = queue.submit(new_job(), run, cleanup=lambda: cleaned.append("running"))
+    pending = queue.submit(new_job(), run, cleanup=lambda: cleaned.append("pending"))
+    started.wait(5)
+    queue.cancel(pending.id)
+    queue.cancel(running.id)
+    wait_finished(running)
+    assert running.status == JobStatus.CANCELLED
+    assert pending.status == JobStatus.CANCELLED
+    assert sorted(cleaned) == ["pending", "running"]
+    queue.shutdown()
+
+
+def test_queue_full() -> None:
+    queue = IngestionJobQueue(max_workers=1, max_pending=1)
+    release = threading.Event()
+
+    async def run(job: IngestionJob) -> None:
+        while not release.is_set():
+            await asyncio.sleep(0.01)
+
+    first = queue.submit(new_job(), run)
+    while first.status == JobStatus.PENDING:
+        time.sleep(0.01)
+    queue.submit(new_job(), run)
+    with pytest.raises(JobQueueFullError):
+        queue.submit(new_job(), run)
+    release.set()
+    queue.shutdown()
+
+
+def test_job_progress_callback() -> None:
+    job = new_job()
+    job_progress_callback(job)("embedder", 3, 10)
+    assert job.stage == "embedder"
+    assert (job.chunks_processed, job.chunks_total) == (3, 10)
+
+
+def test_teardown_runs_on_the_job_loop() -> None:
+    loops = []
+
+    async def teardown() -> None:
+        loops.append(asyncio.get_running_loop())
+
+    queue = IngestionJobQueue(max_workers=1, teardown=teardown)
+    started = threading.Event()
+
+    async def run(job: IngestionJob) -> None:
+        loops.append(asyncio.get_running_loop())
+        started.set()
+        await asyncio.sleep(10)
+
+    job = queue.submit(new_job(), run)
+    started.wait(5)
+    queue.cancel(job.id)
+    wait_finished(job)
+    assert job.status == JobStatus.CANCELLED
+    assert len(loops) == 2 and loops[0] is loops[1]
+    queue.shutdown()
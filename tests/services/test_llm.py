@@ -1,9 +1,11 @@
 from app.database.database import Neo4jDatabase
 from app.services.llm import LLM, EmbbeddingHuggingFace
+from app.utils.cache import TTLCache
+from app.utils.metrics import EMBEDDING_REQUESTS
 from neo4j_graphrag.types import LLMMessage
 from os import getenv
 from tests import SESSION_ID
-import json
+import asyncio
 
 
 def test_llm_invoke() -> None:
@@ -15,8 +17,21 @@ def test_llm_invoke() -> None:
 
 def test_llm_ainvoke() -> None:
     chat_model = LLM(model_name=f"groq:{getenv('GROQ_MODEL')}")
-    result = chat_model.ainvoke("When the second world war ended?")
+    result = asyncio.run(chat_model.ainvoke("When the second world war ended?"))
     assert result
+    assert isinstance(result.content, str)
+
+
+def test_llm_ainvoke_with_message_history() -> None:
+    chat_model = LLM(model_name=f"groq:{getenv('GROQ_MODEL')}")
+    history = [
+        LLMMessage(role="user", content="My name is Test"),
+        LLMMessage(role="assistant", content="Nice to meet you, Test"),
+    ]
+    result = asyncio.run(
+        chat_model.ainvoke("What is my name?", message_history=history)
+    )
+    assert "test" in result.content.lower()
 
 
 def test_llm_invoke_with_message_history() -> None:
@@ -46,3 +61,42 @@ def test_llm_invoke_with_message_history() -> None:
     assert word_count_response_2 < word_count_response_1
     assert first_response.content.lower() != second_response.content.lower()
     history.clear(True)
+
+
+def test_embedding_cache() -> None:
+    embedder = EmbbeddingHuggingFace()
+    first = embedder.embed_query("What is python?")
+    hits = embedder.cache.hits
+    second = embedder.embed_query("  what is   PYTHON?")
+    assert first == second
+    assert embedder.cache.hits == hits + 1
+
+
+class FakeEndpointEmbeddings:
+    def __init__(self) -> None:
+        self.batches = []
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        self.batches.append(texts)
+        return [[float(len(text))] for text in texts]
+
+    async def aembed_documents(self, texts: list[str]) -> list[list[float]]:
+        return self.embed_documents(texts)
+
+
+def test_embed_documents_batches() -> None:
+    embedder = EmbbeddingHuggingFace(cache=TTLCache(), batch_size=2)
+    embedder.embedder = FakeEndpointEmbeddings()
+    requests = EMBEDDING_REQUESTS.value(kind="documents")
+    texts = ["a", "bb", "ccc", "dddd", "eeeee"]
+    assert embedder.embed_documents(texts) == [[1.0], [2.0], [3.0], [4.0], [5.0]]
+    assert asyncio.run(embedder.aembed_documents(texts)) == [
+        [1.0],
+        [2.0],
+        [3.0],
+        [4.0],
+        [5.0],
+    ]
+    assert [len(batch) for batch in embedder.embedder.batches] == [2, 2, 1] * 2
+    assert EMBEDDING_REQUESTS.value(kind="documents") == requests + 6
+    assert len(embedder.cache) == 0
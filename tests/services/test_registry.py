@@ -0,0 +1,45 @@
+import asyncio
+
+from app.services.registry import ClientRegistry
+from app.database.database import Neo4jDatabase
+from benchmarks.fakes import FakeAsyncDriver, FakeDriver, FakeEmbedder, InMemoryGraph
+
+
+def test_registry_reuses_clients() -> None:
+    registry = ClientRegistry()
+    assert registry.get_llm() is registry.get_llm()
+    assert registry.get_llm() is not registry.get_llm(response_format="json_object")
+    assert registry.db.embedder is not None
+
+
+def test_registry_closes_database_drivers() -> None:
+    embedder = FakeEmbedder(latency=0, dimensions=8)
+    graph = InMemoryGraph(dimensions=8)
+    driver = FakeDriver(graph, latency=0)
+    db = Neo4jDatabase.__wrapped__(
+        embedder,
+        driver=driver,
+        async_driver_factory=lambda: FakeAsyncDriver(graph, latency=0),
+    )
+    registry = ClientRegistry(embedder=embedder, db=db)
+
+    async def run() -> tuple:
+        async_driver = db.get_async_driver()
+        await registry.aclose()
+        return async_driver, db.get_async_driver()
+
+    async_driver, reopened = asyncio.run(run())
+    assert async_driver._closed and driver._closed
+    assert reopened is not async_driver
+
+
+def test_registry_treats_empty_numbers_as_unset(monkeypatch) -> None:
+    monkeypatch.setenv("LLM_RATE_BURST", "")
+    monkeypatch.setenv("LLM_MAX_CONCURRENCY", "")
+    embedder = FakeEmbedder(latency=0, dimensions=8)
+    graph = InMemoryGraph(dimensions=8)
+    db = Neo4jDatabase.__wrapped__(embedder, driver=FakeDriver(graph, latency=0))
+    registry = ClientRegistry(embedder=embedder, db=db)
+    assert registry.admission.burst == 1
+    assert registry.admission.stats()["max_concurrency"] == 8
+    registry.close()
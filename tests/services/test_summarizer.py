@@ -0,0 +1,73 @@
+import asyncio
+
+from neo4j_graphrag.types import LLMMessage
+
+from app.services.summarizer import ConversationSummarizer
+from benchmarks.fakes import FakeEmbedder, FakeLLM, in_memory_database
+from tests import USER
+
+
+def turn(index: int) -> list[LLMMessage]:
+    return [
+        LLMMessage(role="user", content=f"question {index}"),
+        LLMMessage(role="assistant", content=f"answer {index}"),
+    ]
+
+
+def test_summary_refreshes_every_n_turns() -> None:
+    db = in_memory_database(FakeEmbedder(latency=0, dimensions=8), latency=0)
+    db.save_basemodel(USER)
+    summarizer = ConversationSummarizer(db, every_turns=2, recent_messages=2)
+    llm = FakeLLM(latency=0, tokens=3)
+
+    async def run() -> list[list[LLMMessage]]:
+        prompts = []
+        session_id = None
+        for index in range(7):
+            history, messages = await db.aopen_session(
+                USER, session_id, summarizer.window
+            )
+            session_id = history.session_id
+            summarizer.schedule(llm, session_id, messages)
+            await summarizer.aclose()
+            prompts.append(summarizer.recent(messages))
+            await history.aadd_messages(turn(index))
+        return prompts
+
+    prompts = asyncio.run(run())
+    assert [len(messages) for messages in prompts] == [0, 2, 2, 2, 3, 3, 3]
+    assert prompts[4][0]["role"] == "system"
+    assert [message["content"] for message in prompts[4][1:]] == [
+        "question 3",
+        "answer 3",
+    ]
+    assert summarizer.stats() == {"refreshed": 2, "failed": 0, "in_flight": 0}
+
+
+def test_refresh_is_not_scheduled_twice_for_a_session() -> None:
+    db = in_memory_database(FakeEmbedder(latency=0, dimensions=8), latency=0)
+    db.save_basemodel(USER)
+    summarizer = ConversationSummarizer(db, every_turns=1, recent_messages=0)
+    llm = FakeLLM(latency=0.01, tokens=3)
+
+    async def run() -> tuple:
+        history, _ = await db.aopen_session(USER, None)
+        await history.aadd_messages(turn(0))
+        _, messages = await db.aopen_session(USER, history.session_id)
+        first = summarizer.schedule(llm, history.session_id, messages)
+        second = summarizer.schedule(llm, history.session_id, messages)
+        await summarizer.aclose()
+        return first, second
+
+    first, second = asyncio.run(run())
+    assert first is not None and second is None
+    assert summarizer.refreshed == 1
+    assert summarizer.needs_refresh(turn(0)[:1]) is False
+
+
+def test_recent_keeps_summary_and_last_messages() -> None:
+    summarizer = ConversationSummarizer(None, recent_messages=2)
+    summary = LLMMessage(role="system", content="summary")
+    messages = [summary, *turn(0), *turn(1)]
+    assert summarizer.recent(messages) == [summary, *turn(1)]
+    assert ConversationSummarizer(None, recent_messages=0).recent(messages) == [summary]
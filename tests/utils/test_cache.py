@@ -0,0 +1,100 @@
+from app.utils.cache import DiskStore, SemanticAnswerCache, TTLCache
+
+
+class FakeTimer:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_cache_hit_and_miss() -> None:
+    cache = TTLCache(max_size=2, ttl=10)
+    assert cache.get("question") is None
+    cache.set("question", [0.1, 0.2])
+    assert cache.get("question") == [0.1, 0.2]
+    assert cache.stats() == {"hits": 1, "misses": 1, "size": 1, "max_size": 2}
+
+
+def test_cache_lru_eviction() -> None:
+    cache = TTLCache(max_size=2, ttl=10)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+
+
+def test_cache_ttl_expiration() -> None:
+    timer = FakeTimer()
+    cache = TTLCache(max_size=2, ttl=10, timer=timer)
+    cache.set("a", 1)
+    timer.now = 11
+    assert cache.get("a") is None
+    assert len(cache) == 0
+
+
+def test_cache_disk_store(tmp_path) -> None:
+    path = str(tmp_path / "cache.db")
+    TTLCache(store=DiskStore(path)).set("a", [1.0, 2.0])
+    cache = TTLCache(store=DiskStore(path))
+    assert cache.get("a") == [1.0, 2.0]
+    assert cache.hits == 1
+
+
+def test_disk_store_purges_expired_rows(tmp_path) -> None:
+    timer = FakeTimer()
+    store = DiskStore(str(tmp_path / "cache.db"), timer=timer)
+    store.set("a", 1, expires_at=10)
+    store.set("b", 2, expires_at=30)
+    timer.now = 20
+    assert store.get("a") is None
+    assert len(store) == 1
+    store.set("c", 3, expires_at=40)
+    timer.now = 35
+    store.set("d", 4, expires_at=50)
+    assert len(store) == 2
+    assert store.get("b") is None
+
+
+def test_disk_store_evicts_least_recently_used(tmp_path) -> None:
+    timer = FakeTimer()
+    store = DiskStore(str(tmp_path / "cache.db"), max_size=2, timer=timer)
+    store.set("a", 1, expires_at=100)
+    timer.now = 1
+    store.set("b", 2, expires_at=100)
+    timer.now = 2
+    assert store.get("a") == (1, 100)
+    timer.now = 3
+    store.set("c", 3, expires_at=100)
+    assert len(store) == 2
+    assert store.get("b") is None
+    assert store.get("a") == (1, 100)
+
+
+def test_semantic_cache_similar_question() -> None:
+    cache = SemanticAnswerCache(threshold=0.9)
+    cache.set([1.0, 0.0, 0.0], "Twenty four hours")
+    assert cache.get([0.99, 0.05, 0.0]) == "Twenty four hours"
+    assert cache.get([0.0, 1.0, 0.0]) is None
+    assert cache.stats()["hits"] == 1
+
+
+def test_semantic_cache_scope() -> None:
+    cache = SemanticAnswerCache(threshold=0.9)
+    cache.set([1.0, 0.0], "Answer", scope="Product A")
+    assert cache.get([1.0, 0.0], scope="Product B") is None
+    assert cache.get([1.0, 0.0], scope="Product A") == "Answer"
+
+
+def test_semantic_cache_invalidate() -> None:
+    cache = SemanticAnswerCache(threshold=0.9)
+    version = cache.version
+    cache.set([1.0, 0.0], "Answer", version=version)
+    cache.invalidate()
+    assert cache.get([1.0, 0.0]) is None
+    cache.set([1.0, 0.0], "Stale answer", version=version)
+    assert len(cache) == 0
@@ -0,0 +1,112 @@
+from neo4j_graphrag.generation.prompts import RagTemplate
+from neo4j_graphrag.types import RetrieverResultItem
+
+from app.utils.context import ContextAssembler
+
+TEMPLATE = RagTemplate(
+    template="{context} {examples} {query_text}", system_instructions="Answer."
+)
+
+
+def count_words(text: str) -> int:
+    return len(text.split())
+
+
+def chunk(text: str, score: float, **metadata) -> RetrieverResultItem:
+    return RetrieverResultItem(content=text, metadata={"score": score} | metadata)
+
+
+def test_fit_history_keeps_most_recent_messages() -> None:
+    assembler = ContextAssembler(history_tokens=5, count_tokens=count_words)
+    history = [
+        {"role": "user", "content": "one two three"},
+        {"role": "assistant", "content": "four five"},
+        {"role": "user", "content": "six seven eight"},
+    ]
+    fitted, used = assembler.fit_history(history)
+    assert fitted == history[1:]
+    assert used == 5
+
+
+def test_assemble_ranks_chunks_and_respects_budget() -> None:
+    assembler = ContextAssembler(max_tokens=8, count_tokens=count_words)
+    items = [
+        chunk("low scored chunk text", 0.2),
+        chunk("best chunk", 0.9),
+        chunk("a chunk that is far too long to fit", 0.5),
+    ]
+    context, history, usage = assembler.assemble("question?", items, [], TEMPLATE)
+    assert context == "best chunk\nlow scored chunk text"
+    assert history == []
+    assert usage.prompt_tokens == 2
+    assert usage.context_tokens == 6
+    assert usage.total_tokens == 8
+    assert usage.chunks_used == 2 and usage.chunks_dropped == 1
+
+
+def test_assemble_removes_splitter_overlap_and_duplicates() -> None:
+    assembler = ContextAssembler(count_tokens=count_words, min_overlap=8)
+    overlap = " shared overlap words"
+    first = "The first chunk of the document ends with" + overlap
+    second = overlap.strip() + " and the second chunk continues here"
+    items = [
+        chunk(first, 0.9, subject="Guide", file_name="guide.pdf"),
+        chunk(second, 0.8, subject="Guide", file_name="guide.pdf"),
+        chunk("first chunk of the document", 0.7),
+    ]
+    context, _, usage = assembler.assemble("question?", items)
+    assert context.count("shared overlap words") == 1
+    assert "and the second chunk continues here" in context
+    assert context.startswith("[Guide - guide.pdf]\n")
+    assert usage.chunks_used == 2 and usage.duplicates_removed == 1
+
+
+def test_history_is_trimmed_before_context() -> None:
+    assembler = ContextAssembler(
+        max_tokens=8, history_tokens=4, count_tokens=count_words
+    )
+    history = [
+        {"role": "user", "content": "old question here"},
+        {"role": "assistant", "content": "short answer"},
+    ]
+    context, fitted, usage = assembler.assemble(
+        "question?",
+        [chunk("three word chunk", 1), chunk("x y", 0.5)],
+        history,
+        TEMPLATE,
+    )
+    assert fitted == history[1:]
+    assert context == "three word chunk"
+    assert usage.messages_dropped == 1 and usage.chunks_dropped == 1
+
+
+def test_fit_history_pins_leading_summary() -> None:
+    assembler = ContextAssembler(history_tokens=5, count_tokens=count_words)
+    history = [
+        {"role": "system", "content": "summary so far"},
+        {"role": "user", "content": "old question"},
+        {"role": "assistant", "content": "new answer"},
+    ]
+    fitted, used = assembler.fit_history(history)
+    assert fitted == [history[0], history[2]]
+    assert used == 5
+
+
+def test_fitted_history_is_not_refitted() -> None:
+    counted = []
+    assembler = ContextAssembler(
+        max_tokens=20,
+        history_tokens=4,
+        count_tokens=lambda text: counted.append(text) or count_words(text),
+    )
+    history = [
+        {"role": "user", "content": "old question here"},
+        {"role": "assistant", "content": "short answer"},
+    ]
+    fitted = assembler.fit_prompt("question?", history, TEMPLATE)
+    counted.clear()
+    _, assembled, usage = assembler.assemble("question?", [], fitted, TEMPLATE)
+    assert assembled is fitted
+    assert assembler.fit_history(assembled)[0] is fitted
+    assert "short answer" not in counted
+    assert usage.history_tokens == 2 and usage.messages_dropped == 1
@@ -0,0 +1,56 @@
+import pytest
+
+from app.utils.metrics import MetricsRegistry
+
+
+def test_counter_renders_labels() -> None:
+    registry = MetricsRegistry()
+    counter = registry.counter("requests_total", "Requests.", ["route"])
+    counter.inc(route="/llm/")
+    counter.inc(2, route='say "hi"\n')
+    assert counter.value(route="/llm/") == 1
+    assert registry.render().splitlines() == [
+        "# HELP requests_total Requests.",
+        "# TYPE requests_total counter",
+        'requests_total{route="/llm/"} 1.0',
+        'requests_total{route="say \\"hi\\"\\n"} 2.0',
+    ]
+
+
+def test_histogram_buckets_are_cumulative() -> None:
+    registry = MetricsRegistry()
+    histogram = registry.histogram("latency", "Latency.", ["stage"], [0.1, 1])
+    histogram.observe(0.05, stage="llm")
+    histogram.observe(0.1, stage="llm")
+    histogram.observe(5, stage="llm")
+    with histogram.time(stage="auth"):
+        pass
+    assert histogram.count(stage="llm") == 3
+    lines = registry.render().splitlines()
+    assert 'latency_bucket{stage="llm",le="0.1"} 2' in lines
+    assert 'latency_bucket{stage="llm",le="1.0"} 2' in lines
+    assert 'latency_bucket{stage="llm",le="+Inf"} 3' in lines
+    assert 'latency_sum{stage="llm"} 5.15' in lines
+    assert 'latency_count{stage="auth"} 1' in lines
+
+
+def test_histogram_time_records_errors() -> None:
+    histogram = MetricsRegistry().histogram("latency", "Latency.")
+    with pytest.raises(ValueError):
+        with histogram.time():
+            raise ValueError()
+    assert histogram.count() == 1
+
+
+def test_callback_metric_is_collected_on_render() -> None:
+    registry = MetricsRegistry()
+    stats = {"hits": 1}
+    registry.callback(
+        "cache_hits_total",
+        "Hits.",
+        "counter",
+        lambda: {("embedding",): stats["hits"]},
+        ["cache"],
+    )
+    stats["hits"] = 3
+    assert 'cache_hits_total{cache="embedding"} 3.0' in registry.render()
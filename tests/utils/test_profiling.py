@@ -0,0 +1,149 @@
+import asyncio
+import logging
+
+import pytest
+from fastapi import HTTPException
+from starlette.applications import Starlette
+from starlette.responses import PlainTextResponse
+from starlette.routing import Route
+from starlette.testclient import TestClient
+
+from app.controller.admin import get_enabled_profiler
+from app.utils.profiling import ProfiledDriver, ProfileMiddleware, Profiler, Span
+from app.utils.profiling import parameters_shape, query_span, span
+from benchmarks.fakes import FakeEmbedder, in_memory_database
+
+
+def test_span_is_noop_without_profile() -> None:
+    with span("llm") as current:
+        assert current is None
+
+
+def test_profile_records_span_tree() -> None:
+    profiler = Profiler()
+
+    async def embed() -> None:
+        with span("embedding"):
+            await asyncio.sleep(0)
+
+    async def run() -> Span:
+        with profiler.profile("POST /llm/rag/") as root:
+            with span("auth"):
+                with query_span(
+                    "MATCH (u:User {email: $email}) RETURN u", {"email": "a"}
+                ):
+                    pass
+            await asyncio.gather(embed(), embed())
+        return root
+
+    root = asyncio.run(run())
+    profile = profiler.get(root.id)
+    assert profile["name"] == "POST /llm/rag/"
+    assert [child["name"] for child in profile["children"]] == [
+        "auth",
+        "embedding",
+        "embedding",
+    ]
+    cypher = profile["children"][0]["children"][0]
+    assert cypher["name"] == "cypher"
+    assert cypher["attributes"]["parameters"] == {"email": "str[1]"}
+    assert set(root.totals()) == {"auth", "cypher", "embedding"}
+    assert root.server_timing().startswith("total;dur=")
+
+
+def test_ring_buffer_keeps_latest_profiles() -> None:
+    profiler = Profiler(max_profiles=2)
+    for name in ("a", "b", "c"):
+        with profiler.profile(name):
+            pass
+    assert [profile["name"] for profile in profiler.recent()] == ["c", "b"]
+    assert profiler.get("missing") is None
+
+
+def test_should_profile_by_header_or_sample_rate() -> None:
+    assert Profiler(enabled=True).should_profile({"X-Profile": "1"})
+    assert not Profiler(sample_rate=1, enabled=True).should_profile({"X-Profile": "0"})
+    assert Profiler(sample_rate=1, enabled=True).should_profile({})
+    assert not Profiler(enabled=True).should_profile({})
+    assert not Profiler(sample_rate=1).should_profile({"X-Profile": "1"})
+
+
+def test_parameters_shape_hides_values() -> None:
+    shape = parameters_shape({"rows": [{"id": 1}], "vector": [0.1] * 3, "top_k": 5})
+    assert shape == {
+        "rows": "list[1] of dict",
+        "vector": "list[3] of float",
+        "top_k": "int",
+    }
+
+
+def test_slow_query_is_logged(
+    monkeypatch: pytest.MonkeyPatch, caplog: pytest.LogCaptureFixture
+) -> None:
+    monkeypatch.setenv("SLOW_QUERY_MS", "0.001")
+    with caplog.at_level(logging.WARNING, logger="app.utils.profiling"):
+        with query_span("MATCH (n)\n    RETURN n", {"password": "secret"}):
+            sum(range(1000))
+    assert "Slow Cypher query" in caplog.text
+    assert "MATCH (n) RETURN n" in caplog.text
+    assert "secret" not in caplog.text
+
+
+class RecordingDriver:
+    def __init__(self) -> None:
+        self.queries = []
+
+    def execute_query(self, query_, parameters_=None, **kwargs):
+        with span("inner") as current:
+            self.queries.append((query_, parameters_, kwargs, current))
+
+
+def test_profiled_driver_records_query_span() -> None:
+    profiler = Profiler()
+    driver = RecordingDriver()
+    with profiler.profile("GET /") as root:
+        ProfiledDriver(driver).execute_query("RETURN $a", {"a": 1}, database_="neo4j")
+    assert driver.queries[0][:3] == ("RETURN $a", {"a": 1}, {"database_": "neo4j"})
+    assert [child.name for child in root.children] == ["cypher"]
+    assert ProfiledDriver(driver).queries is driver.queries
+
+
+def test_sync_message_history_runs_through_profiled_driver() -> None:
+    db = in_memory_database(FakeEmbedder(latency=0, dimensions=8), latency=0)
+    profiler = Profiler()
+    with profiler.profile("GET /llm/sessions") as root:
+        history = db.get_message_history("session")
+        history.add_message({"role": "user", "content": "question"})
+        messages = history.messages
+        history.clear(True)
+    assert [message["content"] for message in messages] == ["question"]
+    assert history.messages == []
+    assert [child.name for child in root.children] == ["cypher"] * 3
+
+
+def profiled_client(profiler: Profiler) -> TestClient:
+    app = Starlette(routes=[Route("/", lambda request: PlainTextResponse("ok"))])
+    app.add_middleware(ProfileMiddleware, get_profiler=lambda scope: profiler)
+    return TestClient(app)
+
+
+def test_profile_middleware_passes_through_when_disabled() -> None:
+    response = profiled_client(Profiler()).get("/", headers={"X-Profile": "1"})
+    assert response.text == "ok"
+    assert "X-Profile-Id" not in response.headers
+
+
+def test_profile_middleware_sets_headers() -> None:
+    profiler = Profiler(enabled=True)
+    response = profiled_client(profiler).get("/", headers={"X-Profile": "1"})
+    assert response.text == "ok"
+    assert profiler.get(response.headers["X-Profile-Id"]) is not None
+    assert response.headers["Server-Timing"].startswith("total;dur=")
+
+
+def test_profiles_are_hidden_while_profiling_is_disabled() -> None:
+    with pytest.raises(HTTPException) as error:
+        get_enabled_profiler(Profiler())
+    assert error.value.status_code == 404
+    profiler = Profiler(enabled=True)
+    assert get_enabled_profiler(profiler) is profiler
@@ -0,0 +1,38 @@
+from neo4j_graphrag.types import RetrieverResultItem
+
+from app.utils.rerank import LexicalReranker
+
+
+def item(text: str, score: float) -> RetrieverResultItem:
+    return RetrieverResultItem(content=text, metadata={"score": score})
+
+
+def test_scores_favour_rare_exact_terms() -> None:
+    reranker = LexicalReranker()
+    scores = reranker.scores(
+        "ERR-404 missing",
+        [
+            "the file is missing",
+            "ERR-404 is raised when the index is missing",
+            "unrelated text",
+        ],
+    )
+    assert scores[1] > scores[0] > scores[2] == 0
+
+
+def test_rerank_blends_fused_and_lexical_scores() -> None:
+    items = [
+        item("vector neighbours about indexes", 0.033),
+        item("set db.max_connections to raise the pool size", 0.030),
+        item("nothing relevant", 0.016),
+    ]
+    reranked = LexicalReranker(weight=0.5).rerank("db.max_connections", items)
+    assert [entry.content for entry in reranked] == [
+        "set db.max_connections to raise the pool size",
+        "vector neighbours about indexes",
+        "nothing relevant",
+    ]
+    assert reranked[0].metadata["fused_score"] == 0.030
+    assert items[1].metadata == {"score": 0.030}
+    unchanged = LexicalReranker(weight=0).rerank("db.max_connections", items)
+    assert unchanged[0].content == items[0].content
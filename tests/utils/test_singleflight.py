@@ -0,0 +1,62 @@
+import asyncio
+
+import pytest
+
+from app.utils.singleflight import SingleFlight
+
+
+def test_concurrent_calls_share_one_flight() -> None:
+    flights = SingleFlight()
+    calls = []
+
+    async def answer(key: str) -> str:
+        calls.append(key)
+        await asyncio.sleep(0.01)
+        return f"answer {key}"
+
+    async def run() -> list:
+        return await asyncio.gather(
+            flights.do("a", lambda: answer("a")),
+            flights.do("a", lambda: answer("a")),
+            flights.do("b", lambda: answer("b")),
+        )
+
+    assert asyncio.run(run()) == ["answer a", "answer a", "answer b"]
+    assert sorted(calls) == ["a", "b"]
+    assert flights.stats() == {"calls": 2, "shared": 1, "in_flight": 0}
+
+
+def test_error_is_shared() -> None:
+    flights = SingleFlight()
+
+    async def fail() -> str:
+        await asyncio.sleep(0.01)
+        raise ValueError("boom")
+
+    async def run() -> list:
+        return await asyncio.gather(
+            flights.do("a", fail), flights.do("a", fail), return_exceptions=True
+        )
+
+    results = asyncio.run(run())
+    assert all(isinstance(result, ValueError) for result in results)
+
+
+def test_cancelled_caller_does_not_cancel_flight() -> None:
+    flights = SingleFlight()
+
+    async def answer() -> str:
+        await asyncio.sleep(0.05)
+        return "answer"
+
+    async def run() -> str:
+        first = asyncio.create_task(flights.do("a", answer))
+        await asyncio.sleep(0)
+        second = asyncio.create_task(flights.do("a", answer))
+        await asyncio.sleep(0)
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return await second
+
+    assert asyncio.run(run()) == "answer"
@@ -1,3 +1,5 @@
+from app.utils.tools import format_sse, fulltext_query, hash_file, hash_text
+from app.utils.tools import normalize_text, scope_key, search_terms
 from app.utils.tools import singleton
 
 
@@ -10,3 +12,48 @@ def test_singleton() -> None:
     instance_a = TestSingleton()
     instance_b = TestSingleton()
     assert instance_a == instance_b
+    assert TestSingleton.__wrapped__() is not instance_a
+
+
+def test_format_sse() -> None:
+    assert format_sse({"token": "Hi"}) == 'data: {"token": "Hi"}\n\n'
+    assert (
+        format_sse({"session_id": "1"}, event="end")
+        == 'event: end\ndata: {"session_id": "1"}\n\n'
+    )
+
+
+def test_hash_text() -> None:
+    assert hash_text("chunk") == hash_text("chunk")
+    assert hash_text("chunk") != hash_text("chunk ")
+
+
+def test_hash_file(tmp_path) -> None:
+    file_path = tmp_path / "sample.txt"
+    file_path.write_bytes(b"chunk")
+    assert hash_file(str(file_path), chunk_size=2) == hash_text("chunk")
+
+
+def test_normalize_text() -> None:
+    assert normalize_text("  What is\n PYTHON? ") == "what is python?"
+
+
+def test_search_terms_keep_codes_and_keys() -> None:
+    assert search_terms("Why ERR-404 on db.max_connections?") == [
+        "why",
+        "err-404",
+        "on",
+        "db.max_connections",
+    ]
+
+
+def test_fulltext_query_quotes_unique_terms() -> None:
+    assert fulltext_query('AND "graph" (graph) NOT*') == '"and" OR "graph" OR "not"'
+    assert fulltext_query("?!") == ""
+
+
+def test_scope_key_is_order_independent() -> None:
+    assert scope_key(None) is None and scope_key({}) is None
+    assert scope_key({"subject": "A", "file_name": "b.pdf"}) == scope_key(
+        {"file_name": "b.pdf", "subject": "A"}
+    )